@@ -0,0 +1,74 @@
+"""
+Benchmarks solving the assignment problem for unordered ListGraders, comparing
+optimal_assignment against the reference list-of-lists implementation in
+helpers/munkres.py, on its own and as part of grading an unordered list.
+
+Run from the repository root:
+    python benchmarks/bench_assignment.py
+"""
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitxgraders import ListGrader, StringGrader
+from mitxgraders.helpers import munkres
+from mitxgraders.helpers.assignment import optimal_assignment
+from mitxgraders import listgrader
+
+def shuffled_costs(size):
+    """Costs for a correct list of inputs in shuffled order"""
+    costs = np.ones((size, size))
+    costs[np.arange(size), np.random.permutation(size)] = 0
+    return costs
+
+def partial_costs(size):
+    """Costs for inputs earning full, partial or no credit against each answer"""
+    return np.random.choice([0, 0.5, 1], size=(size, size), p=[0.1, 0.2, 0.7])
+
+def munkres_order(check, answers, student_list):
+    """find_optimal_order, solving the assignment problem with helpers/munkres.py"""
+    result_matrix = [[check(a, i) for a in answers] for i in student_list]
+    cost_matrix = munkres.make_cost_matrix(result_matrix, lambda r: 1 - r['grade_decimal'])
+    indexes = munkres.Munkres().compute(cost_matrix)
+    return [result_matrix[i][j] for i, j in indexes]
+
+def main_grading(number=5):
+    print("\n{:<32} {:>12} {:>12} {:>8}".format('grading an unordered list', 'munkres',
+                                                'assignment', 'speedup'))
+    for size in [5, 20, 50]:
+        answers = ['item{}'.format(i) for i in range(size)]
+        student_input = random.sample(answers, size)
+        grader = ListGrader(answers=answers, subgraders=StringGrader())
+        optimal_order = listgrader.find_optimal_order
+        try:
+            listgrader.find_optimal_order = munkres_order
+            reference = timeit.timeit(lambda: grader(None, student_input), number=number)
+        finally:
+            listgrader.find_optimal_order = optimal_order
+        vectorized = timeit.timeit(lambda: grader(None, student_input), number=number)
+        print("{:<32} {:>10.2f}ms {:>10.2f}ms {:>7.2f}x".format(
+            '{} items'.format(size), 1e3*reference/number, 1e3*vectorized/number,
+            reference/vectorized))
+
+def main(number=20):
+    print("{:<32} {:>12} {:>12} {:>8}".format('cost matrix', 'munkres', 'assignment',
+                                              'speedup'))
+    for label, make_costs in [('shuffled', shuffled_costs), ('partial credit', partial_costs)]:
+        for size in [5, 20, 50]:
+            costs = make_costs(size)
+            cost_lists = costs.tolist()
+            reference = timeit.timeit(lambda: munkres.Munkres().compute(cost_lists),
+                                      number=number)
+            vectorized = timeit.timeit(lambda: optimal_assignment(costs), number=number)
+            print("{:<32} {:>10.2f}ms {:>10.2f}ms {:>7.2f}x".format(
+                '{} {}x{}'.format(label, size, size), 1e3*reference/number,
+                1e3*vectorized/number, reference/vectorized))
+
+if __name__ == '__main__':
+    main()
+    main_grading()
@@ -0,0 +1,82 @@
+"""
+Benchmarks evaluation of parsed MathExpressions, comparing compiled trees
+against the reference recursive tree walk (MathExpression.eval_node), and
+batch evaluation over columns of samples against evaluating each sample.
+
+Run from the repository root:
+    python benchmarks/bench_expressions.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitxgraders.helpers.calc import DEFAULT_VARIABLES, DEFAULT_FUNCTIONS, DEFAULT_SUFFIXES
+from mitxgraders.helpers.calc.expressions import parse, MathExpression
+from mitxgraders.helpers.calc.mathfuncs import merge_dicts
+
+EXPRESSIONS = [
+    'x^2 + 2*x*y + y^2',
+    'sin(x)*cos(y) - sqrt(x^2 + y^2)/(1 + exp(-x))',
+    '(a + b*x + c*x^2 + d*x^3 + e*x^4)/(1 + x^2)',
+    '[[x, y], [-y, x]]*[[a, b], [c, d]]',
+]
+
+VARIABLES = merge_dicts(DEFAULT_VARIABLES, {
+    'x': 1.3, 'y': 2.1, 'a': 0.5, 'b': 1.5, 'c': 2.5, 'd': 3.5, 'e': 4.5
+})
+
+def eval_uncompiled(expression):
+    """Evaluate via the reference tree walk"""
+    expression.check_scope(VARIABLES, DEFAULT_FUNCTIONS, DEFAULT_SUFFIXES)
+    metadata_dict = {'max_array_dim_used': 0}
+    actions = expression.get_actions(VARIABLES, DEFAULT_FUNCTIONS, DEFAULT_SUFFIXES,
+                                     metadata_dict)
+    return MathExpression.eval_node(expression.tree, actions, False)
+
+def eval_compiled(expression):
+    """Evaluate via the compiled tree"""
+    return expression.eval(VARIABLES, DEFAULT_FUNCTIONS, DEFAULT_SUFFIXES)[0]
+
+def eval_per_sample(expression, var_columns, samples):
+    """Evaluate each sample separately"""
+    return [expression.eval({name: column[index] for name, column in var_columns.items()},
+                            DEFAULT_FUNCTIONS, DEFAULT_SUFFIXES)[0]
+            for index in range(samples)]
+
+def eval_batch(expression, var_columns, samples):
+    """Evaluate all samples at once"""
+    return expression.eval_batch(var_columns, DEFAULT_FUNCTIONS, DEFAULT_SUFFIXES, samples)[0]
+
+def main_batch(number=200):
+    print("\n{:<50} {:>8} {:>12} {:>12} {:>8}".format(
+        'expression', 'samples', 'per-sample', 'batch', 'speedup'))
+    for formula in EXPRESSIONS[:3]:
+        expression = parse(formula)
+        for samples in [5, 20, 50]:
+            var_columns = {name: list(np.random.uniform(1, 5, samples))
+                           for name in expression.variables_used}
+            reference = timeit.timeit(lambda: eval_per_sample(expression, var_columns, samples),
+                                      number=number)
+            batch = timeit.timeit(lambda: eval_batch(expression, var_columns, samples),
+                                  number=number)
+            print("{:<50} {:>8} {:>10.1f}us {:>10.1f}us {:>7.2f}x".format(
+                formula, samples, 1e6*reference/number, 1e6*batch/number, reference/batch))
+
+def main(number=2000):
+    print("{:<50} {:>12} {:>12} {:>8}".format('expression', 'eval_node', 'compiled', 'speedup'))
+    for formula in EXPRESSIONS:
+        expression = parse(formula)
+        # Compile up front so that compilation is not timed
+        expression.compiled
+        reference = timeit.timeit(lambda: eval_uncompiled(expression), number=number)
+        compiled = timeit.timeit(lambda: eval_compiled(expression), number=number)
+        print("{:<50} {:>10.1f}us {:>10.1f}us {:>7.2f}x".format(
+            formula, 1e6*reference/number, 1e6*compiled/number, reference/compiled))
+
+if __name__ == '__main__':
+    main()
+    main_batch()
@@ -0,0 +1,94 @@
+"""
+Benchmarks the cold import time of mitxgraders from python_lib.zip, as
+happens in every edX safe_exec sandbox run. Each measurement runs in a fresh
+interpreter, so nothing is cached between runs.
+
+Run from the repository root:
+    python benchmarks/bench_import.py
+
+Pass --bytecode to also time a zip containing precompiled bytecode for this
+interpreter (as built by ./makezip.sh --bytecode python).
+"""
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def build_zip(directory, bytecode=False):
+    """
+    Build python_lib.zip from the working tree (as makezip.sh does), optionally
+    including legacy-location bytecode for this interpreter.
+    """
+    path = os.path.join(directory, 'python_lib.zip')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as myzip:
+        myzip.write(os.path.join(ROOT, 'LICENSE'), 'mitxgraders/LICENSE')
+        for package in ['mitxgraders', 'voluptuous']:
+            for dirpath, dirnames, filenames in os.walk(os.path.join(ROOT, package)):
+                dirnames[:] = [name for name in dirnames if name != '__pycache__']
+                for filename in filenames:
+                    if filename.endswith('.py'):
+                        fullpath = os.path.join(dirpath, filename)
+                        relpath = os.path.relpath(fullpath, ROOT)
+                        myzip.write(fullpath, relpath)
+                        if bytecode:
+                            cfile = os.path.join(directory, 'module.pyc')
+                            py_compile.compile(
+                                fullpath, cfile=cfile, dfile=relpath, doraise=True,
+                                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+                            myzip.write(cfile, relpath + 'c')
+                            os.remove(cfile)
+    return path
+
+def time_statement(statement, directory, setup='', repeat=10):
+    """
+    Time statement in fresh interpreters with python_lib.zip on the path,
+    returning the best time in milliseconds.
+    """
+    script = ("import sys, time\n"
+              "sys.path.insert(0, 'python_lib.zip')\n"
+              "{setup}\n"
+              "start = time.perf_counter()\n"
+              "{statement}\n"
+              "print(time.perf_counter() - start)\n").format(setup=setup, statement=statement)
+    times = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=directory)
+        times.append(float(output.decode().split()[-1]))
+    return 1000*min(times)
+
+GRADERS = ['StringGrader', 'ListGrader', 'FormulaGrader', 'MatrixGrader', 'IntegralGrader']
+
+STATEMENTS = [('import mitxgraders', '', 'import mitxgraders')] + [
+    ('from mitxgraders import ' + grader, '', 'from mitxgraders import ' + grader)
+    for grader in GRADERS
+] + [
+    ('from mitxgraders import *', '', 'from mitxgraders import *'),
+    ('first parse (descent engine)', 'import mitxgraders.helpers.calc.expressions',
+     "mitxgraders.helpers.calc.expressions.PARSER.parse('x^2+1')"),
+    ('pyparsing grammar (deferred)', 'import mitxgraders.helpers.calc.expressions',
+     "mitxgraders.helpers.calc.expressions.PARSER.grammar"),
+]
+
+def main(bytecode=False):
+    directories = {'source': tempfile.mkdtemp()}
+    if bytecode:
+        directories['bytecode'] = tempfile.mkdtemp()
+    try:
+        for kind, directory in directories.items():
+            build_zip(directory, bytecode=(kind == 'bytecode'))
+        print(("{:<40}" + " {:>10}"*len(directories)).format('statement', *directories))
+        for label, setup, statement in STATEMENTS:
+            times = [time_statement(statement, directory, setup)
+                     for directory in directories.values()]
+            print(("{:<40}" + " {:>8.1f}ms"*len(times)).format(label, *times))
+    finally:
+        for directory in directories.values():
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main(bytecode='--bytecode' in sys.argv)
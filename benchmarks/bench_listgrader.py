@@ -0,0 +1,121 @@
+"""
+Benchmarks grading ListGraders of formulas, counting the evaluations of the
+student's inputs as well as timing the grading: unordered lists, and ordered
+lists in which later inputs depend on the first through sibling variables.
+Also counts the subgrader checks executed and skipped when grading against
+many alternative lists of answers.
+
+Run from the repository root:
+    python benchmarks/bench_listgrader.py
+"""
+import os
+import itertools
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitxgraders import ListGrader, FormulaGrader
+
+def counted(x):
+    """The identity function, counting its calls"""
+    counted.calls += 1
+    return x
+counted.calls = 0
+
+def formula_list(size, distinct):
+    """
+    A ListGrader of size formulas (with only distinct different answers), and a
+    correct submission in shuffled order that calls counted once per evaluation.
+    """
+    answers = ['x^2 + {}*x'.format(k % distinct) for k in range(size)]
+    student_input = ['f(x)^2 + {}*x'.format(k % distinct) for k in range(size)]
+    random.shuffle(student_input)
+    grader = ListGrader(
+        answers=answers,
+        subgraders=FormulaGrader(variables=['x'], user_functions={'f': counted})
+    )
+    return grader, student_input
+
+def sibling_list(size):
+    """
+    An ordered ListGrader of size formulas, all but the first of which refer to
+    the first as sibling_1, and a correct submission whose first input calls
+    counted once per evaluation.
+    """
+    answers = ['x^2'] + ['sibling_1 + {}*x'.format(k) for k in range(1, size)]
+    student_input = ['f(x)^2'] + ['x^2 + {}*x'.format(k) for k in range(1, size)]
+    grader = ListGrader(
+        answers=answers,
+        subgraders=FormulaGrader(variables=['x'], user_functions={'f': counted}),
+        ordered=True
+    )
+    return grader, student_input
+
+def alternative_lists(size, ordered):
+    """
+    A ListGrader of size formulas with many alternative lists of answers (every
+    ordering if ordered, otherwise every choice of signs), and a correct
+    submission matching a random one of them.
+    """
+    formulas = ['x^{}'.format(k) for k in range(1, size + 1)]
+    if ordered:
+        answers = [list(perm) for perm in itertools.permutations(formulas)]
+    else:
+        answers = [[sign + formula for sign, formula in zip(signs, formulas)]
+                   for signs in itertools.product(['', '-'], repeat=size)]
+    grader = ListGrader(
+        answers=tuple(answers),
+        subgraders=FormulaGrader(variables=['x']),
+        ordered=ordered
+    )
+    student_input = random.choice(answers)
+    # Without sharing or skipping, every answer in every list is checked against
+    # every input if unordered, or against its own input if ordered
+    all_checks = len(answers) * (size if ordered else size**2)
+    return grader, student_input, all_checks
+
+def main_alternatives(number=5):
+    print("\n{:<40} {:>12} {:>12} {:>12}".format('alternative lists of answers', 'checks',
+                                                 'skipped', 'time'))
+    for ordered, sizes in [(True, [3, 4, 5]), (False, [3, 4, 5])]:
+        for size in sizes:
+            grader, student_input, all_checks = alternative_lists(size, ordered)
+            subgrader = grader.config['subgraders']
+            check = subgrader.check
+            def counted_check(*args, **kwargs):
+                counted_check.calls += 1
+                return check(*args, **kwargs)
+            counted_check.calls = 0
+            subgrader.check = counted_check
+            time = timeit.timeit(lambda: grader(None, student_input), number=number)
+            checks = counted_check.calls // number
+            print("{:<40} {:>12} {:>12} {:>10.1f}ms".format(
+                '{} {} formulas, {} lists'.format('ordered' if ordered else 'unordered',
+                                                  size, len(grader.config['answers'])),
+                checks, all_checks - checks, 1e3*time/number))
+
+def main_siblings(number=5):
+    print("\n{:<40} {:>12} {:>12}".format('ordered list with siblings', 'evaluations', 'time'))
+    for size in [5, 10, 20]:
+        grader, student_input = sibling_list(size)
+        counted.calls = 0
+        time = timeit.timeit(lambda: grader(None, student_input), number=number)
+        print("{:<40} {:>12} {:>10.1f}ms".format(
+            '{} formulas'.format(size), counted.calls // number, 1e3*time/number))
+
+def main(number=5):
+    print("{:<40} {:>12} {:>12}".format('unordered list', 'evaluations', 'time'))
+    for size, distinct in [(5, 5), (10, 10), (10, 2), (20, 20)]:
+        grader, student_input = formula_list(size, distinct)
+        counted.calls = 0
+        time = timeit.timeit(lambda: grader(None, student_input), number=number)
+        print("{:<40} {:>12} {:>10.1f}ms".format(
+            '{} formulas, {} distinct'.format(size, distinct),
+            counted.calls // number, 1e3*time/number))
+
+if __name__ == '__main__':
+    main()
+    main_siblings()
+    main_alternatives()
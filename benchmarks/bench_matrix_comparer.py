@@ -0,0 +1,75 @@
+"""
+Benchmarks MatrixEntryComparer (the default comparer of MatrixGrader when
+entry_partial_credit is set), comparing entrywise_within_tolerance against
+within_tolerance applied to each entry with np.vectorize, on its own and as
+part of grading a matrix.
+
+Run from the repository root:
+    python benchmarks/bench_matrix_comparer.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitxgraders import MatrixGrader, RealMatrices, ComplexMatrices
+from mitxgraders.comparers import comparers
+from mitxgraders.helpers.calc import within_tolerance
+
+def vectorized_within_tolerance(x, y, tolerance):
+    """The comparison previously made by MatrixEntryComparer"""
+    return np.vectorize(lambda a, b: within_tolerance(a, b, tolerance))(x, y)
+
+def samples(shape, n_evals, dtype):
+    """n_evals pairs of arrays of the given shape, differing slightly"""
+    x = np.random.normal(size=(n_evals,) + shape).astype(dtype)
+    if dtype is complex:
+        x += 1j * np.random.normal(size=x.shape)
+    return x, x * (1 + 1e-6)
+
+def main_grading(number=20):
+    print("\n{:<32} {:>12} {:>12} {:>8}".format('grading a matrix', 'vectorize',
+                                                'entrywise', 'speedup'))
+    for size in [2, 4, 8]:
+        grader = MatrixGrader(
+            answers='A*B',
+            variables=['A', 'B'],
+            sample_from={'A': ComplexMatrices(shape=[size, size]),
+                         'B': RealMatrices(shape=[size, size])},
+            samples=10,
+            entry_partial_credit='proportional'
+        )
+        entrywise = comparers.entrywise_within_tolerance
+        try:
+            comparers.entrywise_within_tolerance = vectorized_within_tolerance
+            reference = timeit.timeit(lambda: grader(None, 'A*B'), number=number)
+        finally:
+            comparers.entrywise_within_tolerance = entrywise
+        new = timeit.timeit(lambda: grader(None, 'A*B'), number=number)
+        print("{:<32} {:>10.2f}ms {:>10.2f}ms {:>7.2f}x".format(
+            '{0}x{0} complex, 10 samples'.format(size), 1e3*reference/number,
+            1e3*new/number, reference/new))
+
+def main(number=200):
+    print("{:<32} {:>12} {:>12} {:>8}".format('entry comparisons', 'vectorize',
+                                              'entrywise', 'speedup'))
+    for dtype in [float, complex]:
+        for shape in [(4, 4), (10, 10)]:
+            for tolerance in [1e-6, '0.01%']:
+                x, y = samples(shape, 10, dtype)
+                reference = timeit.timeit(lambda: vectorized_within_tolerance(x, y, tolerance),
+                                          number=number)
+                new = timeit.timeit(
+                    lambda: comparers.entrywise_within_tolerance(x, y, tolerance),
+                    number=number)
+                print("{:<32} {:>10.3f}ms {:>10.3f}ms {:>7.1f}x".format(
+                    '{} {}x{}, tolerance {}'.format(dtype.__name__, shape[0], shape[1],
+                                                    tolerance),
+                    1e3*reference/number, 1e3*new/number, reference/new))
+
+if __name__ == '__main__':
+    main()
+    main_grading()
@@ -0,0 +1,44 @@
+"""
+Benchmarks parsing of mathematical expressions with the recursive descent
+engine against the reference pyparsing grammar. Caching is disabled, so every
+call parses from scratch.
+
+Run from the repository root:
+    python benchmarks/bench_parser.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitxgraders.helpers.calc.expressions import MathParser
+
+def matrix(dim):
+    """A dim by dim matrix of formulas"""
+    rows = ['[' + ', '.join('x_{}*sin(y)^2 - {}'.format(i, j) for j in range(dim)) + ']'
+            for i in range(dim)]
+    return '[' + ', '.join(rows) + ']'
+
+EXPRESSIONS = [
+    'm*(1-sin(2*m))',
+    '(cos(theta)*[[1,0],[0,1]]+i*sin(theta)*[[0,1],[1,0]])*kronecker(n,0)',
+    '(1/16)* z*(2*I)*(2*C)^3*v/(u*C*v) + x*A*B*u',
+    matrix(4),
+    matrix(8),
+]
+
+def main(number=100):
+    engines = {engine: MathParser(cache_size=0, error_cache_size=0, engine=engine)
+               for engine in MathParser.engines}
+    print("{:<40} {:>12} {:>12} {:>8}".format('expression', 'pyparsing', 'descent', 'speedup'))
+    for expression in EXPRESSIONS:
+        timings = {engine: timeit.timeit(lambda: parser.parse(expression), number=number)
+                   for engine, parser in engines.items()}
+        label = expression if len(expression) < 40 else expression[:36] + '...'
+        print("{:<40} {:>10.1f}us {:>10.1f}us {:>7.1f}x".format(
+            label, 1e6*timings['pyparsing']/number, 1e6*timings['descent']/number,
+            timings['pyparsing']/timings['descent']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmarks generating variable samples with gen_symbols_samples, including
+chains of DependentSamplers and matrix sampling sets.
+
+Run from the repository root:
+    python benchmarks/bench_sampling.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitxgraders.helpers.calc import DEFAULT_FUNCTIONS, DEFAULT_SUFFIXES, DEFAULT_VARIABLES
+from mitxgraders.sampling import (
+    RealInterval, IntegerRange, ComplexRectangle, DependentSampler, gen_symbols_samples)
+from mitxgraders.matrixsampling import RealMatrices, SquareMatrices
+
+def chain(length):
+    """
+    Symbols and sampling sets for x, followed by a chain of dependent samplers
+    y0 = x + 1, y1 = y0 + 1, ..., listed last to first.
+    """
+    symbols = ['x'] + ['y{}'.format(i) for i in range(length)]
+    sample_from = {'x': RealInterval()}
+    for i in reversed(range(length)):
+        previous = 'y{}'.format(i - 1) if i else 'x'
+        sample_from['y{}'.format(i)] = DependentSampler(formula=previous + ' + 1')
+    return symbols, sample_from
+
+CASES = [
+    ('independent (real, integer, complex)',
+     (['x', 'n', 'z'], {'x': RealInterval(), 'n': IntegerRange(), 'z': ComplexRectangle()})),
+    ('chain of 3 dependent samplers', chain(3)),
+    ('chain of 10 dependent samplers', chain(10)),
+    ('chain of 20 dependent samplers', chain(20)),
+    ('3 real 3x3 matrices',
+     (['A', 'B', 'C'], {name: RealMatrices(shape=(3, 3)) for name in 'ABC'})),
+    ('3 4x4 matrices with zero determinant',
+     (['A', 'B', 'C'], {name: SquareMatrices(dimension=4, determinant=0) for name in 'ABC'})),
+    ('3 4x4 hermitian matrices with unit determinant',
+     (['A', 'B', 'C'], {name: SquareMatrices(dimension=4, symmetry='hermitian', determinant=1)
+                        for name in 'ABC'})),
+]
+
+def main(number=20):
+    print("{:<48} {:>8} {:>12}".format('symbols', 'samples', 'time'))
+    for label, (symbols, sample_from) in CASES:
+        for samples in [5, 50]:
+            time = timeit.timeit(
+                lambda: gen_symbols_samples(symbols, samples, sample_from, DEFAULT_FUNCTIONS,
+                                            DEFAULT_SUFFIXES, DEFAULT_VARIABLES),
+                number=number)
+            print("{:<48} {:>8} {:>10.1f}us".format(label, samples, 1e6*time/number))
+
+if __name__ == '__main__':
+    main()
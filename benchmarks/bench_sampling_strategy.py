@@ -0,0 +1,63 @@
+"""
+Estimates how often FormulaGrader accepts a wrong answer that agrees with the
+correct answer on part of the sampling domain, for each sampling_strategy and
+a range of sample counts. Use this to choose the smallest number of samples
+that makes a false accept acceptably unlikely.
+
+Run from the repository root:
+    python benchmarks/bench_sampling_strategy.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mitxgraders import FormulaGrader
+
+# (description, config, wrong answer)
+CASES = [
+    ('x vs abs(x) on [-1, 1]',
+     {'answers': 'abs(x)', 'variables': ['x'], 'sample_from': {'x': [-1, 1]}},
+     'x'),
+    ('x vs max(x, y) on [0, 1]^2',
+     {'answers': 'max(x, y)', 'variables': ['x', 'y'],
+      'sample_from': {'x': [0, 1], 'y': [0, 1]}},
+     'x'),
+    ('x*y+z vs x*abs(y)+z on [-1, 1]^3',
+     {'answers': 'x*abs(y) + z', 'variables': ['x', 'y', 'z'],
+      'sample_from': {'x': [-1, 1], 'y': [-1, 1], 'z': [-1, 1]}},
+     'x*y + z'),
+    ('0.7 vs max(x, 0.7) on [0, 1]',
+     {'answers': 'max(x, 0.7)', 'variables': ['x'], 'sample_from': {'x': [0, 1]}},
+     '0.7'),
+]
+
+STRATEGIES = ['random', 'sobol', 'halton']
+SAMPLES = [2, 3, 4, 5, 8]
+
+def false_accept_rate(config, wrong_answer, trials):
+    """The fraction of trials in which the wrong answer is graded correct"""
+    grader = FormulaGrader(config)
+    accepted = sum(grader(None, wrong_answer)['ok'] is True for _ in range(trials))
+    return accepted / trials
+
+def main(trials=2000):
+    for description, config, wrong_answer in CASES:
+        print("\n" + description)
+        print(("{:>8}" + " {:>10}"*len(STRATEGIES)).format('samples', *STRATEGIES))
+        for samples in SAMPLES:
+            rates = [false_accept_rate(dict(config, samples=samples, sampling_strategy=strategy),
+                                       wrong_answer, trials)
+                     for strategy in STRATEGIES]
+            print(("{:>8}" + " {:>10.4f}"*len(rates)).format(samples, *rates))
+
+    print("\nTime to grade x*abs(y) + z with 5 samples")
+    config, wrong_answer = CASES[2][1:]
+    for strategy in STRATEGIES:
+        grader = FormulaGrader(dict(config, samples=5, sampling_strategy=strategy))
+        time = timeit.timeit(lambda: grader(None, 'x*abs(y) + z'), number=200)
+        print("{:>8} {:>10.1f}us".format(strategy, 1e6*time/200))
+
+if __name__ == '__main__':
+    main()
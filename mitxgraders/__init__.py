@@ -20,17 +20,70 @@ except ImportError:
     raise ImportError("External dependency 'voluptuous' not found;"
                       " see https://github.com/mitodl/mitx-grading-library#faq")
 
-# All modules defining grading classes must set __all__ to specify
-# which classes are imported with the package
-from mitxgraders.stringgrader import *
-from mitxgraders.listgrader import *
-from mitxgraders.formulagrader import *
-from mitxgraders.sampling import *
-from mitxgraders.matrixsampling import *
 from mitxgraders.exceptions import ConfigError, StudentFacingError, InvalidInput, MissingInput
-from mitxgraders.helpers.calc import *
-from mitxgraders.comparers import *
-from mitxgraders.attemptcredit import *
+
+# Public names, grouped by the module that defines them. These are imported on
+# first access (PEP 562), so that a problem that only uses StringGrader does not
+# pay for importing NumPy, pyparsing and the rest of the library. Any module
+# added here must list these names in its __all__.
+_PUBLIC_NAMES = {
+    'mitxgraders.stringgrader': ['StringGrader'],
+    'mitxgraders.listgrader': ['ListGrader', 'SingleListGrader'],
+    'mitxgraders.formulagrader': [
+        'NumericalGrader', 'FormulaGrader', 'MatrixGrader', 'IntegralGrader',
+        'SumGrader', 'IntervalGrader'
+    ],
+    'mitxgraders.sampling': [
+        'RealInterval', 'IntegerRange', 'DiscreteSet', 'ComplexRectangle',
+        'ComplexSector', 'SpecificFunctions', 'RandomFunction', 'DependentSampler'
+    ],
+    'mitxgraders.matrixsampling': [
+        'RealVectors', 'ComplexVectors', 'RealMatrices', 'ComplexMatrices',
+        'RealTensors', 'ComplexTensors', 'IdentityMatrixMultiples', 'SquareMatrices',
+        'OrthogonalMatrices', 'UnitaryMatrices'
+    ],
+    'mitxgraders.helpers.calc': [
+        'parse', 'evaluator', 'DEFAULT_VARIABLES', 'DEFAULT_FUNCTIONS',
+        'DEFAULT_SUFFIXES', 'METRIC_SUFFIXES', 'pauli', 'cartesian_xyz',
+        'cartesian_ijk', 'within_tolerance', 'MathArray', 'identity',
+        'specify_domain', 'CalcError'
+    ],
+    'mitxgraders.comparers': [
+        'EqualityComparer', 'MatrixEntryComparer', 'equality_comparer',
+        'congruence_comparer', 'eigenvector_comparer', 'between_comparer',
+        'vector_span_comparer', 'vector_phase_comparer', 'Comparer',
+        'CorrelatedComparer', 'LinearComparer'
+    ],
+    'mitxgraders.attemptcredit': ['LinearCredit', 'GeometricCredit', 'ReciprocalCredit'],
+}
+_LAZY_IMPORTS = {name: module
+                 for module, names in _PUBLIC_NAMES.items()
+                 for name in names}
+
+# Submodules are also made available as attributes of the package on demand
+_SUBMODULES = [
+    'attemptcredit', 'baseclasses', 'comparers', 'exceptions', 'formulagrader',
+    'helpers', 'listgrader', 'matrixsampling', 'plugins', 'sampling',
+    'stringgrader', 'version'
+]
+
+__all__ = (['ConfigError', 'StudentFacingError', 'InvalidInput', 'MissingInput',
+            'voluptuous'] + list(_LAZY_IMPORTS) + _SUBMODULES)
+
+def __getattr__(name):
+    """Import public names and submodules when they are first accessed"""
+    import importlib
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(__name__ + "." + name)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
 def import_plugins():
     """Imports all plugins into the global namespace"""
@@ -54,8 +107,10 @@ def import_plugins():
         # for this package
         if hasattr(mod, "__all__"):
             globals().update({name: mod.__dict__[name] for name in mod.__all__})
+            __all__.extend(mod.__all__)
 
     globals().update({'loaded_from': "mitxgraders directory"})
+    __all__.append('loaded_from')
 
 
 def import_zip_plugins():  # pragma: no cover
@@ -86,8 +141,10 @@ def import_zip_plugins():  # pragma: no cover
         # for this package
         if hasattr(mod, "__all__"):
             globals().update({name: mod.__dict__[name] for name in mod.__all__})
+            __all__.extend(mod.__all__)
 
     globals().update({'loaded_from': "python_lib.zip"})
+    __all__.append('loaded_from')
 
 
 # Import all the plugins
@@ -48,13 +48,15 @@ Correlated Comparers
 See ./baseclasses.py and ./linear_comparer.py for examples.
 """
 from numbers import Number
+from functools import partial
 import numpy as np
 
 from voluptuous import Schema, Required, Any, Range, All
 
 from mitxgraders.exceptions import InputTypeError, StudentFacingError
 from mitxgraders.helpers.validatorfuncs import is_callable, Nullable
-from mitxgraders.helpers.calc.mathfuncs import is_nearly_zero
+from mitxgraders.helpers.calc.mathfuncs import (is_nearly_zero, within_tolerance,
+                                              entrywise_within_tolerance)
 from mitxgraders.helpers.calc.math_array import are_same_length_vectors, is_vector
 from mitxgraders.comparers.baseclasses import Comparer, CorrelatedComparer
 
@@ -209,6 +211,22 @@ class MatrixEntryComparer(CorrelatedComparer):
         
         return format_string.format(error_locations=formatted_locs)
 
+    @staticmethod
+    def compare_entries(expected_evals, student_evals, utils):
+        """
+        Returns a boolean array comparing each entry of the student evaluations
+        with the corresponding entry of the expected evaluations.
+
+        The stock utils.within_tolerance is applied to all entries at once with
+        entrywise_within_tolerance; any other is applied to each pair of entries.
+        """
+        check = utils.within_tolerance
+        if (isinstance(check, partial) and check.func is within_tolerance
+                and not check.args and list(check.keywords) == ['tolerance']):
+            return entrywise_within_tolerance(expected_evals, student_evals,
+                                              check.keywords['tolerance'])
+        return np.vectorize(check, otypes=[bool])(expected_evals, student_evals)
+
     @staticmethod
     def validate(expected_evals, student_evals, utils):
         for x, y in zip(expected_evals, student_evals):
@@ -221,10 +239,9 @@ class MatrixEntryComparer(CorrelatedComparer):
         transform = self.config['transform']
         expected_evals = [transform(x) for x in expected_evals]
         student_evals = [transform(x) for x in student_evals]
-        vec_within_tol = np.vectorize(utils.within_tolerance)
         # comparisons_by_eval is a boolean array of entry-by-entry comparisons,
         # one for each comparison. Its numpy shape is (n_evals, *eval_shape)
-        comparisons_by_eval = vec_within_tol(expected_evals, student_evals)
+        comparisons_by_eval = self.compare_entries(expected_evals, student_evals, utils)
         comparisons_summary = np.all(comparisons_by_eval, axis=0)
 
         num_entries = comparisons_summary.size
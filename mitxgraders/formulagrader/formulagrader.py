@@ -6,7 +6,7 @@ from voluptuous import Schema, Required, Any, All, Invalid, Length
 from mitxgraders.comparers import equality_comparer
 from mitxgraders.sampling import schema_user_functions_no_random, DependentSampler
 from mitxgraders.baseclasses import ItemGrader
-from mitxgraders.helpers.calc import evaluator, DEFAULT_VARIABLES
+from mitxgraders.helpers.calc import evaluator, parse, DEFAULT_VARIABLES
 from mitxgraders.helpers.validatorfuncs import NonNegative, PercentageString, is_callable_with_args
 from mitxgraders.helpers.math_helpers import MathMixin
 from mitxgraders.helpers.calc.mathfuncs import merge_dicts
@@ -74,6 +74,20 @@ class FormulaGrader(ItemGrader, MathMixin):
         failable_evals (int): The number of samples that may disagree before the student's
             answer is marked incorrect (default 0). Ignored by correlated comparers.
 
+        shared_samples (bool): Whether to compare the student's input against all answers
+            using the same samples (default False). The student's input is then evaluated
+            only once per sample, rather than once per sample for every answer, which
+            makes grading faster for problems with multiple answers.
+
+        sample_pool (int): If nonzero, the number of sets of samples in a fixed pool, from
+            which the samples for each submission are drawn (default 0). Evaluations of the
+            answers on the pool are computed once and cached, so that only the student's
+            input is evaluated for each submission. Implies shared_samples.
+
+        sample_pool_dir (str): A directory in which to store the cached evaluations for
+            sample_pool, so that they can be reused by other processes (default None).
+            Files in it are unpickled, so only the grader should be able to write to it.
+
         answers: A single "expect" value, a dictionary, or a tuple thereof, as
             described in the documentation for ItemGraders.
 
@@ -159,7 +173,8 @@ class FormulaGrader(ItemGrader, MathMixin):
         # Append FormulaGrader-specific options
         return schema.extend({
             Required('allow_inf', default=False): bool,
-            Required('max_array_dim', default=0): NonNegative(int)  # Do not use this; use MatrixGrader instead
+            Required('max_array_dim', default=0): NonNegative(int),  # Do not use this; use MatrixGrader instead
+            Required('shared_samples', default=False): bool
         })
 
     schema_expect = Schema({
@@ -231,6 +246,21 @@ class FormulaGrader(ItemGrader, MathMixin):
         # Perform standard math validation
         self.validate_math_config()
 
+    def check(self, answers, student_input, **kwargs):
+        """
+        Compares student input to each answer in answers. If shared_samples is set,
+        the samples and evaluations for this submission are shared between answers.
+
+        An unordered ListGrader also shares samples and evaluations of each input
+        between all of its answers, by passing a shared_evaluations dictionary
+        {'answers': (answer, ...)} holding every answer that the input is checked
+        against.
+        """
+        if self.config['shared_samples'] or self.config['sample_pool']:
+            answers = self.config['answers'] if answers is None else answers
+            kwargs.setdefault('shared_evaluations', {'answers': answers})
+        return super(FormulaGrader, self).check(answers, student_input, **kwargs)
+
     def check_response(self, answer, student_input, **kwargs):
         """Check the student response against a given answer"""
         return self.check_math_response(answer, student_input, **kwargs)
@@ -274,11 +304,33 @@ class FormulaGrader(ItemGrader, MathMixin):
             in config. The set is a record of mathematical functions used in the
             student's input.
         """
-        funclist = self.functions.copy()
-        varlist = {}
-
         comparer_params_evals = []
         student_evals = []
+        for comparer_params_eval, student_eval in self.iter_evaluations(
+                comparer_params, student_input, sibling_formulas, var_samples, func_samples):
+            comparer_params_evals.append(comparer_params_eval)
+            student_evals.append(student_eval)
+
+        return comparer_params_evals, student_evals, self.get_functions_used(student_input)
+
+    @staticmethod
+    def get_functions_used(student_input):
+        """Returns the set of functions used in the student's input"""
+        if student_input.strip() == '':
+            return set()
+        return parse(student_input).functions_used
+
+    def iter_evaluations(self, comparer_params, student_input, sibling_formulas,
+                         var_samples, func_samples):
+        """
+        Evaluate the comparer parameters and student inputs for the given samples,
+        one sample at a time, so that evaluation can stop as soon as the outcome is
+        known.
+
+        Yields a tuple (comparer_params_eval, student_eval) for each sample.
+        """
+        funclist = self.functions.copy()
+        varlist = {}
 
         # Create a list of instructor and sibling variables to remove from student evaluation
         sibling_vars = [key for key in sibling_formulas]
@@ -288,6 +340,17 @@ class FormulaGrader(ItemGrader, MathMixin):
                 var_blacklist.append(var)
         var_blacklist += sibling_vars
 
+        # Where possible, evaluate everything over all samples at once.
+        # If any expression can't be vectorized, evaluate sample by sample.
+        comparer_params_columns = [
+            self.eval_vectorized_samples(param, var_samples, func_samples)
+            for param in comparer_params
+        ]
+        student_column = None
+        if all(column is not None for column in comparer_params_columns):
+            student_column = self.eval_vectorized_samples(student_input, var_samples,
+                                                          func_samples, var_blacklist)
+
         for i in range(self.config['samples']):
             # Update the functions and variables listings with this sample
             funclist.update(func_samples[i])
@@ -302,16 +365,21 @@ class FormulaGrader(ItemGrader, MathMixin):
                                  allow_inf=self.config['allow_inf'])
 
             # Compute expressions
-            comparer_params_eval = self.eval_and_validate_comparer_params(scoped_eval, comparer_params)
-            comparer_params_evals.append(comparer_params_eval)
+            if student_column is None:
+                comparer_params_eval = self.eval_and_validate_comparer_params(scoped_eval,
+                                                                              comparer_params)
+            else:
+                comparer_params_eval = [column[i] for column in comparer_params_columns]
 
             # Before performing student evaluation, scrub the sibling and instructor
             # variables so that students can't use them
             for key in var_blacklist:
                 del varlist[key]
 
-            student_eval, meta = scoped_eval(student_input)
-            student_evals.append(student_eval)
+            if student_column is None:
+                student_eval, _ = scoped_eval(student_input)
+            else:
+                student_eval = student_column[i]
 
             if self.config['debug']:
                 # Put the siblings and instructor variables back in for the debug output
@@ -320,40 +388,188 @@ class FormulaGrader(ItemGrader, MathMixin):
                                    comparer_params_eval=comparer_params_eval,
                                    student_eval=student_eval)
 
-        return comparer_params_evals, student_evals, meta.functions_used
+            yield comparer_params_eval, student_eval
 
-    def raw_check(self, answer, student_input, **kwargs):
-        """Perform the numerical check of student_input vs answer"""
+    def eval_vectorized_samples(self, expression, var_samples, func_samples, var_blacklist=()):
+        """
+        Try to evaluate an expression over all samples at once (see
+        MathExpression.eval_vectorized).
 
-        # Extract sibling formulas to allow for sampling
-        siblings = kwargs.get('siblings', None)
+        Returns a list of evaluations (one per sample), or None if the expression
+        should be evaluated sample by sample instead. In particular, None is
+        returned whenever evaluation might raise an error, so that errors are
+        raised by the usual per-sample evaluation.
+        """
+        if expression is None or expression.strip() == '':
+            return None
+        parsed = parse(expression)
+
+        # Random functions change from sample to sample
+        if any(func in func_samples[0] for func in parsed.functions_used):
+            return None
+        if not all(func in self.functions for func in parsed.functions_used):
+            return None
+        if not all(suffix in self.suffixes for suffix in parsed.suffixes_used):
+            return None
+        available = [var for var in var_samples[0] if var not in var_blacklist]
+        if not all(var in available for var in parsed.variables_used):
+            return None
+
+        samples = self.config['samples']
+        var_columns = {var: [sample[var] for sample in var_samples]
+                       for var in parsed.variables_used}
+        return parsed.eval_vectorized(var_columns, self.functions, self.suffixes, samples,
+                                      allow_inf=self.config['allow_inf'])
+
+    def get_required_siblings(self, comparer_params):
+        """
+        Returns a list of the sibling variables that may be needed to evaluate
+        comparer_params, including those used by DependentSamplers. This might
+        include some extra variable names, but no matter.
+        """
         # Find sibling variables used in comparer parameters
-        comparer_params = answer['expect']['comparer_params']
         required_siblings = self.get_used_vars(comparer_params)
         # Add in any sibling variables used in DependentSamplers
         samplers = [self.config['sample_from'][x]
                     for x in self.config['sample_from']
                     if isinstance(self.config['sample_from'][x], DependentSampler)]
         sampler_vars = sum((x.config['depends'] for x in samplers), [])
-        required_siblings = list(set(required_siblings).union(set(sampler_vars)))
-        # required_siblings might include some extra variable names, but no matter
-        sibling_formulas = self.get_sibling_formulas(siblings, required_siblings)
-
-        # Generate samples, using student input, sibling formulas and any comparer
-        # parameters (including answers) as the list of expressions to check
-        var_samples, func_samples = self.gen_var_and_func_samples(student_input,
-                                                                  sibling_formulas,
-                                                                  comparer_params)
-
-        (comparer_params_evals,
-         student_evals,
-         functions_used) = self.gen_evaluations(comparer_params, student_input,
-                                                sibling_formulas, var_samples, func_samples)
+        return list(set(required_siblings).union(set(sampler_vars)))
 
-        # Get the comparer function
+    def eval_samples(self, expression, var_samples, func_samples, var_blacklist=(),
+                     max_array_dim=None):
+        """
+        Evaluate an expression for each sample, all at once when possible.
+
+        Returns a tuple (evals, functions_used), where evals is a list of
+        evaluations, one per sample.
+        """
+        evals = self.eval_vectorized_samples(expression, var_samples, func_samples,
+                                             var_blacklist)
+        if evals is not None:
+            return evals, parse(expression).functions_used
+
+        funclist = self.functions.copy()
+        evals = []
+        functions_used = set()
+        for var_sample, func_sample in zip(var_samples, func_samples):
+            funclist.update(func_sample)
+            varlist = {key: value for key, value in var_sample.items()
+                       if key not in var_blacklist}
+            value, meta = evaluator(expression, varlist, funclist, self.suffixes,
+                                    max_array_dim, allow_inf=self.config['allow_inf'])
+            evals.append(value)
+            functions_used = meta.functions_used
+        return evals, functions_used
+
+    def gen_shared_evaluations(self, comparer_params, student_input, sibling_formulas,
+                               var_samples, func_samples, shared):
+        """
+        Like gen_evaluations, but reuses the evaluations stored in the shared dictionary
+        by previous answers for this submission, and stores new evaluations there.
+        """
+        param_evals = shared.setdefault('comparer_params_evals', {})
+        for param in comparer_params:
+            if param not in param_evals:
+                param_evals[param], _ = self.eval_samples(param, var_samples, func_samples,
+                                                          max_array_dim=float('inf'))
+
+        if 'student_evals' not in shared:
+            # Remove instructor and sibling variables from student evaluation
+            var_blacklist = [var for var in self.config['instructor_vars']
+                             if var in var_samples[0]]
+            var_blacklist += list(sibling_formulas)
+            shared['student_evals'], shared['functions_used'] = self.eval_samples(
+                student_input, var_samples, func_samples, var_blacklist,
+                max_array_dim=self.config['max_array_dim'])
+        student_evals = shared['student_evals']
+
+        comparer_params_evals = [[param_evals[param][i] for param in comparer_params]
+                                 for i in range(self.config['samples'])]
+
+        if self.config['debug']:
+            funclist = self.functions.copy()
+            for i in range(self.config['samples']):
+                funclist.update(func_samples[i])
+                self.log_eval_info(i, var_samples[i], funclist,
+                                   comparer_params_eval=comparer_params_evals[i],
+                                   student_eval=student_evals[i])
+
+        return comparer_params_evals, student_evals, shared['functions_used']
+
+    def gen_shared_samples(self, shared, student_input, siblings, context=None):
+        """
+        Generate one set of samples for all answers, using the comparer parameters
+        of every answer, and store them in the shared dictionary. If sample_pool is
+        set, the samples and evaluations of the comparer parameters are drawn from
+        the pool when possible. Otherwise, samples are shared through the sibling
+        context, if provided (see MathMixin.gen_context_samples).
+        """
+        all_params = [param
+                      for answer in shared['answers']
+                      for expect in answer['expect']
+                      for param in expect['comparer_params']]
+        required_siblings = self.get_required_siblings(all_params)
+        shared['sibling_formulas'] = self.get_sibling_formulas(siblings, required_siblings)
+
+        entry = None
+        if self.config['sample_pool'] and not shared['sibling_formulas']:
+            def evaluate(var_samples, func_samples):
+                return {
+                    param: self.eval_samples(param, var_samples, func_samples,
+                                             max_array_dim=float('inf'))[0]
+                    for param in all_params
+                }
+            entry = self.draw_from_sample_pool(all_params, student_input, evaluate)
+
+        if entry is None:
+            shared['var_samples'], shared['func_samples'] = self.gen_var_and_func_samples(
+                student_input, shared['sibling_formulas'], all_params, context=context)
+        else:
+            # Copy the pooled evaluations, so that they are not modified
+            shared['var_samples'], shared['func_samples'], param_evals = entry
+            shared['comparer_params_evals'] = param_evals.copy()
+
+    def raw_check(self, answer, student_input, **kwargs):
+        """Perform the numerical check of student_input vs answer"""
+
+        # Extract sibling formulas to allow for sampling
+        siblings = kwargs.get('siblings', None)
+        comparer_params = answer['expect']['comparer_params']
+        shared = kwargs.get('shared_evaluations', None)
+
+        if shared is None:
+            required_siblings = self.get_required_siblings(comparer_params)
+            sibling_formulas = self.get_sibling_formulas(siblings, required_siblings)
+
+            # Generate samples, using student input, sibling formulas and any comparer
+            # parameters (including answers) as the list of expressions to check
+            var_samples, func_samples = self.gen_var_and_func_samples(
+                student_input, sibling_formulas, comparer_params,
+                context=kwargs.get('sibling_context', None))
+
+            evaluations = self.iter_evaluations(comparer_params, student_input,
+                                                sibling_formulas, var_samples, func_samples)
+            functions_used = self.get_functions_used(student_input)
+        else:
+            if 'var_samples' not in shared:
+                self.gen_shared_samples(shared, student_input, siblings,
+                                        kwargs.get('sibling_context', None))
+
+            (comparer_params_evals,
+             student_evals,
+             functions_used) = self.gen_shared_evaluations(comparer_params, student_input,
+                                                           shared['sibling_formulas'],
+                                                           shared['var_samples'],
+                                                           shared['func_samples'],
+                                                           shared)
+            evaluations = zip(comparer_params_evals, student_evals)
+
+        # Get the comparer function, and compare samples until the outcome is known
         comparer = answer['expect']['comparer']
-        results = self.compare_evaluations(comparer_params_evals, student_evals,
-                                           comparer, self.get_comparer_utils())
+        results = self.compare_evaluation_stream(evaluations, comparer,
+                                                 self.get_comparer_utils(),
+                                                 self.config['failable_evals'])
 
         # Comparer function results might assign partial credit.
         # But the answer we're testing against might only merit partial credit.
@@ -5,7 +5,9 @@ Contains IntegralGrader, a class for grading an integral problem, consisting of
 and upper limits, and integration variable, and an integrand.
 """
 from functools import wraps
+import numpy as np
 from numpy import real, imag
+import abc
 from abc import abstractproperty
 from numbers import Number
 
@@ -18,11 +20,17 @@ from mitxgraders.exceptions import (InvalidInput, ConfigError,
 from mitxgraders.helpers.validatorfuncs import Positive, NonNegative, PercentageString
 from mitxgraders.helpers.math_helpers import MathMixin
 from mitxgraders.helpers.calc import evaluator, DEFAULT_VARIABLES, parse
+from mitxgraders.helpers.calc.expressions import evaluator_batch
 from mitxgraders.helpers.calc.mathfuncs import merge_dicts
+from mitxgraders.helpers.series import sum_series
+from mitxgraders.helpers.quadrature import gauss_legendre_integrate
 
 
 __all__ = ['IntegralGrader', 'SumGrader']
 
+# Number of terms of a sum to evaluate at once
+SUMMATION_CHUNK_SIZE = 1000
+
 def is_valid_variable_name(varname):
     """
     Tests if a variable name is valid.
@@ -150,6 +158,25 @@ class SummationGraderBase(AbstractGrader, MathMixin):
         
         return lower, upper, used_funcs
 
+    def eval_at_values(self, expression, dummy_var, values, varscope, funcscope):
+        """
+        Evaluates expression at each of the given values of the dummy variable
+        (the variable of integration or summation), over all values at once where
+        possible (see evaluator_batch). Returns the list of results.
+        """
+        # Only the variables used in the expression need a column of values;
+        # the remaining names are kept for the scope checks.
+        var_columns = dict.fromkeys(varscope)
+        for name in parse(expression).variables_used.intersection(varscope):
+            var_columns[name] = [varscope[name]] * len(values)
+        var_columns[dummy_var] = values
+        results, _ = evaluator_batch(expression,
+                                     var_columns,
+                                     len(values),
+                                     functions=funcscope,
+                                     suffixes=self.suffixes)
+        return results
+
     def structure_and_validate_input(self, student_input):
         """Validates and structures the received input against the expected input based on the configuration"""
         used_inputs = [key for key in self.true_input_positions
@@ -171,6 +198,13 @@ class SummationGraderBase(AbstractGrader, MathMixin):
 
         return structured_input
 
+    @abc.abstractmethod
+    def evaluate_author(self, answer, varlist, funclist):
+        """
+        Evaluate the author's integral/sum for a single sample, raising a ConfigError
+        if this fails.
+        """
+
     def validate_user_dummy_variable(self, varname):
         """Check the dummy variable has no other meaning and is a valid variable name"""
         if varname in self.functions or varname in self.random_funcs or varname in self.constants:
@@ -213,13 +247,25 @@ class SummationGraderBase(AbstractGrader, MathMixin):
         # This is a simpler version of the raw_check function from FormulaGrader,
         # which is complicated by sibling variables and comparers
         
-        # Generate samples
-        var_samples, func_samples = self.gen_var_and_func_samples(answer, student_input)
-        
+        # Generate samples, drawing them from the sample pool if possible
+        entry = None
+        if self.config['sample_pool']:
+            def evaluate(var_samples, func_samples):
+                return [self.evaluate_author(answer, var_sample.copy(),
+                                             merge_dicts(self.functions, func_sample))
+                        for var_sample, func_sample in zip(var_samples, func_samples)]
+            entry = self.draw_from_sample_pool(answer, student_input, evaluate)
+        if entry is None:
+            var_samples, func_samples = self.gen_var_and_func_samples(answer, student_input)
+            author_evals = None
+        else:
+            var_samples, func_samples, author_evals = entry
+
         # Evaluate integrals/sums
         (instructor_evals,
          student_evals,
-         functions_used) = self.gen_evaluations(answer, student_input, var_samples, func_samples)
+         functions_used) = self.gen_evaluations(answer, student_input, var_samples, func_samples,
+                                                author_evals=author_evals)
         
         # Compare results
         results = self.compare_evaluations(instructor_evals, student_evals,
@@ -300,7 +346,12 @@ class IntegralGrader(SummationGraderBase):
         integrator_options (dict): A dictionary of keyword-arguments that are passed
             directly to scipy.integrate.quad. See
             https://docs.scipy.org/doc/scipy-0.16.1/reference/generated/scipy.integrate.quad.html
-            for more information.
+            for more information. The special key 'method' chooses the integrator:
+                - 'quad' (default) uses scipy.integrate.quad
+                - 'gauss_legendre' evaluates the integrand on all nodes of
+                  Gauss-Legendre rules of increasing order at once, which is much
+                  faster for smooth integrands. Only the 'epsabs' and 'epsrel'
+                  options apply.
 
     Additional Configuration Options
     ================================
@@ -358,6 +409,7 @@ class IntegralGrader(SummationGraderBase):
             },
             Required('integrator_options', default={'full_output': 1}): {
                 Required('full_output', default=1): 1,
+                Required('method', default='quad'): Any('quad', 'gauss_legendre'),
                 Extra: object
             },
             Required('complex_integrand', default=False): bool,
@@ -391,9 +443,12 @@ class IntegralGrader(SummationGraderBase):
         ""
     )
 
-    def gen_evaluations(self, answer, student_input, var_samples, func_samples, **kwargs):
+    def gen_evaluations(self, answer, student_input, var_samples, func_samples,
+                        author_evals=None, **kwargs):
         """
         Evaluate the comparer parameters and student inputs for the given samples.
+        If author_evals is provided, it is used instead of evaluating the author's
+        answer for each sample.
 
         Returns:
             A tuple (list, list, set). The first two lists are instructor_evals
@@ -422,18 +477,10 @@ class IntegralGrader(SummationGraderBase):
             # Evaluate integrals. Error handling here is in two parts because
             # 1. custom error messages we've added
             # 2. scipy's warnings re-raised as error messages
-            try:
-                expected_re, expected_im, _ = self.evaluate_int(
-                    answer['integrand'],
-                    answer['lower'],
-                    answer['upper'],
-                    answer['integration_variable'],
-                    varscope=varlist,
-                    funcscope=funclist
-                )
-            except IntegrationError as error:
-                msg = "Integration Error with author's stored answer: {}"
-                raise ConfigError(msg.format(str(error)))
+            if author_evals is None:
+                expected_re, expected_im = self.evaluate_author(answer, varlist, funclist)
+            else:
+                expected_re, expected_im = author_evals[i]
 
             # Before performing student evaluation, scrub the instructor
             # variables so that students can't use them
@@ -486,6 +533,22 @@ class IntegralGrader(SummationGraderBase):
 
         return instructor_evals, student_evals, used_funcs
 
+    def evaluate_author(self, answer, varlist, funclist):
+        """Evaluate the author's integral, returning the real and imaginary results"""
+        try:
+            expected_re, expected_im, _ = self.evaluate_int(
+                answer['integrand'],
+                answer['lower'],
+                answer['upper'],
+                answer['integration_variable'],
+                varscope=varlist,
+                funcscope=funclist
+            )
+        except IntegrationError as error:
+            msg = "Integration Error with author's stored answer: {}"
+            raise ConfigError(msg.format(str(error)))
+        return expected_re, expected_im
+
     def evaluate_int(self, integrand_str, lower_str, upper_str, integration_var,
                      varscope=None, funcscope=None):
         varscope = {} if varscope is None else varscope
@@ -511,18 +574,25 @@ class IntegralGrader(SummationGraderBase):
                                  suffixes=self.suffixes)
             return value
 
+        options = self.config['integrator_options'].copy()
+        if options.pop('method') == 'gauss_legendre':
+            result_re, result_im = self.gauss_legendre_int(integrand_str, lower, upper,
+                                                           integration_var, varscope,
+                                                           funcscope, options)
+            return result_re, result_im, used_funcs
+
         # lazy load this module for performance reasons
         from scipy import integrate
 
         if self.config['complex_integrand']:
             integrand_re = lambda x: real(raw_integrand(x))
             integrand_im = lambda x: imag(raw_integrand(x))
-            result_re = integrate.quad(integrand_re, lower, upper, **self.config['integrator_options'])
-            result_im = integrate.quad(integrand_im, lower, upper, **self.config['integrator_options'])
+            result_re = integrate.quad(integrand_re, lower, upper, **options)
+            result_im = integrate.quad(integrand_im, lower, upper, **options)
         else:
             errmsg = "Integrand has evaluated to complex number but must evaluate to a real."
             integrand = check_output_is_real(raw_integrand, IntegrationError, errmsg)
-            result_re = integrate.quad(integrand, lower, upper, **self.config['integrator_options'])
+            result_re = integrate.quad(integrand, lower, upper, **options)
             result_im = (None, None, {'neval': None})
 
         # Restore the integration variable's initial value now that we are done integrating
@@ -531,6 +601,38 @@ class IntegralGrader(SummationGraderBase):
 
         return result_re, result_im, used_funcs
 
+    def gauss_legendre_int(self, integrand_str, lower, upper, integration_var,
+                           varscope, funcscope, options):
+        """
+        Integrate using Gauss-Legendre quadrature, evaluating the integrand at all
+        nodes of each rule at once. The real and imaginary parts are computed
+        together. Returns the real and imaginary results in the same format as
+        scipy.integrate.quad with full_output.
+        """
+        def integrand(nodes):
+            values = np.array(self.eval_at_values(integrand_str, integration_var,
+                                                  nodes, varscope, funcscope))
+            if values.ndim != 1 or values.dtype.kind not in 'fc':
+                raise IntegrationError("Integrand must evaluate to a number.")
+            if not self.config['complex_integrand'] and np.iscomplexobj(values):
+                raise IntegrationError("Integrand has evaluated to complex number "
+                                       "but must evaluate to a real.")
+            return values
+
+        integral, error, neval, message = gauss_legendre_integrate(
+            integrand, lower, upper,
+            epsabs=options.get('epsabs', 1.49e-8),
+            epsrel=options.get('epsrel', 1.49e-8))
+
+        result_re = (real(integral), error, {'neval': neval})
+        if self.config['complex_integrand']:
+            result_im = (imag(integral), error, {'neval': neval})
+        else:
+            result_im = (None, None, {'neval': None})
+        if message is not None:
+            result_re += (message,)
+        return result_re, result_im
+
 class SumGrader(SummationGraderBase):
     """
     Grades a student-entered summation by comparing numerically with
@@ -601,6 +703,16 @@ class SumGrader(SummationGraderBase):
 
         even_odd (int): Choose to sum every number (0), every odd number (1) or every even number (2).
 
+        infty_method (str): How to sum over infinite ranges (default 'truncate'):
+                            - 'truncate' sums every term up to infty_val
+                            - 'converge' sums terms in growing blocks up to infty_val,
+                              stopping once further terms no longer change the sum
+                            - 'accelerate' is as for 'converge', but if the first few
+                              dozen terms haven't converged, the sum of scalar series is
+                              extrapolated from them using Levin's u-transform. As
+                              extrapolated sums are only accurate to around 8 significant
+                              figures, the default tolerance becomes '1e-4%'.
+
     Additional Configuration Options
     ================================
     The configuration keys below are the same as used by FormulaGrader and
@@ -608,7 +720,7 @@ class SumGrader(SummationGraderBase):
         user_constants: same as FormulaGrader, but with additional default 'infty'
         whitelist
         blacklist
-        tolerance (default changed to 1e-12)
+        tolerance (default changed to 1e-12, or '1e-4%' if infty_method is 'accelerate')
         samples (default changed to 2)
         variables
         sample_from
@@ -658,10 +770,24 @@ class SumGrader(SummationGraderBase):
             Required('infty_val', default=1e3): Positive(Number),
             Required('infty_val_fact', default=80): Positive(Number),
             Required('even_odd', default=0): Any(0, 1, 2),
+            Required('infty_method', default='truncate'): Any('truncate', 'converge', 'accelerate'),
             Required('samples', default=2): Positive(int),  # default changed to 2
-            Required('tolerance', default=1e-12): Any(PercentageString, NonNegative(Number)),  # default changed to 1e-12
+            # default changed to 1e-12, or '1e-4%' for accelerated sums (see __init__)
+            Required('tolerance', default=None): Any(None, PercentageString, NonNegative(Number)),
         })
 
+    def __init__(self, config=None, **kwargs):
+        """
+        Configure the class as normal, then set the default tolerance, which
+        depends on infty_method
+        """
+        super(SumGrader, self).__init__(config, **kwargs)
+        if self.config['tolerance'] is None:
+            if self.config['infty_method'] == 'accelerate':
+                self.config['tolerance'] = '1e-4%'
+            else:
+                self.config['tolerance'] = 1e-12
+
     debug_appendix_eval_template = (
         "\n"
         "==============================================\n"
@@ -674,9 +800,12 @@ class SumGrader(SummationGraderBase):
         ""
     )
 
-    def gen_evaluations(self, answer, student_input, var_samples, func_samples, **kwargs):
+    def gen_evaluations(self, answer, student_input, var_samples, func_samples,
+                        author_evals=None, **kwargs):
         """
         Evaluate the comparer parameters and student inputs for the given samples.
+        If author_evals is provided, it is used instead of evaluating the author's
+        answer for each sample.
 
         Returns:
             A tuple (list, list, set). The first two lists are instructor_evals
@@ -702,19 +831,11 @@ class SumGrader(SummationGraderBase):
             funclist.update(func_samples[i])
             varlist.update(var_samples[i])
 
-            # Evaluate sums. Error handling here is to catch author errors.
-            try:
-                expected_eval, _ = self.evaluate_sum(
-                    answer['summand'],
-                    answer['lower'],
-                    answer['upper'],
-                    answer['summation_variable'],
-                    varscope=varlist,
-                    funcscope=funclist
-                )
-            except MITxError as error:
-                msg = "Summation Error with author's stored answer: {}"
-                raise ConfigError(msg.format(str(error)))
+            # Evaluate sums
+            if author_evals is None:
+                expected_eval = self.evaluate_author(answer, varlist, funclist)
+            else:
+                expected_eval = author_evals[i]
 
             # Before performing student evaluation, scrub the instructor
             # variables so that students can't use them
@@ -743,6 +864,22 @@ class SumGrader(SummationGraderBase):
 
         return instructor_evals, student_evals, used_funcs
 
+    def evaluate_author(self, answer, varlist, funclist):
+        """Evaluate the author's sum. Error handling here is to catch author errors."""
+        try:
+            expected_eval, _ = self.evaluate_sum(
+                answer['summand'],
+                answer['lower'],
+                answer['upper'],
+                answer['summation_variable'],
+                varscope=varlist,
+                funcscope=funclist
+            )
+        except MITxError as error:
+            msg = "Summation Error with author's stored answer: {}"
+            raise ConfigError(msg.format(str(error)))
+        return expected_eval
+
     def evaluate_sum(self, summand_str, lower_str, upper_str, summation_var,
                      varscope=None, funcscope=None):
         varscope = {} if varscope is None else varscope
@@ -770,18 +907,12 @@ class SumGrader(SummationGraderBase):
         if abs(upper) != float('inf') and int(upper) != upper:
             raise SummationError('Upper summation limit does not evaluate to an integer.')
 
-        def eval_summand(x):
+        def eval_terms(values):
             """
-            Helper function to evaluate the summand at the given value of the
-            summation variable.
+            Helper function to evaluate the summand at each of the given values
+            of the summation variable.
             """
-            varscope[summation_var] = x
-            value, _ = evaluator(summand_str,
-                                 variables=varscope,
-                                 functions=funcscope,
-                                 suffixes=self.suffixes)
-            del varscope[summation_var]
-            return value
+            return self.eval_at_values(summand_str, summation_var, values, varscope, funcscope)
 
         # Check if used_funcs includes a factorial function
         if 'fact' in used_funcs or 'factorial' in used_funcs:
@@ -790,13 +921,15 @@ class SumGrader(SummationGraderBase):
             infty_val = self.config['infty_val']
 
         # Compute the sum
-        result = self.perform_summation(eval_summand, lower, upper, self.config['even_odd'], infty_val)
+        result = self.perform_summation(eval_terms, lower, upper, self.config['even_odd'], infty_val,
+                                        batched=True, infty_method=self.config['infty_method'])
         
         # Return results
         return result, used_funcs
 
     @staticmethod
-    def perform_summation(eval_summand, lower, upper, even_odd, infty_val=1e3):
+    def perform_summation(eval_summand, lower, upper, even_odd, infty_val=1e3, batched=False,
+                          infty_method='truncate'):
         """
         Compute the value of a summation. Note that unlike integration, exchanging lower and upper doesn't
         change the value of a summation.
@@ -809,6 +942,14 @@ class SumGrader(SummationGraderBase):
             even_odd (int): Sum over all integers in the range (0), all odd integers in
                             the range (1) or all even integers in the range (2)
             infty_val (int): Value to use for infinity in limits (default 1e4)
+            batched (bool): If True, eval_summand instead takes a list of values of
+                            the summation variable and returns the list of
+                            corresponding summands, and is called on chunks of
+                            SUMMATION_CHUNK_SIZE terms (default False)
+            infty_method (str): How to sum over infinite ranges: 'truncate' sums every
+                                term up to infty_val, while 'converge' and 'accelerate'
+                                stop once the sum has converged (see sum_series)
+                                (default 'truncate')
             
         Returns:
             The result of the sum, in whatever format the eval_summand is provided. Note
@@ -819,6 +960,8 @@ class SumGrader(SummationGraderBase):
             lower, upper = upper, lower
             
         # Handle infinities
+        infinite_lower = lower == -float('inf')
+        infinite_upper = upper == float('inf')
         if lower == -float('inf'):
             lower = -infty_val
         if upper == float('inf'):
@@ -844,11 +987,34 @@ class SumGrader(SummationGraderBase):
         else:
             delta = 1
 
-        # Because the summand can be a vector/matrix/tensor and can also contain
-        # user-defined functions, we can't just use numpy vector math here. Have
-        # to for-loop it the old-fashioned way, and hope it's not too slow...
         # Note that we need to convert floats to integers for range.
-        evals = [eval_summand(n) for n in range(int(lower), int(upper + 1), delta)]
-        result = sum(evals)
+        values = range(int(lower), int(upper + 1), delta)
+        if batched:
+            eval_terms = eval_summand
+        else:
+            def eval_terms(chunk):
+                return [eval_summand(n) for n in chunk]
+
+        if infty_method != 'truncate' and (infinite_lower or infinite_upper):
+            # Sum outwards from the finite limit, or from 0 if both limits are infinite
+            if infinite_lower and infinite_upper:
+                split = -(values.start // delta)
+                tails = [values[split:], values[:split][::-1]]
+            elif infinite_upper:
+                tails = [values]
+            else:
+                tails = [values[::-1]]
+            accelerate = infty_method == 'accelerate'
+            return sum(sum_series(eval_terms, tail, accelerate, max_block=SUMMATION_CHUNK_SIZE)
+                       for tail in tails)
+
+        # The summand may be evaluated as a numpy array over a whole chunk of
+        # terms; chunks holding vectors/matrices or user-defined functions that
+        # can't act on arrays are evaluated term by term instead (see
+        # MathExpression.eval_batch). Either way, the terms are added in order.
+        result = 0
+        for start in range(0, len(values), SUMMATION_CHUNK_SIZE):
+            chunk = list(values[start:start + SUMMATION_CHUNK_SIZE])
+            result = sum(eval_terms(chunk), result)
 
         return result
@@ -6,6 +6,7 @@ Defines a FormulaGrader subtype that handles matrices, too.
 
 
 from numbers import Number
+from functools import partial
 from collections import namedtuple
 from voluptuous import Required, Any, Range, All, Optional
 from mitxgraders.exceptions import InputTypeError
@@ -189,13 +190,11 @@ class MatrixGrader(FormulaGrader):
 
     def get_comparer_utils(self):
         """Get the utils for comparer function."""
-        def _within_tolerance(x, y):
-            return within_tolerance(x, y, self.config['tolerance'])
-
         def _validate_shape(student_input, shape):
             detail = self.config['answer_shape_mismatch']['msg_detail']
             return self.validate_student_input_shape(student_input, shape, detail)
 
         return self.Utils(tolerance=self.config['tolerance'],
-                          within_tolerance=_within_tolerance,
+                          within_tolerance=partial(within_tolerance,
+                                                   tolerance=self.config['tolerance']),
                           validate_shape=_validate_shape)
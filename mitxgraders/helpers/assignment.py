@@ -0,0 +1,149 @@
+"""
+assignment.py
+
+Solves the assignment problem (https://en.wikipedia.org/wiki/Assignment_problem)
+on numpy cost matrices:
+* optimal_assignment
+
+This is the Munkres (Hungarian) algorithm, following the steps of
+https://github.com/bmc/munkres (which it replaces) and making the same choices
+between optimal assignments of equal cost, so that grading is unchanged. Rather
+than scanning the whole matrix for zeros at every step, the cost matrix is kept
+in a numpy array, its zeros are located with numpy whenever it changes, and
+starred and primed zeros are recorded by their column in each row.
+"""
+
+
+import itertools
+
+import numpy as np
+
+def optimal_assignment(costs):
+    """
+    Finds an assignment of rows to columns of a cost matrix with the lowest
+    total cost.
+
+    Arguments:
+        costs: A 2D array-like of real costs. Non-square matrices are padded
+            with zeros to make them square.
+
+    Returns:
+        A list of (row, column) tuples in order of rows, pairing each row with
+        a distinct column (when there are more rows than columns, some rows are
+        left out).
+
+    Usage
+    =====
+    >>> optimal_assignment([[400, 150, 400], [400, 450, 600], [300, 225, 300]])
+    [(0, 1), (1, 0), (2, 2)]
+    >>> optimal_assignment([[10, 10, 8, 11], [9, 8, 1, 1], [9, 7, 4, 10]])
+    [(0, 1), (1, 3), (2, 2)]
+
+    Among assignments of equal cost, the same one as in bmc/munkres is chosen:
+    >>> optimal_assignment(np.ones((3, 3)))
+    [(0, 0), (1, 1), (2, 2)]
+    """
+    costs = np.asarray(costs, dtype=float)
+    height, width = costs.shape
+    n = max(height, width)
+    matrix = np.zeros((n, n))
+    matrix[:height, :width] = costs
+
+    # Subtract the smallest entry of each row from the row
+    matrix -= matrix.min(axis=1, keepdims=True)
+    zeros = find_zeros(matrix)
+
+    # Star the first zero in each row that has no starred zero in its column.
+    # Stars are recorded as the column of the star in each row, and vice versa
+    # (-1 if none).
+    star_in_row = [-1] * n
+    star_in_col = [-1] * n
+    for i in range(n):
+        for j in zeros[i]:
+            if star_in_col[j] < 0:
+                star_in_row[i], star_in_col[j] = j, i
+                break
+
+    # Until there is a starred zero in every column...
+    while -1 in star_in_col:
+        row_covered = [False] * n
+        col_covered = [i >= 0 for i in star_in_col]
+        prime_in_row = [-1] * n
+
+        # Prime uncovered zeros until one has no starred zero in its row,
+        # adjusting the matrix whenever no uncovered zeros are left
+        row, col = 0, 0
+        while True:
+            zero = find_uncovered_zero(zeros, row_covered, col_covered, row, col)
+            if zero is None:
+                covered_rows = np.array(row_covered)
+                uncovered_cols = ~np.array(col_covered)
+                smallest = matrix[~covered_rows][:, uncovered_cols].min()
+                matrix[covered_rows] += smallest
+                matrix[:, uncovered_cols] -= smallest
+                zeros = find_zeros(matrix)
+                row, col = 0, 0
+                continue
+            row, col = zero
+            prime_in_row[row] = col
+            if star_in_row[row] < 0:
+                break
+            col = star_in_row[row]
+            row_covered[row] = True
+            col_covered[col] = False
+
+        # Follow the path from this primed zero to the starred zero in its
+        # column, then to the primed zero in that row, and so on, starring the
+        # primed zeros and unstarring the starred zeros along the way
+        while True:
+            starred_row = star_in_col[col]
+            star_in_row[row], star_in_col[col] = col, row
+            if starred_row < 0:
+                break
+            row = starred_row
+            col = prime_in_row[row]
+
+    return [(i, j) for i, j in enumerate(star_in_row[:height]) if j < width]
+
+def find_zeros(matrix):
+    """
+    Returns a list of the columns of the zeros in each row of a square matrix.
+
+    >>> find_zeros(np.array([[0, 1, 0], [1, 1, 1], [1, 0, 1]]))
+    [[0, 2], [], [1]]
+    """
+    zeros = [[] for _ in range(len(matrix))]
+    for i, j in zip(*(indices.tolist() for indices in np.nonzero(matrix == 0))):
+        zeros[i].append(j)
+    return zeros
+
+def find_uncovered_zero(zeros, row_covered, col_covered, row, col):
+    """
+    Returns the (row, column) position of an uncovered zero, or None if there
+    are none. Rows are searched cyclically from the given row; in the first row
+    with an uncovered zero, the last such zero is chosen in cyclic order from
+    the given column (this is the choice made by bmc/munkres).
+
+    Arguments:
+        zeros (list): The columns of the zeros in each row, in order
+        row_covered, col_covered (list): Whether each row or column is covered
+        row, col (int): Where to start searching
+
+    >>> zeros = [[1, 2], [0, 2], [0, 1]]
+    >>> covered = [False, False, False]
+    >>> find_uncovered_zero(zeros, covered, covered, 1, 0)
+    (1, 2)
+    >>> find_uncovered_zero(zeros, covered, covered, 1, 1)
+    (1, 0)
+    >>> print(find_uncovered_zero(zeros, [True] * 3, covered, 0, 0))
+    None
+    """
+    n = len(zeros)
+    for i in itertools.chain(range(row, n), range(row)):
+        if row_covered[i]:
+            continue
+        cols = [j for j in zeros[i] if not col_covered[j]]
+        if cols:
+            earlier_cols = [j for j in cols if j < col]
+            return i, earlier_cols[-1] if earlier_cols else cols[-1]
+    return None
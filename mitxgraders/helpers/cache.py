@@ -0,0 +1,143 @@
+"""
+cache.py
+
+Defines LRUCache, a size-bounded least-recently-used cache that keeps
+statistics on its usage.
+"""
+
+
+import sys
+from collections import OrderedDict
+
+def default_sizeof(key, value):
+    """
+    Approximate memory footprint of a cache entry, in bytes.
+
+    >>> default_sizeof('a', 1) == sys.getsizeof('a') + sys.getsizeof(1)
+    True
+    """
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+class LRUCache(object):
+    """
+    A dictionary-like cache holding at most maxsize entries. When full, the
+    least recently used entry is evicted. Keeps count of hits, misses and
+    evictions, and tracks the approximate memory footprint of its entries.
+
+    Arguments:
+        maxsize (int): maximum number of entries to hold (0 disables caching)
+        sizeof: a function of (key, value) that approximates the memory
+            footprint of an entry in bytes (default: default_sizeof)
+
+    Usage
+    =====
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache['a'] = 1
+    >>> cache['b'] = 2
+    >>> cache.get('a')
+    1
+    >>> cache['c'] = 3  # evicts 'b', the least recently used entry
+    >>> 'b' in cache
+    False
+    >>> cache.get('b') is None
+    True
+    >>> info = cache.info()
+    >>> (info['size'], info['hits'], info['misses'], info['evictions'])
+    (2, 1, 1, 1)
+
+    Shrinking the cache evicts entries as needed:
+    >>> cache.resize(1)
+    >>> list(cache.keys())
+    ['c']
+    """
+
+    def __init__(self, maxsize=1000, sizeof=default_sizeof):
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.data = OrderedDict()
+        self.entry_sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memory = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        """Tests membership without counting a hit or miss"""
+        return key in self.data
+
+    def __getitem__(self, key):
+        """Look up key without counting a hit or miss"""
+        return self.data[key]
+
+    def keys(self):
+        """Keys from least to most recently used"""
+        return self.data.keys()
+
+    def get(self, key, default=None):
+        """
+        Return the value for key (marking it as most recently used) and count
+        a hit, or return default and count a miss.
+        """
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        if self.maxsize <= 0:
+            return
+        if key in self.data:
+            self.discard(key)
+        self.data[key] = value
+        size = self.sizeof(key, value)
+        self.entry_sizes[key] = size
+        self.memory += size
+        self.evict(self.maxsize)
+
+    def discard(self, key):
+        """Remove key from the cache, if present"""
+        if key in self.data:
+            del self.data[key]
+            self.memory -= self.entry_sizes.pop(key)
+
+    def evict(self, maxsize):
+        """Evict least recently used entries until at most maxsize remain"""
+        while len(self.data) > maxsize:
+            key, _ = self.data.popitem(last=False)
+            self.memory -= self.entry_sizes.pop(key)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        """Change the maximum number of entries, evicting entries as needed"""
+        self.maxsize = maxsize
+        self.evict(max(maxsize, 0))
+
+    def clear(self):
+        """Remove all entries and reset statistics"""
+        self.data.clear()
+        self.entry_sizes.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memory = 0
+
+    def info(self):
+        """
+        Returns a dictionary of cache statistics: maxsize, size (number of
+        entries), hits, misses, evictions and memory (approximate bytes).
+        """
+        return {
+            'maxsize': self.maxsize,
+            'size': len(self.data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'memory': self.memory
+        }
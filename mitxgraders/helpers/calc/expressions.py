@@ -28,9 +28,15 @@ in two steps:
 
     2. Next, the tree is evaluated from the leaves upwards.
 
+    Since the same tree is typically evaluated many times (once per sample),
+    MathExpression compiles its tree into nested Python closures the first
+    time it is evaluated. Subsequent evaluations just bind a scope and run.
+
 This file defines two main classes:
 
- - MathParser, used to parse mathematical strings into a tree
+ - MathParser, used to parse mathematical strings into a tree (by default using
+   the recursive descent parser in recursive_descent.py, with a pyparsing
+   grammar kept as a reference)
  - MathExpression, holds the parse tree for a given mathematical expression
    and can be used to evaluate the tree with a given scope.
 and a function:
@@ -40,39 +46,27 @@ and also:
  - evaluator: a convenience function that parses and evaluates strings.
 
 Both `parse` and `evaluator` share a global MathParser instance for caching
-purposes.
+purposes. Its caches are bounded; use PARSER.set_cache_size to tune them and
+PARSER.cache_info to inspect their usage.
 """
 
 
+import cmath
 import copy
+import math
+import sys
 from collections import namedtuple
 
 import numpy as np
-from pyparsing import (
-    CaselessLiteral,
-    Combine,
-    Forward,
-    Group,
-    Literal,
-    Optional,
-    ParseResults,
-    Suppress,
-    Word,
-    FollowedBy,
-    ZeroOrMore,
-    alphanums,
-    alphas,
-    nums,
-    stringEnd,
-    ParseException,
-    delimitedList
-)
 from mitxgraders.exceptions import StudentFacingError
+from mitxgraders.helpers.cache import LRUCache
 from mitxgraders.helpers.validatorfuncs import get_number_of_args
 from mitxgraders.helpers.calc.math_array import MathArray, is_vector
 from mitxgraders.helpers.calc.robust_pow import robust_pow
+from mitxgraders.helpers.calc.recursive_descent import (
+    ParseNode, ParseFailure, RecursiveDescentParser)
 from mitxgraders.helpers.calc.mathfuncs import (
-    DEFAULT_VARIABLES, DEFAULT_FUNCTIONS, DEFAULT_SUFFIXES)
+    DEFAULT_VARIABLES, DEFAULT_FUNCTIONS, DEFAULT_SUFFIXES, merge_dicts)
 from mitxgraders.helpers.calc.exceptions import (
     CalcError,
     CalcOverflowError,
@@ -299,17 +293,37 @@ class MathParser(object):
     Expression trees are returned as MathExpression objects, which can then
     be evaluated.
 
+    Two parsing engines are available, which produce identical trees:
+        - 'descent' (default): a hand-written recursive descent parser
+          (see recursive_descent.py)
+        - 'pyparsing': the reference pyparsing grammar (see get_grammar)
+
+    Parsed expressions are held in a least-recently-used cache of at most
+    cache_size entries. Expressions that could not be parsed are remembered in
+    a separate cache of at most error_cache_size entries.
+
     Usage
     =====
     >>> new_parser = MathParser()
     >>> parsed = new_parser.parse('2*x + 5')
     >>> isinstance(parsed, MathExpression)
     True
+    >>> new_parser.parse('2 * x + 5') is parsed
+    True
+    >>> new_parser.cache_info()['expressions']['hits']
+    1
     """
 
-    def __init__(self):
-        self.cache = {}
-        self.grammar = self.get_grammar()
+    engines = ('descent', 'pyparsing')
+
+    def __init__(self, cache_size=10000, error_cache_size=1000, engine='descent'):
+        if engine not in self.engines:
+            raise ValueError("Unknown parsing engine '{}'".format(engine))
+        self.engine = engine
+        self.cache = LRUCache(cache_size, sizeof=self.sizeof_cache_entry)
+        self.error_cache = LRUCache(error_cache_size)
+        self._grammar = None
+        self.descent_parser = RecursiveDescentParser()
 
         # Internal storage that is reset at the end of calls to MathParser.parse
         # Needed at the instance level because callbacks during parsing only have
@@ -319,6 +333,39 @@ class MathParser(object):
         self.suffixes_used = set()
         self.max_array_dim_used = 0
 
+    @staticmethod
+    def sizeof_cache_entry(key, parsed):
+        """Approximate memory footprint of a cached MathExpression, in bytes"""
+        return sys.getsizeof(key) + parsed.approximate_size()
+
+    def set_cache_size(self, cache_size=None, error_cache_size=None):
+        """
+        Change the maximum number of cached expressions and/or unparseable
+        expressions, evicting entries as needed.
+
+        >>> new_parser = MathParser()
+        >>> for expr in ['x', 'y', 'z']:
+        ...     _ = new_parser.parse(expr)
+        >>> new_parser.set_cache_size(cache_size=2)
+        >>> new_parser.cache_info()['expressions']['evictions']
+        1
+        """
+        if cache_size is not None:
+            self.cache.resize(cache_size)
+        if error_cache_size is not None:
+            self.error_cache.resize(error_cache_size)
+
+    def cache_info(self):
+        """
+        Returns statistics about cache usage: a dictionary with keys
+        'expressions' and 'errors', whose values are dictionaries with keys
+        maxsize, size, hits, misses, evictions and memory (approximate bytes).
+        """
+        return {
+            'expressions': self.cache.info(),
+            'errors': self.error_cache.info()
+        }
+
     def reset_storage(self):
         self.variables_used = set()
         self.functions_used = set()
@@ -342,12 +389,32 @@ class MathParser(object):
         """
         self.suffixes_used.add(tokens[0])
 
+    @property
+    def grammar(self):
+        """
+        The pyparsing grammar, constructed on first use (see get_grammar).
+        Neither pyparsing nor the grammar is loaded unless the pyparsing
+        engine is used.
+
+        >>> new_parser = MathParser(engine='pyparsing')
+        >>> new_parser._grammar is None
+        True
+        >>> _ = new_parser.parse('x + 1')
+        >>> new_parser._grammar is None
+        False
+        """
+        if self._grammar is None:
+            self._grammar = self.get_grammar()
+        return self._grammar
+
     @staticmethod
     def group_if_multiple(name):
         """
         Generates a parse action that groups ParseResults with given name if
         ParseResults has multiple children.
         """
+        from pyparsing import ParseResults
+
         def _parse_action(tokens):
             """Wrap children in a group if there are multiple"""
             if len(tokens) > 1:
@@ -366,6 +433,24 @@ class MathParser(object):
             - BNF form of context-free grammar https://en.wikipedia.org/wiki/Backus%E2%80%93Naur_form
             - Some pyparsing docs http://infohost.nmt.edu/~shipman/soft/pyparsing/web/index.html
         """
+        # pyparsing is imported here, as it is only needed by the reference engine
+        from pyparsing import (
+            CaselessLiteral,
+            Combine,
+            Forward,
+            Group,
+            Literal,
+            Optional,
+            Suppress,
+            Word,
+            FollowedBy,
+            ZeroOrMore,
+            alphanums,
+            alphas,
+            nums,
+            stringEnd,
+            delimitedList
+        )
 
         # Define + and -
         plus = Literal("+")
@@ -491,20 +576,43 @@ class MathParser(object):
 
         return expression + stringEnd
 
+    @staticmethod
+    def to_parse_node(node):
+        """
+        Convert a pyparsing tree into a tree of ParseNodes.
+
+        >>> tree = MathParser().grammar.parseString('x+1')[0]
+        >>> MathParser.to_parse_node(tree)
+        ParseNode('sum', [ParseNode('variable', ['x']), '+', ParseNode('number', ['1'])])
+        """
+        from pyparsing import ParseResults
+
+        if isinstance(node, ParseResults):
+            return ParseNode(node.getName(),
+                             [MathParser.to_parse_node(child) for child in node])
+        return node
+
     def raw_parse(self, expression):
         """
-        Try to parse a string and cache the result. ALWAYS clears storage.
+        Try to parse a string using the selected engine. ALWAYS clears storage.
         """
+        BracketValidator.validate(expression)
+
+        if self.engine == 'descent':
+            tree, variables, functions, suffixes = self.descent_parser.parse(expression)
+            return MathExpression(expression, tree, variables, functions, suffixes)
+
+        from pyparsing import ParseException
+
         try:
-            BracketValidator.validate(expression)
             tree = self.grammar.parseString(expression)[0]
             parsed = MathExpression(expression,
-                                    tree,
+                                    self.to_parse_node(tree),
                                     self.variables_used,
                                     self.functions_used,
                                     self.suffixes_used)
-        except:
-            raise
+        except ParseException as error:
+            raise ParseFailure(str(error))
         finally:
             self.reset_storage()
 
@@ -514,16 +622,33 @@ class MathParser(object):
         """
         If expression is in parser cache, return cached result, otherwise
         delegate to raw_parse.
+
+        Expressions that could not be parsed are cached too:
+        >>> new_parser = MathParser()
+        >>> for _ in range(2):
+        ...     try:
+        ...         new_parser.parse('1 + * 2')
+        ...     except UnableToParse as error:
+        ...         print(error)
+        Invalid Input: Could not parse '1 + * 2' as a formula
+        Invalid Input: Could not parse '1 + * 2' as a formula
+        >>> new_parser.cache_info()['errors']['hits']
+        1
         """
         expression_no_whitespace = expression.replace(' ', '')
         cache_key = expression_no_whitespace
-        if expression_no_whitespace in self.cache:
-            return self.cache[cache_key]
+        parsed = self.cache.get(cache_key)
+        if parsed is not None:
+            return parsed
+
+        msg = "Invalid Input: Could not parse '{}' as a formula"
+        if self.error_cache.get(cache_key, False):
+            raise UnableToParse(msg.format(expression))
 
         try:
             parsed = self.raw_parse(expression_no_whitespace)
-        except ParseException:
-            msg = "Invalid Input: Could not parse '{}' as a formula"
+        except ParseFailure:
+            self.error_cache[cache_key] = True
             raise UnableToParse(msg.format(expression))
 
         self.cache[cache_key] = parsed
@@ -534,6 +659,93 @@ EvalMetaData = namedtuple('EvalMetaData',
                            'functions_used',
                            'suffixes_used',
                            'max_array_dim_used'])
+
+EvalScope = namedtuple('EvalScope',
+                       ['variables',
+                        'functions',
+                        'suffixes',
+                        'metadata_dict',
+                        'allow_inf'])
+
+def finalize_node_value(result, allow_inf):
+    """
+    Checks the result of a node evaluation for infinities and nans, and casts
+    numpy numerics as builtins. Mirrors the final steps of MathExpression.eval_node,
+    with fast paths for python floats and complex numbers.
+
+    >>> finalize_node_value(2.0, False)
+    2.0
+    >>> finalize_node_value(float('nan'), False)
+    nan
+    >>> finalize_node_value([np.float64(1.0), 2.0], False)
+    [1.0, 2.0]
+    >>> try:
+    ...     finalize_node_value(1j*float('inf'), False)
+    ... except CalcOverflowError as error:
+    ...     print(error)
+    Numerical overflow occurred. Does your expression generate very large numbers?
+    """
+    result_type = type(result)
+    if result_type is float:
+        if math.isinf(result):
+            if not allow_inf:
+                raise CalcOverflowError("Numerical overflow occurred. Does your expression "
+                                        "generate very large numbers?")
+        elif math.isnan(result):
+            return float('nan')
+        return result
+    if result_type is complex:
+        if cmath.isinf(result):
+            if not allow_inf:
+                raise CalcOverflowError("Numerical overflow occurred. Does your expression "
+                                        "generate very large numbers?")
+            if math.isnan(result.real) or math.isnan(result.imag):
+                return float('nan')
+        elif cmath.isnan(result):
+            return float('nan')
+        return result
+
+    # All actions convert the input to a number, array, or list.
+    # (Only the 'arguments' action returns a list.)
+    as_list = result if isinstance(result, list) else [result]
+
+    # Check if there were any infinities or nan
+    if not allow_inf and any(np.any(np.isinf(r)) for r in as_list):
+        raise CalcOverflowError("Numerical overflow occurred. Does your expression "
+                                "generate very large numbers?")
+    if any(np.any(np.isnan(r)) for r in as_list):
+        return float('nan')
+
+    return cast_np_numeric_as_builtin(result, map_across_lists=True)
+
+class BatchEvaluationError(Exception):
+    """
+    Raised when an expression cannot be evaluated over whole columns of samples
+    at once. Never student-facing: callers fall back to evaluating each sample
+    separately, which reproduces the appropriate error (if any).
+    """
+
+def finalize_batch_value(result, allow_inf):
+    """
+    Checks the result of a node evaluated over columns of samples. Any
+    non-finite entry raises BatchEvaluationError, as only per-sample evaluation
+    knows how to treat infinities and nans.
+
+    >>> finalize_batch_value(np.array([1.0, 2.0]), False)
+    array([ 1.,  2.])
+    >>> try:
+    ...     finalize_batch_value(np.array([1.0, np.inf]), True)
+    ... except BatchEvaluationError:
+    ...     print('fallback')
+    fallback
+    """
+    if isinstance(result, list):
+        # Function arguments; each entry has already been checked
+        return result
+    if not np.all(np.isfinite(result)):
+        raise BatchEvaluationError
+    return result
+
 class MathExpression(object):
     """
     Holds the parse tree for mathematical expression; returned by MathParser.
@@ -547,6 +759,9 @@ class MathExpression(object):
     Methods:
         - eval(variables, functions, suffixes, allow_inf)
 
+    The parse tree is compiled into closures on first evaluation (see compiled),
+    so repeated evaluations do not walk the parse tree again.
+
     EXAMPLE:
     ========
     >>> new_parser = MathParser()
@@ -566,6 +781,8 @@ class MathExpression(object):
         self.functions_used = functions_used
         self.suffixes_used = suffixes_used
         self.tree = tree
+        self._compiled = None
+        self._compiled_batch = None
 
     # def __str__(self):
     #     """
@@ -595,6 +812,24 @@ class MathExpression(object):
     def __repr__(self):
         return self.__str__()
 
+    def approximate_size(self):
+        """
+        Approximate memory footprint of the expression and its parse tree, in bytes.
+
+        >>> new_parser = MathParser()
+        >>> new_parser.parse('x + 1').approximate_size() > 0
+        True
+        """
+        def tree_size(node):
+            """Recursively total the size of a node and its children"""
+            if isinstance(node, ParseNode):
+                return sys.getsizeof(node) + sum(tree_size(child) for child in node)
+            return sys.getsizeof(node)
+
+        return (sys.getsizeof(self) + sys.getsizeof(self.expression) + tree_size(self.tree)
+                + sys.getsizeof(self.variables_used) + sys.getsizeof(self.functions_used)
+                + sys.getsizeof(self.suffixes_used))
+
     def check_scope(self, variables, functions, suffixes):
         """
         Confirm that all variables, functions, suffixes used in the tree are
@@ -679,24 +914,12 @@ class MathExpression(object):
 
         # metadata_dict['max_array_dim_used'] is updated by eval_array
         metadata_dict = {'max_array_dim_used': 0}
-        actions = {
-            'number': lambda parse_result: self.eval_number(parse_result, suffixes),
-            'variable': lambda parse_result: self.eval_variable(parse_result, variables),
-            'arguments': lambda tokens: tokens,
-            'function': lambda parse_result: self.eval_function(parse_result, functions),
-            'array': lambda parse_result: self.eval_array(parse_result, metadata_dict),
-            'power': self.eval_power,
-            'negation': self.eval_negation,
-            'parallel': self.eval_parallel,
-            'product': self.eval_product,
-            'sum': self.eval_sum,
-            'parentheses': lambda tokens: tokens[0]  # just get the unique child
-        }
+        scope = EvalScope(variables, functions, suffixes, metadata_dict, allow_inf)
 
         # Find the value of the entire tree
         # Catch math errors that may arise
         try:
-            result = self.eval_node(self.tree, actions, allow_inf)
+            result = self.compiled(scope)
             # set metadata after metadata_dict has been mutated
             metadata = EvalMetaData(variables_used=self.variables_used,
                                     functions_used=self.functions_used,
@@ -711,6 +934,244 @@ class MathExpression(object):
 
         return result, metadata
 
+    def eval_batch(self, var_columns, functions, suffixes, samples, allow_inf=False):
+        """
+        Numerically evaluate a MathExpression's tree for a number of samples,
+        returning a tuple of the list of numeric results (one per sample) and
+        evaluation metadata.
+
+        Where possible, the tree is evaluated once over columns of samples (see
+        eval_vectorized). Otherwise, falls back to evaluating each sample
+        separately with eval, so results and errors are as for eval.
+
+        Arguments:
+            var_columns (dict): maps variable names to lists of values, one per sample
+            functions (dict): maps function names to values
+            suffixes (dict): maps suffix names to values
+            samples (int): the number of samples
+            allow_inf (bool): as for eval
+
+        >>> new_parser = MathParser()
+        >>> expression = new_parser.parse('x^2 + y')
+        >>> results, meta = expression.eval_batch({'x': [1, 2, 3], 'y': [0.5, 0.5, 0.5]},
+        ...                                       {}, {}, 3)
+        >>> results
+        [1.5, 4.5, 9.5]
+        """
+        self.check_scope(var_columns, functions, suffixes)
+
+        results = self.eval_vectorized(var_columns, functions, suffixes, samples, allow_inf)
+        if results is not None:
+            metadata = EvalMetaData(variables_used=self.variables_used,
+                                    functions_used=self.functions_used,
+                                    suffixes_used=self.suffixes_used,
+                                    max_array_dim_used=0)
+            return results, metadata
+
+        results = []
+        max_array_dim_used = 0
+        for index in range(samples):
+            variables = {name: var_columns[name][index] for name in self.variables_used}
+            result, metadata = self.eval(variables, functions, suffixes, allow_inf=allow_inf)
+            results.append(result)
+            max_array_dim_used = max(max_array_dim_used, metadata.max_array_dim_used)
+
+        metadata = EvalMetaData(variables_used=self.variables_used,
+                                functions_used=self.functions_used,
+                                suffixes_used=self.suffixes_used,
+                                max_array_dim_used=max_array_dim_used)
+        return results, metadata
+
+    def eval_vectorized(self, var_columns, functions, suffixes, samples, allow_inf=False):
+        """
+        Try to evaluate the tree once over columns of samples, returning a list
+        of results (one per sample), or None if this is not possible.
+
+        This requires that:
+            - every variable used takes finite scalar values, and integer values
+              are python integers (which eval converts to floats, as is done
+              here; numpy integers keep integer arithmetic in eval),
+            - every function used has a 'vectorized' attribute, which is a
+              version of the function that acts elementwise on numpy arrays,
+            - the expression contains no vectors or matrices, and
+            - no errors or non-finite values arise during evaluation.
+
+        Scope is not checked; see eval_batch.
+
+        >>> new_parser = MathParser()
+        >>> expression = new_parser.parse('1/x')
+        >>> expression.eval_vectorized({'x': [1, 2, 4]}, {}, {}, 3)
+        [1.0, 0.5, 0.25]
+        >>> expression.eval_vectorized({'x': [1, 0, 4]}, {}, {}, 3) is None
+        True
+        >>> expression.eval_vectorized({'x': [np.int64(1), np.int64(2)]}, {}, {}, 2) is None
+        True
+        """
+        columns = {}
+        for name in self.variables_used:
+            column = np.array(var_columns[name])
+            if column.dtype.kind in 'iu':
+                if not all(isinstance(value, int) for value in var_columns[name]):
+                    return None
+                column = column.astype(float)
+            elif column.dtype.kind not in 'fc' or column.shape != (samples,):
+                return None
+            if not np.all(np.isfinite(column)):
+                return None
+            columns[name] = column
+
+        vectorized_functions = {}
+        for name in self.functions_used:
+            vectorized = getattr(functions[name], 'vectorized', None)
+            if vectorized is None:
+                return None
+            vectorized_functions[name] = vectorized
+
+        scope = EvalScope(columns, vectorized_functions, suffixes,
+                          {'max_array_dim_used': 0}, allow_inf)
+        try:
+            result = self.compiled_batch(scope)
+            result = np.broadcast_to(result, (samples,))
+        except Exception:  # pylint: disable=broad-except
+            # Per-sample evaluation will deal with this appropriately
+            return None
+
+        return result.tolist()
+
+    @property
+    def compiled(self):
+        """
+        The parse tree compiled into a unary function of an EvalScope.
+        Compilation happens once, the first time this property is accessed.
+
+        >>> new_parser = MathParser()
+        >>> expression = new_parser.parse('x^2 + 1')
+        >>> scope = EvalScope({'x': 3}, {}, {}, {'max_array_dim_used': 0}, False)
+        >>> expression.compiled(scope)
+        10.0
+        """
+        if self._compiled is None:
+            self._compiled = self.compile_node(self.tree)
+        return self._compiled
+
+    @property
+    def compiled_batch(self):
+        """
+        The parse tree compiled for evaluation over whole columns of samples.
+        Variables in the scope are numpy arrays of samples, and functions
+        must act elementwise on such arrays. Raises an error as soon as any
+        node produces a non-finite value.
+        """
+        if self._compiled_batch is None:
+            self._compiled_batch = self.compile_node(self.tree,
+                                                     self.batch_actions,
+                                                     finalize_batch_value)
+        return self._compiled_batch
+
+    def get_actions(self, variables, functions, suffixes, metadata_dict):
+        """
+        Returns the dictionary of evaluation actions used by eval_node for the
+        given scope. This is the reference (uncompiled) evaluation path.
+        """
+        return {
+            'number': lambda parse_result: self.eval_number(parse_result, suffixes),
+            'variable': lambda parse_result: self.eval_variable(parse_result, variables),
+            'arguments': lambda tokens: tokens,
+            'function': lambda parse_result: self.eval_function(parse_result, functions),
+            'array': lambda parse_result: self.eval_array(parse_result, metadata_dict),
+            'power': self.eval_power,
+            'negation': self.eval_negation,
+            'parallel': self.eval_parallel,
+            'product': self.eval_product,
+            'sum': self.eval_sum,
+            'parentheses': lambda tokens: tokens[0]  # just get the unique child
+        }
+
+    # Scope-aware versions of the evaluation actions, used by compiled trees.
+    # Each takes the list of evaluated children and an EvalScope.
+    compiled_actions = {
+        'number': lambda values, scope: MathExpression.eval_number(values, scope.suffixes),
+        'variable': lambda values, scope: MathExpression.eval_variable(values, scope.variables),
+        'arguments': lambda values, scope: values,
+        'function': lambda values, scope: MathExpression.eval_function(values, scope.functions),
+        'array': lambda values, scope: MathExpression.eval_array(values, scope.metadata_dict),
+        'power': lambda values, scope: MathExpression.eval_power(values),
+        'negation': lambda values, scope: MathExpression.eval_negation(values),
+        'parallel': lambda values, scope: MathExpression.eval_parallel(values),
+        'product': lambda values, scope: MathExpression.eval_product(values),
+        'sum': lambda values, scope: MathExpression.eval_sum(values),
+        'parentheses': lambda values, scope: values[0]
+    }
+
+    # Actions used when evaluating over columns of samples. Arrays are not
+    # supported, and the parallel operator cannot test for zeros inline.
+    batch_actions = merge_dicts(compiled_actions, {
+        'array': lambda values, scope: MathExpression.eval_array_batch(values),
+        'parallel': lambda values, scope: MathExpression.eval_parallel_batch(values),
+    })
+
+    @staticmethod
+    def compile_node(node, actions=None, finalize=None):
+        """
+        Compiles a node into a unary function of an EvalScope. The compiled
+        function behaves exactly like eval_node with the corresponding actions,
+        but node names are looked up and leaves are resolved only once.
+
+        Arguments:
+            node: the node to compile
+            actions (dict): maps node names to functions of (values, scope),
+                defaults to MathExpression.compiled_actions
+            finalize: function of (result, allow_inf) applied to each node's
+                result, defaults to finalize_node_value
+        """
+        if actions is None:
+            actions = MathExpression.compiled_actions
+        if finalize is None:
+            finalize = finalize_node_value
+
+        if not isinstance(node, ParseNode):
+            # A leaf; entry is either a (python) number or a string.
+            value = cast_np_numeric_as_builtin(node)
+            return lambda scope: value
+
+        node_name = node.getName()
+        if node_name not in actions:  # pragma: no cover
+            raise ValueError(u"Unknown branch name '{}'".format(node_name))
+        action = actions[node_name]
+
+        # Leaves are constant, so store them in a template list once, and
+        # only evaluate the subnodes at evaluation time
+        template = []
+        subnodes = []
+        for index, child in enumerate(node):
+            if isinstance(child, ParseNode):
+                template.append(None)
+                subnodes.append((index, MathExpression.compile_node(child, actions, finalize)))
+            else:
+                template.append(cast_np_numeric_as_builtin(child))
+
+        if not subnodes:
+            def evaluate_leaves(scope):
+                """Evaluate a node whose children are all leaves"""
+                return finalize(action(template[:], scope), scope.allow_inf)
+            return evaluate_leaves
+
+        def evaluate(scope):
+            """Evaluate a node's children, then the node itself"""
+            values = template[:]
+            for index, func in subnodes:
+                values[index] = func(scope)
+
+            # Check for nan
+            for index, _ in subnodes:
+                item = values[index]
+                if isinstance(item, float) and math.isnan(item):
+                    return float('nan')
+
+            return finalize(action(values, scope), scope.allow_inf)
+
+        return evaluate
+
     # The following functions define evaluation actions, which are run on lists
     # of results from each parse component. They convert the strings and (previously
     # calculated) numbers into the number that component represents.
@@ -722,7 +1183,7 @@ class MathExpression(object):
         Delegates to one of the provided actions, passing evaluated child nodes as arguments.
         """
 
-        if not isinstance(node, ParseResults):
+        if not isinstance(node, ParseNode):
             # We have a leaf, do not recurse. Return it directly.
             # Entry is either a (python) number or a string.
             return cast_np_numeric_as_builtin(node)
@@ -991,6 +1452,19 @@ class MathExpression(object):
 
         return array
 
+    @staticmethod
+    def eval_array_batch(parse_result):
+        """
+        Arrays are not supported when evaluating over columns of samples.
+
+        >>> try:
+        ...     MathExpression.eval_array_batch([1, 2])
+        ... except BatchEvaluationError:
+        ...     print('fallback')
+        fallback
+        """
+        raise BatchEvaluationError
+
     @staticmethod
     def eval_power(parse_result):
         """
@@ -1076,6 +1550,21 @@ class MathExpression(object):
         reciprocals = [1. / num for num in parse_result]
         return 1. / sum(reciprocals)
 
+    @staticmethod
+    def eval_parallel_batch(parse_result):
+        """
+        Parallel operator for columns of samples. Zeros raise an error (via
+        division by zero) rather than returning 0, leaving them to per-sample
+        evaluation.
+
+        Usage
+        =====
+        >>> MathExpression.eval_parallel_batch([np.array([1., 4.]), 1])
+        array([ 0.5,  0.8])
+        """
+        reciprocals = [1. / num for num in parse_result]
+        return 1. / sum(reciprocals)
+
     @staticmethod
     def eval_product(parse_result):
         """
@@ -1174,6 +1663,65 @@ def parse(formula):
     """
     return PARSER.parse(formula)
 
+def evaluator_batch(formula,
+                    var_columns,
+                    samples,
+                    functions=DEFAULT_FUNCTIONS,
+                    suffixes=DEFAULT_SUFFIXES,
+                    max_array_dim=None,
+                    allow_inf=False):
+    """
+    Evaluate an expression for a number of samples at once. Returns a list of
+    results (one per sample) and evaluation metadata.
+
+    Arguments
+    =========
+    - formula (str): The formula to be evaluated
+    - var_columns (dict): maps variable names to lists of values, one per sample
+    - samples (int): the number of samples
+    Other arguments are as for evaluator.
+
+    Where possible, the formula is evaluated once over all samples using
+    numpy arrays; otherwise, each sample is evaluated separately. Either way,
+    the results are as for calling evaluator on each sample in turn.
+
+    Usage
+    =====
+    >>> results, meta = evaluator_batch("2*x + sin(0)", {'x': [1, 2, 3]}, 3)
+    >>> results
+    [2.0, 4.0, 6.0]
+    >>> results, meta = evaluator_batch("", {'x': [1, 2, 3]}, 3)
+    >>> results
+    [nan, nan, nan]
+    """
+    if formula is None or formula.strip() == "":
+        # No need to go further.
+        empty_usage = EvalMetaData(variables_used=set(),
+                                   functions_used=set(),
+                                   suffixes_used=set(),
+                                   max_array_dim_used=0)
+        return [float('nan')] * samples, empty_usage
+
+    parsed = parse(formula.strip())
+    results, eval_metadata = parsed.eval_batch(var_columns, functions, suffixes, samples,
+                                               allow_inf=allow_inf)
+    validate_max_array_dim(eval_metadata, max_array_dim)
+    return results, eval_metadata
+
+def validate_max_array_dim(eval_metadata, max_array_dim):
+    """
+    Raise UnableToParse if vectors/matrices/tensors were used when they
+    shouldn't have been.
+    """
+    if max_array_dim is not None and eval_metadata.max_array_dim_used > max_array_dim:
+        if max_array_dim == 0:
+            msg = "Vector and matrix expressions have been forbidden in this entry."
+        elif max_array_dim == 1:
+            msg = "Matrix expressions have been forbidden in this entry."
+        else:
+            msg = "Tensor expressions have been forbidden in this entry."
+        raise UnableToParse(msg)
+
 def evaluator(formula,
               variables=DEFAULT_VARIABLES,
               functions=DEFAULT_FUNCTIONS,
@@ -1253,14 +1801,7 @@ def evaluator(formula,
     result, eval_metadata = parsed.eval(variables, functions, suffixes, allow_inf=allow_inf)
 
     # Were vectors/matrices/tensors used when they shouldn't have been?
-    if max_array_dim is not None and eval_metadata.max_array_dim_used > max_array_dim:
-        if max_array_dim == 0:
-            msg = "Vector and matrix expressions have been forbidden in this entry."
-        elif max_array_dim == 1:
-            msg = "Matrix expressions have been forbidden in this entry."
-        else:
-            msg = "Tensor expressions have been forbidden in this entry."
-        raise UnableToParse(msg)
+    validate_max_array_dim(eval_metadata, max_array_dim)
 
     # Return the result of the evaluation, as well as the set of functions used
     return result, eval_metadata
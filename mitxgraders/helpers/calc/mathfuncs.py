@@ -5,6 +5,7 @@ Contains mathematical functions for use in interpreting formulas.
 
 Contains some helper functions used in grading formulae:
 * within_tolerance
+* entrywise_within_tolerance
 
 Defines:
 * DEFAULT_FUNCTIONS
@@ -283,6 +284,50 @@ def has_at_least_2_scalar_inputs(display_name):
 SCALAR_FUNCTIONS = {key: has_one_scalar_input(key)(ELEMENTWISE_FUNCTIONS[key])
                     for key in ELEMENTWISE_FUNCTIONS}
 
+def real_preserving(func):
+    """
+    Wraps a numpy.lib.scimath function for use on columns of samples. Acting
+    on a single sample, these functions return complex results only when
+    needed, but acting on an array, they make every entry complex. To keep
+    results identical to per-sample evaluation, the wrapped function raises
+    a ValueError if a real column would produce a complex result.
+
+    >>> vec_sqrt = real_preserving(np.lib.scimath.sqrt)
+    >>> vec_sqrt(np.array([1., 4.]))
+    array([ 1.,  2.])
+    >>> vec_sqrt(np.array([-1+0j, 4]))
+    array([ 0.+1.j,  2.+0.j])
+    >>> try:
+    ...     vec_sqrt(np.array([-1., 4.]))
+    ... except ValueError:
+    ...     print('complex result')
+    complex result
+    """
+    def _func(arg):
+        result = func(arg)
+        if np.iscomplexobj(result) and not np.iscomplexobj(arg):
+            raise ValueError("{} produced complex results".format(func.__name__))
+        return result
+    return _func
+
+# Elementwise functions that act on a numpy array of samples exactly as they act
+# on each sample separately. The scalar versions of these record their elementwise
+# version under the 'vectorized' attribute, for use by MathExpression.eval_batch.
+VECTORIZED_FUNCTIONS = {
+    key: ELEMENTWISE_FUNCTIONS[key]
+    for key in ['sin', 'cos', 'tan', 'sec', 'csc', 'cot', 'exp', 'arctan', 'arcsec',
+                'arccsc', 'abs', 'sinh', 'cosh', 'tanh', 'sech', 'csch', 'coth',
+                'arcsinh', 'arccosh', 'arcsech', 'arccsch', 'arccoth', 'floor', 'ceil',
+                'fact', 'factorial']
+}
+VECTORIZED_FUNCTIONS.update({
+    key: real_preserving(ELEMENTWISE_FUNCTIONS[key])
+    for key in ['sqrt', 'log10', 'log2', 'ln', 'arccos', 'arcsin', 'arctanh']
+})
+
+for key in VECTORIZED_FUNCTIONS:
+    SCALAR_FUNCTIONS[key].vectorized = VECTORIZED_FUNCTIONS[key]
+
 SCALAR_FUNCTIONS['arctan2'] = arctan2
 SCALAR_FUNCTIONS['kronecker'] = kronecker
 
@@ -455,6 +500,55 @@ def within_tolerance(x, y, tolerance):
 
     return np.linalg.norm(difference) <= tolerance
 
+def entrywise_within_tolerance(x, y, tolerance):
+    """
+    Check that each entry of y is within tolerance of the corresponding entry
+    of x, as within_tolerance does for each pair of entries, returning a
+    boolean array of the results.
+
+    Args:
+        x: array (np array_like)
+        y: array (np array_like) of the same shape as x
+        tolerance: Number or PercentageString
+
+    Usage
+    =====
+
+    A percentage tolerance is a percent of each entry of x:
+    >>> x = np.array([[10, 1], [-10, 0]])
+    >>> y = np.array([[10.5, 1.5], [-9.5, 0]])
+    >>> entrywise_within_tolerance(x, y, 0.5).tolist()
+    [[True, True], [True, True]]
+    >>> entrywise_within_tolerance(x, y, '10%').tolist()
+    [[True, False], [True, True]]
+
+    Infinite entries are equal only to the same infinity:
+    >>> inf = float('inf')
+    >>> entrywise_within_tolerance([inf, -inf, inf, 1], [inf, -inf, -inf, inf], '100%').tolist()
+    [True, True, False, False]
+
+    Unlike within_tolerance, whose norms overflow to infinity for entries above
+    about 1e154, huge entries are compared correctly:
+    >>> entrywise_within_tolerance([1e200, 1e200], [1e200*(1 + 1e-7), 1], '1e-4%').tolist()
+    [True, False]
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    inf = float('inf')
+    infinite = (x == inf) | (y == inf) | (x == -inf) | (y == -inf)
+
+    # Differences of infinities are nan, and are not used. Differences of
+    # entries near the largest float may overflow to infinity, and so are
+    # not within any finite tolerance.
+    with np.errstate(invalid='ignore', over='ignore'):
+        # When used within graders, tolerance has already been
+        # validated as a Number or PercentageString
+        if isinstance(tolerance, str):
+            tolerance = np.abs(x) * percentage_as_number(tolerance)
+        close = np.abs(x - y) <= tolerance
+
+    return np.where(infinite, x == y, close)
+
 def is_nearly_zero(x, tolerance, reference=None):
     """
     Check that x is within tolerance of zero. If tolerance is provided as a
@@ -0,0 +1,310 @@
+r"""
+recursive_descent.py
+
+Defines a hand-written recursive descent parser for mathematical expressions.
+It accepts exactly the same language as the pyparsing grammar in
+MathParser.get_grammar, and produces the same parse trees, but is much faster
+because it never backtracks.
+
+The grammar, in order of increasing precedence, is:
+
+    expression  := ['+'] product (('+' | '-') product)*         -> 'sum'
+    product     := parallel (('*' | '/') parallel)*              -> 'product'
+    parallel    := negation ('||' negation)*                     -> 'parallel'
+    negation    := ['-'] power                                   -> 'negation'
+    power       := atom ('^' ['-'] atom)*                        -> 'power'
+    atom        := number | function | variable | parentheses | array
+    number      := (num)(suffix)?                                -> 'number'
+    function    := name '(' expression (',' expression)* ')'     -> 'function'
+    variable    := name                                          -> 'variable'
+    parentheses := '(' expression ')'                            -> 'parentheses'
+    array       := '[' expression (',' expression)* ']'          -> 'array'
+
+Nodes for sum, product, parallel, negation and power are only created when
+they have more than one child. The unicode emdash is accepted in place of '-'.
+"""
+
+
+import re
+
+# Characters skipped between tokens (as for pyparsing)
+WHITESPACE = ' \t\n\r'
+MINUS = '-—'
+
+# Numbers: 1 or 1.0 or 1. or .1, with an optional exponent (which is
+# normalized to use an uppercase 'E'), possibly followed by a suffix
+INNER_NUMBER = re.compile(r'[0-9]+(?:\.[0-9]*)?|\.[0-9]+')
+EXPONENT = re.compile('[eE]([+\\-—]?)([0-9]+)')
+SUFFIX = re.compile(r'[A-Za-z%]+')
+
+# Names consist of:
+#   front (required): starts with alpha, followed by alphanumeric
+#   subscripts (optional): any combination of alphanumeric and underscores,
+#       not followed by a curly brace
+#   or else lower_indices and/or upper_indices (optional):
+#       of form "_{(-)<alphanumeric>}" and "^{(-)<alphanumeric>}" respectively
+#   tail (optional): any number of primes
+FRONT = re.compile(r'[A-Za-z][A-Za-z0-9]*')
+SUBSCRIPTS = re.compile(r'[A-Za-z0-9_]+')
+LOWER_INDICES = re.compile(r'_\{-?[A-Za-z0-9]+\}')
+UPPER_INDICES = re.compile(r'\^\{-?[A-Za-z0-9]+\}')
+PRIMES = re.compile(r"'*")
+
+class ParseNode(list):
+    """
+    A named node in a parse tree. Its entries are child nodes and string leaves.
+
+    Usage
+    =====
+    >>> node = ParseNode('sum', [ParseNode('variable', ['x']), '+', ParseNode('number', ['1'])])
+    >>> node.getName()
+    'sum'
+    >>> node
+    ParseNode('sum', [ParseNode('variable', ['x']), '+', ParseNode('number', ['1'])])
+    >>> node == ParseNode('product', list(node))
+    False
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name, children):
+        super(ParseNode, self).__init__(children)
+        self.name = name
+
+    def getName(self):  # pylint: disable=invalid-name
+        """Returns the name of the node (same API as pyparsing.ParseResults)"""
+        return self.name
+
+    def __eq__(self, other):
+        return (isinstance(other, ParseNode) and self.name == other.name
+                and list.__eq__(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "ParseNode({!r}, {})".format(self.name, list.__repr__(self))
+
+class ParseFailure(Exception):
+    """Raised when a string cannot be parsed as a mathematical expression"""
+
+class RecursiveDescentParser(object):
+    """
+    Parses mathematical expressions into trees of ParseNodes.
+
+    Usage
+    =====
+    >>> parser = RecursiveDescentParser()
+    >>> tree, variables, functions, suffixes = parser.parse('2^-x + f(y, 3k)')
+    >>> tree                                       # doctest: +NORMALIZE_WHITESPACE
+    ParseNode('sum', [ParseNode('power', [ParseNode('number', ['2']), '-',
+        ParseNode('variable', ['x'])]), '+', ParseNode('function', ['f',
+        ParseNode('arguments', [ParseNode('variable', ['y']),
+        ParseNode('number', ['3', 'k'])])])])
+    >>> sorted(variables), sorted(functions), sorted(suffixes)
+    (['x', 'y'], ['f'], ['k'])
+
+    Invalid expressions raise ParseFailure:
+    >>> try:
+    ...     parser.parse('2 + * 3')
+    ... except ParseFailure as error:
+    ...     print(error)
+    Unexpected character '*' at position 4
+    """
+
+    def parse(self, text):
+        """
+        Parse text, returning a tuple (tree, variables_used, functions_used,
+        suffixes_used).
+        """
+        self.text = text
+        self.pos = 0
+        self.variables_used = set()
+        self.functions_used = set()
+        self.suffixes_used = set()
+
+        tree = self.expression()
+        self.skip_whitespace()
+        if self.pos != len(text):
+            self.fail()
+
+        return tree, self.variables_used, self.functions_used, self.suffixes_used
+
+    # Helpers
+
+    def fail(self):
+        """Raise a ParseFailure at the current position"""
+        if self.pos < len(self.text):
+            msg = "Unexpected character '{}' at position {}".format(self.text[self.pos],
+                                                                   self.pos)
+        else:
+            msg = "Unexpected end of expression"
+        raise ParseFailure(msg)
+
+    def skip_whitespace(self):
+        """Advance past any whitespace"""
+        text = self.text
+        pos = self.pos
+        while pos < len(text) and text[pos] in WHITESPACE:
+            pos += 1
+        self.pos = pos
+
+    def peek(self):
+        """Skip whitespace, and return the next character (or '' at the end)"""
+        self.skip_whitespace()
+        return self.text[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        """Consume char (after whitespace) or fail"""
+        if self.peek() != char:
+            self.fail()
+        self.pos += 1
+
+    @staticmethod
+    def group_if_multiple(name, tokens):
+        """Wrap tokens in a node if there are multiple"""
+        if len(tokens) > 1:
+            return ParseNode(name, tokens)
+        return tokens[0]
+
+    # Grammar rules, in order of increasing precedence
+
+    def expression(self):
+        """Sums and differences"""
+        tokens = []
+        if self.peek() == '+':
+            self.pos += 1
+            tokens.append('+')
+        tokens.append(self.product())
+        while True:
+            char = self.peek()
+            if char == '+':
+                op = '+'
+            elif char and char in MINUS:
+                op = '-'
+            else:
+                break
+            self.pos += 1
+            tokens.append(op)
+            tokens.append(self.product())
+        return self.group_if_multiple('sum', tokens)
+
+    def product(self):
+        """Multiplication and division"""
+        tokens = [self.parallel()]
+        while True:
+            char = self.peek()
+            if char not in ('*', '/'):
+                break
+            self.pos += 1
+            tokens.append(char)
+            tokens.append(self.parallel())
+        return self.group_if_multiple('product', tokens)
+
+    def parallel(self):
+        """The parallel operator, ||"""
+        tokens = [self.negation()]
+        while self.peek() == '|':
+            self.pos += 1
+            self.expect('|')
+            tokens.append(self.negation())
+        return self.group_if_multiple('parallel', tokens)
+
+    def negation(self):
+        """A single optional leading minus sign"""
+        char = self.peek()
+        if char and char in MINUS:
+            self.pos += 1
+            return ParseNode('negation', ['-', self.power()])
+        return self.power()
+
+    def power(self):
+        """Exponentiation, possibly with negative exponents"""
+        tokens = [self.atom()]
+        while self.peek() == '^':
+            self.pos += 1
+            char = self.peek()
+            if char and char in MINUS:
+                self.pos += 1
+                tokens.append('-')
+            tokens.append(self.atom())
+        return self.group_if_multiple('power', tokens)
+
+    def atom(self):
+        """Numbers, functions, variables, parentheses and arrays"""
+        char = self.peek()
+        if char == '(':
+            self.pos += 1
+            node = ParseNode('parentheses', [self.expression()])
+            self.expect(')')
+            return node
+        if char == '[':
+            self.pos += 1
+            node = ParseNode('array', self.expression_list())
+            self.expect(']')
+            return node
+
+        match = INNER_NUMBER.match(self.text, self.pos)
+        if match:
+            return self.number(match)
+
+        name = self.name()
+        if self.peek() == '(':
+            self.pos += 1
+            arguments = ParseNode('arguments', self.expression_list())
+            self.expect(')')
+            self.functions_used.add(name)
+            return ParseNode('function', [name, arguments])
+
+        self.variables_used.add(name)
+        return ParseNode('variable', [name])
+
+    def expression_list(self):
+        """A comma-separated list of at least one expression"""
+        expressions = [self.expression()]
+        while self.peek() == ',':
+            self.pos += 1
+            expressions.append(self.expression())
+        return expressions
+
+    def number(self, match):
+        """A number, beginning with match, and its optional suffix"""
+        num = match.group()
+        self.pos = match.end()
+
+        exponent = EXPONENT.match(self.text, self.pos)
+        if exponent:
+            sign, digits = exponent.groups()
+            sign = '-' if sign == '—' else sign
+            num += 'E' + sign + digits
+            self.pos = exponent.end()
+
+        self.skip_whitespace()
+        suffix = SUFFIX.match(self.text, self.pos)
+        if suffix:
+            self.pos = suffix.end()
+            self.suffixes_used.add(suffix.group())
+            return ParseNode('number', [num, suffix.group()])
+        return ParseNode('number', [num])
+
+    def name(self):
+        """A variable or function name"""
+        text = self.text
+        match = FRONT.match(text, self.pos)
+        if not match:
+            self.fail()
+        end = match.end()
+
+        subscripts = SUBSCRIPTS.match(text, end)
+        if subscripts and text[subscripts.end():subscripts.end() + 1] != '{':
+            end = subscripts.end()
+        else:
+            lower = LOWER_INDICES.match(text, end)
+            if lower:
+                end = lower.end()
+            upper = UPPER_INDICES.match(text, end)
+            if upper:
+                end = upper.end()
+
+        end = PRIMES.match(text, end).end()
+        name = text[self.pos:end]
+        self.pos = end
+        return name
@@ -6,19 +6,27 @@ Also includes MathMixin, a mixin class for math graders.
 """
 
 
+import hashlib
 import itertools
+import os
+import pickle
+import random
 import re
 import pprint
+import types
+from functools import partial
 from numbers import Number
 from collections import namedtuple
 
+import numpy as np
+
 from voluptuous import Schema, Required, Any, All, Length, Coerce
 
-from mitxgraders.baseclasses import ItemGrader
+from mitxgraders.baseclasses import ItemGrader, ObjectWithSchema
 from mitxgraders.exceptions import InvalidInput, ConfigError, MissingInput
 from mitxgraders.comparers import CorrelatedComparer
 from mitxgraders.sampling import (VariableSamplingSet, RealInterval, DiscreteSet, DependentSampler,
-                                  gen_symbols_samples, construct_functions,
+                                  gen_symbols_samples, seeded_sampling, construct_functions,
                                   construct_constants, construct_suffixes,
                                   schema_user_functions,
                                   validate_user_constants)
@@ -26,6 +34,8 @@ from mitxgraders.helpers.calc import (DEFAULT_VARIABLES, DEFAULT_FUNCTIONS, DEFA
                                       MathArray, parse, within_tolerance)
 from mitxgraders.helpers.validatorfuncs import (Positive, NonNegative, all_unique,
                                                 PercentageString)
+from mitxgraders.helpers.cache import LRUCache
+from mitxgraders.version import __version__
 
 
 def validate_blacklist_whitelist_config(default_funcs, blacklist, whitelist):
@@ -368,6 +378,102 @@ def warn_if_override(config, key, defaults):
     return config
 
 
+def fingerprint(obj, _path=None):
+    """
+    Returns a bytestring identifying obj, for hashing grader configurations
+    consistently between processes. Functions are identified by their bytecode,
+    default arguments, closures and the values of the globals that they refer
+    to, modules by their name, and memory addresses are removed from the
+    representation of anything else.
+
+    >>> fingerprint({'b': [1, 2.5], 'a': 'x'}) == fingerprint({'a': 'x', 'b': [1, 2.5]})
+    True
+    >>> fingerprint(lambda x: x + 1) == fingerprint(lambda x: x + 1)
+    True
+    >>> fingerprint(lambda x: x + 1) == fingerprint(lambda x: x + 2)
+    False
+    """
+    # Containers being fingerprinted, to guard against infinite recursion
+    path = set() if _path is None else _path
+    if id(obj) in path:
+        return b'<recursion>'
+    if isinstance(obj, types.FunctionType):
+        closure = []
+        for cell in obj.__closure__ or ():
+            try:
+                closure.append(cell.cell_contents)
+            except ValueError:  # pragma: no cover (empty cell)
+                closure.append(None)
+        contents = (obj.__code__, obj.__defaults__, closure, referenced_globals(obj))
+        return b'function' + fingerprint_contents(obj, contents, path)
+    if isinstance(obj, types.ModuleType):
+        return b'module ' + obj.__name__.encode()
+    if isinstance(obj, ObjectWithSchema):
+        return obj.__class__.__name__.encode() + fingerprint_contents(obj, obj.config, path)
+    if isinstance(obj, (dict, list, tuple, set, frozenset)):
+        return fingerprint_contents(obj, obj, path)
+    if isinstance(obj, np.ndarray):
+        return b'array' + repr(obj.shape).encode() + obj.tobytes()
+    if isinstance(obj, types.CodeType):
+        # Leave out the filename and line numbers, which may differ between runs
+        return (b'code' + obj.co_code + fingerprint(obj.co_consts, path)
+                + fingerprint(obj.co_names, path))
+    return re.sub(r"0x[0-9a-fA-F]+", "0x...", repr(obj)).encode()
+
+def referenced_globals(func):
+    """
+    Returns a dictionary of the global variables that a function (including
+    any functions defined within it) refers to, and their values.
+
+    >>> referenced_globals(lambda x: fingerprint(x) + re.escape(x)) == {
+    ...     'fingerprint': fingerprint, 're': re}
+    True
+    """
+    names = set()
+    codes = [func.__code__]
+    while codes:
+        code = codes.pop()
+        names.update(code.co_names)
+        codes.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+    return {name: func.__globals__[name] for name in names if name in func.__globals__}
+
+def fingerprint_contents(obj, contents, path):
+    """Fingerprint the contents of the container obj (see fingerprint)"""
+    path.add(id(obj))
+    try:
+        if isinstance(contents, dict):
+            items = sorted(fingerprint(key, path) + b':' + fingerprint(value, path)
+                           for key, value in contents.items())
+            return b'{' + b','.join(items) + b'}'
+        parts = [fingerprint(item, path) for item in contents]
+        if isinstance(contents, (set, frozenset)):
+            parts.sort()
+        return type(contents).__name__.encode() + b'[' + b','.join(parts) + b']'
+    finally:
+        path.discard(id(obj))
+
+# Pools of samples, shared between all graders in this process and keyed by a
+# hash of the grader configuration
+SAMPLE_POOLS = LRUCache(maxsize=100)
+
+# Author evaluations for individual sets of samples in the pools, keyed by
+# (pool key, index of the set in the pool). Use sample_pool_cache_info to
+# inspect usage, and AUTHOR_EVALS.resize to tune.
+AUTHOR_EVALS = LRUCache(maxsize=1000)
+
+def sample_pool_cache_info():
+    """
+    Returns statistics (see LRUCache.info) for the in-memory caches of sample
+    pools and of author evaluations.
+
+    >>> sorted(sample_pool_cache_info())
+    ['author_evals', 'pools']
+    """
+    return {
+        'pools': SAMPLE_POOLS.info(),
+        'author_evals': AUTHOR_EVALS.info()
+    }
+
 class MathMixin(object):
     """This is a mixin class that provides generic math handling capabilities"""
     # Set up a bunch of defaults
@@ -402,12 +508,11 @@ class MathMixin(object):
     
     def get_comparer_utils(self):
         """Get the utils for comparer function."""
-        
-        def _within_tolerance(x, y):
-            return within_tolerance(x, y, self.config['tolerance'])
-        
+        # A partial (rather than a closure) lets comparers recognize the stock
+        # within_tolerance, as MatrixEntryComparer does
         return self.Utils(tolerance=self.config['tolerance'],
-                          within_tolerance=_within_tolerance)
+                          within_tolerance=partial(within_tolerance,
+                                                   tolerance=self.config['tolerance']))
     
     # Set up a bunch of configuration options
     math_config_options = {
@@ -422,6 +527,7 @@ class MathMixin(object):
         ),
         Required('tolerance', default='0.01%'): Any(PercentageString, NonNegative(Number)),
         Required('samples', default=5): Positive(int),
+        Required('sampling_strategy', default='random'): Any('random', 'sobol', 'halton'),
         Required('variables', default=[]): All([str], all_unique),
         Required('numbered_vars', default=[]): All([str], all_unique),
         Required('sample_from', default={}): dict,
@@ -431,6 +537,8 @@ class MathMixin(object):
         Required('metric_suffixes', default=False): bool,
         Required('required_functions', default=[]): [str],
         Required('instructor_vars', default=[]): [str],
+        Required('sample_pool', default=0): NonNegative(int),
+        Required('sample_pool_dir', default=None): Any(None, str),
     }
     
     def validate_math_config(self):
@@ -518,24 +626,22 @@ class MathMixin(object):
         vars_used = set().union(*[p.variables_used for p in parsed_expressions])
         return vars_used
     
-    def gen_var_and_func_samples(self, *args):
+    def gen_var_and_func_samples(self, *args, context=None):
         """
         Generate a list of variable/function sampling dictionaries from the supplied arguments.
         Arguments may be strings, lists of strings, or dictionaries with string values.
         Does not flag any bad variables.
+
+        If a context dictionary is provided (see gen_context_samples), samples are
+        shared with other graders grading the same submission.
         """
-        # Make a list of all expressions to check for variables
-        expressions = []
-        for entry in args:
-            if isinstance(entry, str):
-                expressions.append(entry)
-            elif isinstance(entry, list):
-                expressions += entry
-            elif isinstance(entry, dict):
-                expressions += [v for k, v in entry.items()]
-        
+        if context is not None:
+            samples = self.gen_context_samples(context, *args)
+            if samples is not None:
+                return samples
+
         # Generate the variable list
-        variables, sample_from_dict = self.generate_variable_list(expressions)
+        variables, sample_from_dict = self.generate_variable_list(self.get_expressions(*args))
 
         # Check if a dictionary of sibling variables has been provided, and sample those too
         for entry in args:
@@ -548,14 +654,21 @@ class MathMixin(object):
                             raise MissingInput('Cannot grade answer, a required input is missing.')
                         sample_from_dict[k] = DependentSampler(formula=entry[k])
                     break
-        
-        # Generate the samples
+
+        return self.sample_variables(variables, sample_from_dict)
+
+    def sample_variables(self, variables, sample_from_dict):
+        """
+        Generate a list of variable sampling dictionaries for the given variables, and
+        a list of sampling dictionaries for the random functions.
+        """
         var_samples = gen_symbols_samples(variables,
                                           self.config['samples'],
                                           sample_from_dict,
                                           self.functions,
                                           self.suffixes,
-                                          self.constants)
+                                          self.constants,
+                                          strategy=self.config['sampling_strategy'])
         
         func_samples = gen_symbols_samples(list(self.random_funcs.keys()),
                                            self.config['samples'],
@@ -566,6 +679,195 @@ class MathMixin(object):
         
         return var_samples, func_samples
     
+    @property
+    def config_hash(self):
+        """A hash of the class and configuration of this grader, computed on first use"""
+        if getattr(self, '_config_hash', None) is None:
+            self._config_hash = hashlib.sha256(
+                fingerprint((self.__class__.__name__, self.config))).hexdigest()
+        return self._config_hash
+
+    def gen_context_samples(self, context, *args):
+        """
+        Like gen_var_and_func_samples, but shares samples between graders with the
+        same configuration that are grading the same submission, such as the
+        subgraders of a ListGrader. The context is a dictionary that holds the
+        shared samples and the values of the sibling inputs for each sample, so
+        that each sibling's input is only evaluated once per sample.
+
+        Returns None if samples can't be shared, as when a sampling set depends on
+        sibling variables.
+        """
+        variables, sample_from_dict = self.generate_variable_list(self.get_expressions(*args))
+        if any(isinstance(sampler, DependentSampler) and
+               any(name.startswith('sibling_') for name in sampler.config['depends'])
+               for sampler in sample_from_dict.values()):
+            return None
+
+        key = (self.config_hash, tuple(variables))
+        entry = context.get(key)
+        if entry is None:
+            var_samples, func_samples = self.sample_variables(variables, sample_from_dict)
+            entry = context[key] = {'var_samples': var_samples,
+                                    'func_samples': func_samples,
+                                    'siblings': {}}
+
+        siblings = next((arg for arg in args if isinstance(arg, dict)
+                         and all(k.startswith('sibling_') for k in arg)), {})
+        columns = {}
+        for name, formula in siblings.items():
+            if formula == '':
+                raise MissingInput('Cannot grade answer, a required input is missing.')
+            if formula not in entry['siblings']:
+                sampler = DependentSampler(formula=formula)
+                depends = sampler.config['depends']
+                if any(var not in entry['var_samples'][0] for var in depends):
+                    return None
+                var_columns = {var: [sample[var] for sample in entry['var_samples']]
+                               for var in depends}
+                entry['siblings'][formula] = sampler.compute_samples(
+                    var_columns, self.functions, self.suffixes, self.config['samples'])
+            columns[name] = entry['siblings'][formula]
+
+        var_samples = []
+        for index, sample in enumerate(entry['var_samples']):
+            sample = sample.copy()
+            sample.update({name: column[index] for name, column in columns.items()})
+            var_samples.append(sample)
+        return var_samples, entry['func_samples']
+
+    @staticmethod
+    def get_expressions(*args):
+        """
+        Make a list of all expressions in the supplied arguments, which may be strings,
+        lists of strings, or dictionaries with string values.
+
+        >>> MathMixin.get_expressions('x', ['y', 'z'], {'a': 'w'})
+        ['x', 'y', 'z', 'w']
+        """
+        expressions = []
+        for entry in args:
+            if isinstance(entry, str):
+                expressions.append(entry)
+            elif isinstance(entry, list):
+                expressions += entry
+            elif isinstance(entry, dict):
+                expressions += [v for k, v in entry.items()]
+        return expressions
+
+    def draw_from_sample_pool(self, author_expressions, student_expressions, evaluate):
+        """
+        Draws a set of samples from the sample pool for this configuration, along
+        with the author's evaluations for those samples.
+
+        Arguments:
+            author_expressions: expressions from the author's answer(s), in any
+                form accepted by gen_var_and_func_samples
+            student_expressions: expressions from the student's input, likewise
+            evaluate: a function evaluate(var_samples, func_samples) that returns
+                the author's evaluations for a set of samples
+
+        Returns a tuple (var_samples, func_samples, author_evals), or None if the
+        student's input requires variables that are not sampled in the pool.
+        """
+        author_expressions = self.get_expressions(author_expressions)
+        variables, _ = self.generate_variable_list(author_expressions)
+        student_variables, _ = self.generate_variable_list(
+            author_expressions + self.get_expressions(student_expressions))
+        if set(student_variables) != set(variables):
+            return None
+        key, pool = self.get_sample_pool(author_expressions)
+        index = random.randrange(len(pool))
+        var_samples, func_samples = pool[index]
+        author_evals = self.get_author_evals(key, index, var_samples, func_samples, evaluate)
+        return var_samples, func_samples, author_evals
+
+    def get_sample_pool(self, author_expressions):
+        """
+        Returns a tuple (key, pool) for this configuration, generating the pool if
+        needed. The pool is a list of sample_pool tuples (var_samples, func_samples),
+        and key is a hash of the configuration. Samples are generated
+        deterministically, seeded by the key, so that author evaluations can be
+        stored in sample_pool_dir and reused by later processes.
+        """
+        key = hashlib.sha256(fingerprint((self.__class__.__name__, self.config,
+                                          author_expressions))).hexdigest()
+        pool = SAMPLE_POOLS.get(key)
+        if pool is None:
+            with seeded_sampling(int(key[:8], 16)):
+                pool = [self.gen_var_and_func_samples(author_expressions)
+                        for _ in range(self.config['sample_pool'])]
+            SAMPLE_POOLS[key] = pool
+        return key, pool
+
+    def get_author_evals(self, key, index, var_samples, func_samples, evaluate):
+        """
+        Returns the author's evaluations for the set of samples at the given index
+        of the pool with the given key. These are looked up in AUTHOR_EVALS, then
+        in sample_pool_dir, and are only evaluated if neither has them, so that
+        the author's answers are evaluated just for the sets of samples in use.
+        """
+        author_evals = AUTHOR_EVALS.get((key, index))
+        if author_evals is None:
+            header = self.author_evals_header(key, index, var_samples, func_samples)
+            author_evals = self.load_author_evals(key, index, header)
+            if author_evals is None:
+                author_evals = evaluate(var_samples, func_samples)
+                self.save_author_evals(key, index, header, author_evals)
+            AUTHOR_EVALS[key, index] = author_evals
+        return author_evals
+
+    def author_evals_path(self, key, index):
+        """The path in sample_pool_dir at which to store author evaluations"""
+        return os.path.join(self.config['sample_pool_dir'],
+                            '{}-{}.pickle'.format(key, index))
+
+    @staticmethod
+    def author_evals_header(key, index, var_samples, func_samples):
+        """
+        The first line of a file of author evaluations, identifying the set of
+        samples (by position in the pool and by a digest of their values) and the
+        version of the library that evaluated them
+        """
+        digest = hashlib.sha256(fingerprint((var_samples, func_samples))).hexdigest()
+        return 'mitxgraders {} author evaluations {}-{} {}\n'.format(
+            __version__, key, index, digest).encode()
+
+    def load_author_evals(self, key, index, header):
+        """
+        Load author evaluations for a set of samples from sample_pool_dir, if available.
+
+        Only files starting with the expected header (see author_evals_header) are
+        unpickled, so that evaluations of different samples are never reused. As
+        unpickling can run arbitrary code, sample_pool_dir must only be writable by
+        the grader.
+        """
+        if self.config['sample_pool_dir'] is None:
+            return None
+        try:
+            with open(self.author_evals_path(key, index), 'rb') as f:
+                if f.readline() != header:
+                    return None
+                author_evals = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return author_evals
+
+    def save_author_evals(self, key, index, header, author_evals):
+        """Save author evaluations for a set of samples to sample_pool_dir, if possible"""
+        if self.config['sample_pool_dir'] is None:
+            return
+        path = self.author_evals_path(key, index)
+        try:
+            os.makedirs(self.config['sample_pool_dir'], exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(header)
+                pickle.dump(author_evals, f)
+            os.replace(path + '.tmp', path)
+        except (OSError, pickle.PicklingError, TypeError):
+            # The cache is only an optimization, so carry on without it
+            pass
+
     def generate_variable_list(self, expressions):
         """
         Generates the list of variables required to perform a comparison and the
@@ -584,9 +886,11 @@ class MathMixin(object):
         # Find all unassigned variables
         bad_vars = set(var for var in vars_used if var not in variable_list)
         
-        # Check to see if any unassigned variables are numbered_vars
+        # Check to see if any unassigned variables are numbered_vars. These are
+        # sorted so that samples seeded by sample_pool are assigned to the same
+        # variables in every process, whatever the hash seed.
         regexp = numbered_vars_regexp(self.config['numbered_vars'])
-        for var in bad_vars:
+        for var in sorted(bad_vars):
             match = regexp.match(var)  # Returns None if no match
             if match:
                 # This variable is a numbered_variable
@@ -655,6 +959,40 @@ class MathMixin(object):
         
         return results
     
+    def compare_evaluation_stream(self, evaluations, comparer, utils, failable_evals):
+        """
+        Compare the student evaluations to the expected results, given an iterable
+        of (compare_params_eval, student_eval) pairs, one per sample.
+
+        Unless the comparer is correlated, comparison stops (and no further samples
+        are evaluated) as soon as more than failable_evals comparisons have failed,
+        as the outcome is then known. Returns the list of results so far.
+        """
+        if isinstance(comparer, CorrelatedComparer):
+            compare_params_evals, student_evals = zip(*evaluations)
+            return self.compare_evaluations(list(compare_params_evals), list(student_evals),
+                                            comparer, utils)
+
+        results = []
+        num_failures = 0
+        for compare_params_eval, student_eval in evaluations:
+            result = comparer(compare_params_eval, student_eval, utils)
+            results.append(ItemGrader.standardize_cfn_return(result))
+            if results[-1]['ok'] != True:
+                num_failures += 1
+                if num_failures > failable_evals:
+                    break
+
+        if self.config['debug']:
+            self.log_comparison_info(comparer, results)
+            if len(results) < self.config['samples']:
+                msg = ("Comparison stopped after sample {index} of {total}, as more than "
+                       "{failable_evals} comparison(s) failed\n")
+                self.log(msg.format(index=len(results), total=self.config['samples'],
+                                    failable_evals=failable_evals))
+
+        return results
+
     def log_eval_info(self, index, varlist, funclist, **kwargs):
         """Add sample information to debug log"""
         
@@ -0,0 +1,162 @@
+"""
+quasirandom.py
+
+Generators of randomized low-discrepancy (quasi-random) points in the unit
+hypercube, using only NumPy:
+* sobol_points
+* halton_points
+
+Low-discrepancy points cover the hypercube more evenly than independent
+uniform draws, so that a few samples are less likely to all fall in the same
+corner of the sampling domain. Both generators are randomized (by a random
+digital shift for Sobol points, and a random rotation for Halton points), so
+that every call produces a different set of points with the same evenness.
+"""
+
+
+import numpy as np
+
+# Primitive polynomials and initial direction numbers for Sobol dimensions
+# 2, 3, ... (dimension 1 is the van der Corput sequence), from the table of
+# S. Joe and F. Y. Kuo, "Constructing Sobol sequences with better
+# two-dimensional projections", SIAM J. Sci. Comput. 30, 2635 (2008).
+# Each entry is (s, a, m): the polynomial has degree s, its inner
+# coefficients are the bits of a, and m lists the first s direction numbers.
+SOBOL_DIRECTIONS = [
+    (1, 0, [1]),
+    (2, 1, [1, 3]),
+    (3, 1, [1, 3, 1]),
+    (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]),
+    (4, 4, [1, 3, 5, 13]),
+    (5, 2, [1, 1, 5, 5, 17]),
+    (5, 4, [1, 1, 5, 5, 5]),
+    (5, 7, [1, 1, 7, 11, 19]),
+    (5, 11, [1, 1, 5, 1, 1]),
+    (5, 13, [1, 1, 1, 3, 11]),
+    (5, 14, [1, 3, 5, 5, 31]),
+    (6, 1, [1, 3, 3, 9, 7, 49]),
+    (6, 13, [1, 1, 1, 15, 21, 21]),
+    (6, 16, [1, 3, 1, 13, 27, 49]),
+]
+SOBOL_MAX_DIMS = len(SOBOL_DIRECTIONS) + 1
+
+# Number of bits of precision in Sobol points
+SOBOL_BITS = 32
+
+# Direction numbers, computed on first use
+_direction_numbers = None
+
+def sobol_direction_numbers(dims):
+    """
+    Returns an array of shape (dims, SOBOL_BITS) holding the direction numbers
+    of the first dims dimensions of the Sobol sequence, as integers scaled by
+    2**SOBOL_BITS.
+
+    >>> directions = sobol_direction_numbers(2)
+    >>> [int(v) >> (SOBOL_BITS - 3) for v in directions[1, :3]]
+    [4, 6, 5]
+    """
+    global _direction_numbers  # pylint: disable=global-statement
+    if _direction_numbers is None:
+        directions = np.zeros((SOBOL_MAX_DIMS, SOBOL_BITS), dtype=np.uint64)
+        directions[0] = [1 << (SOBOL_BITS - 1 - k) for k in range(SOBOL_BITS)]
+        for dim, (s, a, m) in enumerate(SOBOL_DIRECTIONS, start=1):
+            v = [m[k] << (SOBOL_BITS - 1 - k) for k in range(s)]
+            for k in range(s, SOBOL_BITS):
+                value = v[k - s] ^ (v[k - s] >> s)
+                for i in range(1, s):
+                    if (a >> (s - 1 - i)) & 1:
+                        value ^= v[k - i]
+                v.append(value)
+            directions[dim] = v
+        _direction_numbers = directions
+    return _direction_numbers[:dims]
+
+def sobol_points(n, dims):
+    """
+    Returns an array of shape (n, dims) holding the first n points of a
+    randomly digitally shifted Sobol sequence in the unit hypercube. Sobol
+    points are most evenly spread when n is a power of 2.
+
+    Raises ValueError if dims exceeds SOBOL_MAX_DIMS.
+
+    >>> points = sobol_points(8, 2)
+    >>> points.shape
+    (8, 2)
+
+    Each of the 8 subintervals of width 1/8 of each axis contains one point:
+    >>> [sorted(np.floor(8*points[:, dim]).astype(int).tolist()) for dim in range(2)]
+    [[0, 1, 2, 3, 4, 5, 6, 7], [0, 1, 2, 3, 4, 5, 6, 7]]
+    """
+    if dims > SOBOL_MAX_DIMS:
+        raise ValueError("Sobol points are available in at most {} dimensions".format(
+            SOBOL_MAX_DIMS))
+    directions = sobol_direction_numbers(dims)
+    indices = np.arange(n, dtype=np.uint64)
+    points = np.zeros((n, dims), dtype=np.uint64)
+    for bit in range(max(int(n - 1).bit_length(), 1)):
+        mask = (indices >> np.uint64(bit)) & np.uint64(1)
+        points ^= mask[:, np.newaxis] * directions[:, bit]
+    shift = np.random.randint(0, 2**SOBOL_BITS, size=dims, dtype=np.uint64)
+    points ^= shift
+    return points / 2.0**SOBOL_BITS
+
+def primes(count):
+    """
+    Returns a list of the first count prime numbers.
+
+    >>> primes(6)
+    [2, 3, 5, 7, 11, 13]
+    """
+    found = []
+    candidate = 2
+    while len(found) < count:
+        if all(candidate % prime for prime in found if prime * prime <= candidate):
+            found.append(candidate)
+        candidate += 1
+    return found
+
+def halton_points(n, dims):
+    """
+    Returns an array of shape (n, dims) holding n points of a randomly
+    rotated Halton sequence in the unit hypercube. Dimension k uses the
+    radical inverse in the base of the kth prime, so that high dimensions
+    need many points to be evenly covered.
+
+    >>> points = halton_points(6, 2)
+    >>> points.shape
+    (6, 2)
+
+    Before rotation, the second axis holds the base 3 radical inverses of 1, ..., 6:
+    >>> rotated = points[:, 1] - points[0, 1] + 1/3
+    >>> np.round(9*(rotated % 1.0)).astype(int).tolist()
+    [3, 6, 1, 4, 7, 2]
+    """
+    points = np.zeros((n, dims))
+    for dim, base in enumerate(primes(dims)):
+        indices = np.arange(1, n + 1)
+        scale = 1.0
+        while np.any(indices):
+            scale /= base
+            points[:, dim] += scale * (indices % base)
+            indices //= base
+    return (points + np.random.random_sample(dims)) % 1.0
+
+def low_discrepancy_points(strategy, n, dims):
+    """
+    Returns an array of shape (n, dims) of points in the unit hypercube,
+    generated by strategy ('sobol' or 'halton'). Dimensions beyond
+    SOBOL_MAX_DIMS are sampled independently for the 'sobol' strategy.
+
+    >>> low_discrepancy_points('sobol', 4, SOBOL_MAX_DIMS + 2).shape
+    (4, 18)
+    >>> low_discrepancy_points('halton', 4, 3).shape
+    (4, 3)
+    """
+    if strategy == 'halton':
+        return halton_points(n, dims)
+    if dims <= SOBOL_MAX_DIMS:
+        return sobol_points(n, dims)
+    extra = np.random.random_sample((n, dims - SOBOL_MAX_DIMS))
+    return np.hstack([sobol_points(n, SOBOL_MAX_DIMS), extra])
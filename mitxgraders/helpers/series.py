@@ -0,0 +1,173 @@
+"""
+series.py
+
+Summation of infinite series that stops as soon as the sum has converged, using
+only NumPy:
+* sum_series
+* levin_u_estimate
+
+sum_series evaluates the terms of a series in blocks that double in size,
+stopping once further terms no longer change the sum. For slowly converging
+series, it can also apply Levin's u-transform, which extrapolates the sum of
+the series from its first few dozen terms.
+"""
+
+
+import numpy as np
+
+# Number of terms in the first block of a series; later blocks double in size
+SERIES_FIRST_BLOCK = 16
+
+# A block of terms that changes a sum by less than this, relative to the
+# size of the sum, no longer affects it
+SERIES_RTOL = np.finfo(float).eps
+
+# Number of consecutive blocks that must leave a sum unchanged before it is
+# treated as converged
+SERIES_CONVERGED_BLOCKS = 2
+
+# Maximum order of the Levin u-transform. Higher orders suffer from rounding
+# errors in double precision.
+LEVIN_MAX_ORDER = 30
+
+# Levin estimates are accepted once successive orders agree to this relative tolerance
+LEVIN_RTOL = 1e-8
+
+# Weights of the Levin u-transform, computed on first use
+_levin_weights = None
+
+def levin_weights():
+    """
+    Returns an array of shape (LEVIN_MAX_ORDER + 1, LEVIN_MAX_ORDER + 1), whose
+    (k, j) entry is the weight (-1)^j C(k, j) ((1 + j)/(1 + k))^(k - 1) of the
+    jth partial sum in the Levin u-transform of order k (with beta = 1).
+
+    >>> np.round(levin_weights()[2, :3], 4).tolist()
+    [0.3333, -1.3333, 1.0]
+    """
+    global _levin_weights  # pylint: disable=global-statement
+    if _levin_weights is None:
+        size = LEVIN_MAX_ORDER + 1
+        weights = np.zeros((size, size))
+        binomials = np.zeros(size)
+        binomials[0] = 1
+        j = np.arange(size)
+        for k in range(size):
+            if k:
+                binomials[1:k+1] = binomials[1:k+1] + binomials[:k]
+            weights[k] = (-1.0)**j * binomials * ((1.0 + j) / (1.0 + k))**(k - 1)
+        _levin_weights = weights
+    return _levin_weights
+
+def levin_u_estimate(terms):
+    """
+    Returns an estimate of the sum of an infinite series from its first few
+    terms, using Levin's u-transform, or None if no reliable estimate is found.
+
+    The transforms of orders up to LEVIN_MAX_ORDER are computed, and the one that
+    agrees best with the two next lower orders is returned, provided they agree
+    to within LEVIN_RTOL. The terms must be nonzero numbers (after any leading zeros).
+
+    The sum of 1/n^2 is pi^2/6, but 30 terms only give two decimal places:
+    >>> terms = [1/n**2 for n in range(1, 31)]
+    >>> abs(sum(terms) - np.pi**2/6) < 1e-1, abs(sum(terms) - np.pi**2/6) < 1e-2
+    (True, False)
+    >>> abs(levin_u_estimate(terms) - np.pi**2/6) < 1e-8
+    True
+
+    Series that don't settle down give no estimate:
+    >>> print(levin_u_estimate([np.cos(n)/n**2 for n in range(1, 31)]))
+    None
+    """
+    terms = np.asarray(terms)
+    if terms.ndim != 1 or terms.dtype.kind not in 'iufc':
+        return None
+    nonzero = np.flatnonzero(terms)
+    if len(nonzero) < 4:
+        return None
+    terms = terms[nonzero[0]:nonzero[0] + LEVIN_MAX_ORDER + 1]
+    if not np.all(terms) or not np.all(np.isfinite(terms)):
+        return None
+
+    # Remainder estimates (1 + j) a_j of the partial sums S_j
+    inverse_remainders = 1 / ((1.0 + np.arange(len(terms))) * terms)
+    partial_sums = np.cumsum(terms)
+    weights = levin_weights()[1:len(terms), :len(terms)]
+    with np.errstate(all='ignore'):
+        estimates = weights.dot(partial_sums * inverse_remainders) / weights.dot(inverse_remainders)
+        differences = np.abs(np.diff(estimates)) / np.abs(estimates[1:])
+        # Low orders can agree by coincidence, so require three orders to agree
+        differences = np.maximum(differences[1:], differences[:-1])
+    differences[~np.isfinite(differences)] = np.inf
+    best = np.argmin(differences)
+    if differences[best] > LEVIN_RTOL:
+        return None
+    return estimates[best + 2].item()
+
+def magnitude(value):
+    """
+    Returns the largest absolute value of the entries of a number or array.
+
+    >>> magnitude(-3), magnitude(np.array([1, -2j]))
+    (3, 2.0)
+    """
+    return np.max(np.abs(value))
+
+def sum_series(eval_terms, values, accelerate=False, max_block=1000):
+    """
+    Returns the sum of the terms of a series at the given values of the summation
+    variable, stopping early once the sum has converged.
+
+    Arguments:
+        eval_terms (function): Takes a list of values of the summation variable
+                               and returns the list of corresponding terms
+        values (range): The values of the summation variable, in order
+        accelerate (bool): Whether to estimate the sum of scalar series with
+                           levin_u_estimate if it has not converged after the
+                           first blocks of terms (default False)
+        max_block (int): The maximum number of terms to evaluate at once (default 1000)
+
+    The terms are summed in order, in blocks that double in size. Once
+    SERIES_CONVERGED_BLOCKS consecutive blocks, and their last terms, each change
+    the (nonzero) sum by less than SERIES_RTOL, relative to its size, the sum is
+    returned. If this never occurs, all terms are summed.
+
+    >>> calls = []
+    >>> def eval_terms(values):
+    ...     calls.append(len(values))
+    ...     return [0.5**n for n in values]
+    >>> sum_series(eval_terms, range(0, 1001))
+    2.0
+    >>> calls
+    [16, 32, 64, 128, 256]
+
+    Leading terms that vanish don't stop the sum early:
+    >>> sum_series(lambda values: [n // 20 for n in values], range(0, 41))
+    22
+    """
+    total = 0
+    terms = []
+    converged_blocks = 0
+    start = 0
+    size = SERIES_FIRST_BLOCK
+    while start < len(values):
+        block = eval_terms(list(values[start:start + size]))
+        total = sum(block, total)
+        scale = SERIES_RTOL * magnitude(total)
+        if scale > 0 and magnitude(sum(block)) <= scale and magnitude(block[-1]) <= scale:
+            converged_blocks += 1
+            if converged_blocks == SERIES_CONVERGED_BLOCKS:
+                return total
+        else:
+            converged_blocks = 0
+
+        if accelerate and len(terms) <= LEVIN_MAX_ORDER:
+            terms.extend(block)
+            estimate = levin_u_estimate(terms)
+            if estimate is not None:
+                return estimate
+
+        start += size
+        size = min(2 * size, max_block)
+
+    return total
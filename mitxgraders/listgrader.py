@@ -8,12 +8,14 @@ Classes for grading inputs that look like lists:
 Both work by farming out the individual objects to other graders.
 """
 
+import copy
+
 import numpy as np
 from voluptuous import Required, Any, Schema
-from mitxgraders.helpers import munkres
 from mitxgraders.baseclasses import AbstractGrader, ItemGrader
 from mitxgraders.exceptions import ConfigError, MissingInput
 from mitxgraders.helpers.validatorfuncs import Positive
+from mitxgraders.helpers.assignment import optimal_assignment
 
 # Set the objects to be imported from this grader
 __all__ = [
@@ -24,7 +26,36 @@ __all__ = [
 class _AutomaticFailure(object):  # pylint: disable=too-few-public-methods
     """Used as padding when grading unknown number of inputs on a single input line"""
 
-def find_optimal_order(check, answers, student_list):
+def first_occurrences(items):
+    """
+    Returns a list holding the index of the first item equal to each item.
+
+    Usage
+    =====
+    >>> first_occurrences(['a', 'b', 'a', ['c'], ['c']])
+    [0, 1, 0, 3, 3]
+
+    Items that can't be compared with == are treated as distinct:
+    >>> first_occurrences([np.array([1, 2]), np.array([1, 2])])
+    [0, 1]
+    """
+    firsts = []
+    indices = []
+    for index, item in enumerate(items):
+        for first in firsts:
+            try:
+                if items[first] == item:
+                    indices.append(first)
+                    break
+            except (ValueError, TypeError):
+                # Items like numpy arrays can't be compared this way
+                pass
+        else:
+            firsts.append(index)
+            indices.append(index)
+    return indices
+
+def find_optimal_order(check, answers, student_list, share_evaluations=False, prune=None):
     """
     Finds optimal assignment (according to check function) of inputs to answers.
 
@@ -32,33 +63,142 @@ def find_optimal_order(check, answers, student_list):
         answers (list): A list [answers_0, answers_1, ...]
             wherein each answers_i is a valid ItemGrader.config['answers']
         student_list (list): a list of student inputs
+        share_evaluations (bool): Whether to pass shared_evaluations to check,
+            so that an ItemGrader may share its evaluations of each student
+            input between all answers (see FormulaGrader.check)
+        prune (callable): If given, is called with the results of each student
+            input against every answer as they are computed, and may return True
+            to stop checking the remaining inputs (see score_bound)
 
     Returns:
-        An optimally-grader input_list whose dictionaries match student_list in order.
+        An optimally-grader input_list whose dictionaries match student_list in order,
+        or None if checking was stopped by prune.
+
+    Identical answers and identical inputs are only checked once.
 
     NOTE:
-        uses https://github.com/bmc/munkres
+        uses the Munkres algorithm (see helpers/assignment.py)
         to solve https://en.wikipedia.org/wiki/Assignment_problem
     """
-    result_matrix = [[check(a, i) for a in answers] for i in student_list]
+    answer_indices = first_occurrences(answers)
+    input_indices = first_occurrences(student_list)
+    # Every answer of every ItemGrader answers tuple in answers
+    item_answers = tuple(entry for answer in answers if isinstance(answer, tuple)
+                         for entry in answer)
+
+    results = {}
+    result_matrix = []
+    for i, student_input in zip(input_indices, student_list):
+        kwargs = {}
+        if share_evaluations:
+            kwargs['shared_evaluations'] = {'answers': item_answers}
+        row = []
+        for a, answer in zip(answer_indices, answers):
+            if (a, i) in results:
+                row.append(copy.deepcopy(results[a, i]))
+            else:
+                results[a, i] = check(answer, student_input, **kwargs)
+                row.append(results[a, i])
+        result_matrix.append(row)
+        if prune is not None and prune(row):
+            return None
 
     def calculate_cost(result):
         """
         The result matrix could contain short-form or long-form result dictionaries.
         If long-form, we need to consolidate grades.
-        Either way, Munkres wants a cost matrix
+        Either way, optimal_assignment wants a cost matrix
         """
         if 'input_list' in result:
             grades = [r['grade_decimal'] for r in result['input_list']]
             result['grade_decimal'] = consolidate_grades(grades)
         return 1 - result['grade_decimal']
 
-    cost_matrix = munkres.make_cost_matrix(result_matrix, calculate_cost)
-    indexes = munkres.Munkres().compute(cost_matrix)
+    cost_matrix = np.array([[calculate_cost(result) for result in row]
+                            for row in result_matrix])
+    indexes = optimal_assignment(cost_matrix)
 
     input_list = [result_matrix[i][j] for i, j in indexes]
     return input_list
 
+def share_equal_answers(answer_lists):
+    """
+    Replaces each answer in a tuple of lists of answers by the first equal answer
+    in any of the lists, so that equal answers are the same object and can share
+    their results (see memoized_check).
+
+    >>> lists = share_equal_answers((['a', ['b']], [['b'], 'c']))
+    >>> lists
+    [['a', ['b']], [['b'], 'c']]
+    >>> lists[0][1] is lists[1][0]
+    True
+    """
+    flat = [answer for answer_list in answer_lists for answer in answer_list]
+    firsts = iter(first_occurrences(flat))
+    return [[flat[next(firsts)] for _ in answer_list] for answer_list in answer_lists]
+
+def memoized_check(check, results, key=None):
+    """
+    Wraps a check function to store its results in the results dictionary by the
+    identity of the answer and student input (along with key), so that each pair
+    is only checked once. Later checks of the pair receive a copy of the result.
+    """
+    def _check(answer, student_input, **kwargs):
+        ident = (key, id(answer), id(student_input))
+        if ident in results:
+            return copy.deepcopy(results[ident])
+        results[ident] = check(answer, student_input, **kwargs)
+        return results[ident]
+    return _check
+
+def result_score(result):
+    """
+    The score of a short-form item result, or of a long-form list result, as it
+    counts towards the score of a list (see ListGrader.get_best_result).
+
+    >>> result_score({'ok': True, 'msg': '', 'grade_decimal': 0.5})
+    0.5
+    >>> result_score({'overall_message': '', 'input_list': [
+    ...     {'ok': True, 'msg': '', 'grade_decimal': 1},
+    ...     {'ok': False, 'msg': '', 'grade_decimal': 0}
+    ... ]})
+    1
+    """
+    if 'input_list' in result:
+        return sum(entry['grade_decimal'] for entry in result['input_list'])
+    return result['grade_decimal']
+
+def score_bound(weights, target):
+    """
+    Creates a prune function for find_optimal_order or ListGrader.get_ordered_input_list,
+    which tracks the highest score that a list can still achieve, and returns True
+    as soon as this falls below target.
+
+    Arguments:
+        weights (list): The most that each of the inputs in turn can score
+        target (float): The score to achieve, or None to never stop
+
+    The prune function is called with the results of each input in turn, and
+    assumes the best of them for that input.
+
+    >>> prune = score_bound([1, 1, 1], 2)
+    >>> prune([{'grade_decimal': 0.5}, {'grade_decimal': 1}])
+    False
+    >>> prune([{'grade_decimal': 0}])  # A tie with target is still possible
+    False
+    >>> prune([{'grade_decimal': 0.5}])
+    True
+    """
+    bound = [sum(weights)]
+    remaining = iter(weights)
+
+    def prune(row):
+        """Lowers the bound using the best result in row, comparing it to target"""
+        bound[0] += max(result_score(result) for result in row) - next(remaining)
+        # Allow for rounding, so that lists which tie with the target are kept
+        return target is not None and bound[0] < target - 1e-9
+    return prune
+
 def get_padded_lists(list1, list2):
     """
     Pads the shorter of list1 and list2 and returns copies of both
@@ -71,10 +211,10 @@ def get_padded_lists(list1, list2):
 
 def padded_check(check):
     """Wraps a check function to reject _AutomaticFailure"""
-    def _check(ans, inp):
+    def _check(ans, inp, **kwargs):
         if isinstance(ans, _AutomaticFailure) or isinstance(inp, _AutomaticFailure):
             return {'ok': False, 'msg': '', 'grade_decimal': 0, 'all_awarded': False}
-        return check(ans, inp)
+        return check(ans, inp, **kwargs)
     return _check
 
 def consolidate_grades(grade_decimals, n_expect=None):
@@ -382,9 +522,27 @@ class ListGrader(AbstractGrader):
         else:
             self.config['subgraders'].debuglog = self.debuglog
 
+        for answer_list in answers:
+            self.validate_submission(answer_list, student_input)
+        grouped_inputs = self.groupify_list(self.grouping, student_input)
+
         # Perform the check against each possible list of answers and select the best
-        # result for the student
-        results = [self.perform_check(answer_list, student_input) for answer_list in answers]
+        # result for the student. The subgraders share samples and evaluations of
+        # sibling inputs for this submission through the context, and the results of
+        # equal answers against each input are shared between the lists. Once a list
+        # can no longer score as highly as the best list so far, its remaining checks
+        # are skipped, as get_best_result could not choose it.
+        context = {}
+        memo = {}
+        results = []
+        best_score = None
+        for answer_list in share_equal_answers(answers):
+            result = self.perform_check(answer_list, grouped_inputs, context, memo, best_score)
+            if result is None:
+                continue
+            results.append(result)
+            score = sum(entry['grade_decimal'] for entry in result['input_list'])
+            best_score = score if best_score is None else max(best_score, score)
         best_result = self.get_best_result(results)
 
         # If no partial credit is to be awarded, zero out all scores if not perfect
@@ -476,11 +634,18 @@ class ListGrader(AbstractGrader):
                 msg = "The number of answers ({}) and the number of inputs ({}) are different"
                 raise ConfigError(msg.format(len(answers), len(student_list)))
 
-    def get_ordered_input_list(self, answers, grouped_inputs):
+    def get_ordered_input_list(self, answers, grouped_inputs, context=None, results=None,
+                               prune=None):
         """
         Pass answers and inputs to the appropriate grader, along with sibling
-        information.
+        information and a context dictionary, in which subgraders may share
+        samples and evaluations of sibling inputs (see MathMixin.gen_context_samples).
+
+        Results are stored in the results dictionary (see memoized_check). If
+        given, prune is called with the result of each input in turn, and may
+        return True to stop checking, returning None (see score_bound).
         """
+        results = {} if results is None else results
         # If 'subgraders' is a single grader, create a list of references to it.
         graders = (self.config['subgraders'] if self.subgrader_list
                    else [self.config['subgraders'] for _ in answers])
@@ -490,28 +655,44 @@ class ListGrader(AbstractGrader):
             for grader, _, theinput in compare
             ]
 
-        input_list = [
-            grader.check(answer, theinput, siblings=siblings)
-            for (grader, answer, theinput) in compare
-        ]
+        input_list = []
+        for grader, answer, theinput in compare:
+            check = memoized_check(grader.check, results, id(grader))
+            input_list.append(check(answer, theinput, siblings=siblings, sibling_context=context))
+            if prune is not None and prune(input_list[-1:]):
+                return None
 
         return input_list
 
-    def perform_check(self, answers, student_list):
+    def perform_check(self, answers, grouped_inputs, context=None, results=None, target=None):
         """
-        Compare the list of responses from a student against a specific list of answers.
+        Compare the grouped list of responses from a student against a specific list
+        of answers, using the context dictionary for ordered subgraders (see
+        get_ordered_input_list) and storing subgrader results in the results
+        dictionary, to be shared with other lists of answers (see memoized_check).
+
+        If target is given, returns None as soon as the list is unable to score
+        at least target.
         """
-        self.validate_submission(answers, student_list)
+        results = {} if results is None else results
+        # The most that each group of inputs can score
+        weights = ([len(group) for group in self.grouping] if self.grouping
+                   else [1] * len(grouped_inputs))
+        prune = score_bound(weights, target)
 
-        # Group the inputs in preparation for grading
-        grouped_inputs = self.groupify_list(self.grouping, student_list)
         if self.config['ordered']:
-            input_list = self.get_ordered_input_list(answers, grouped_inputs)
+            input_list = self.get_ordered_input_list(answers, grouped_inputs, context,
+                                                     results, prune)
         else:
             # If unordered, then there is a single subgrader. Find optimal grading.
-            input_list = find_optimal_order(self.config['subgraders'].check,
+            subgrader = self.config['subgraders']
+            input_list = find_optimal_order(memoized_check(subgrader.check, results),
                                             answers,
-                                            grouped_inputs)
+                                            grouped_inputs,
+                                            isinstance(subgrader, ItemGrader),
+                                            prune)
+        if input_list is None:
+            return None
 
         # We need to restore the original order of inputs.
         # At this point, input_list contains items each of which is either:
@@ -761,7 +942,8 @@ class SingleListGrader(ItemGrader):
         if self.config['ordered']:
             grade_list = [checker(*pair) for pair in zip(pad_ans, pad_stud)]
         else:
-            grade_list = find_optimal_order(checker, pad_ans, pad_stud)
+            grade_list = find_optimal_order(checker, pad_ans, pad_stud,
+                                            isinstance(self.config['subgrader'], ItemGrader))
 
         # Convert the list of grades into the SingleListGrader result
         return self.process_grade_list(grade_list, len(answers), msg, grade_decimal)
@@ -23,12 +23,6 @@ from mitxgraders.sampling import VariableSamplingSet, RealInterval, ScalarSampli
 from mitxgraders.helpers.validatorfuncs import NumberRange, is_shape_specification
 from mitxgraders.helpers.calc import MathArray
 
-class Unavailable(object):
-    def rvs(self, dimension):
-        raise NotImplementedError('This feature requires newer versions of numpy '
-                                  'and scipy than are available.')
-
-
 # Set the objects to be imported from this grader
 __all__ = [
     "RealVectors",
@@ -49,6 +43,58 @@ class Retry(Exception):
     constraints, and a new random draw should be taken.
     """
 
+# Results of stack_method_is_current, by class and methods
+STACK_METHODS_CURRENT = {}
+
+def haar_matrices(count, dimension, unitary=False):
+    """
+    Returns a stack of count random orthogonal (or unitary, if unitary) matrices of the
+    given dimension, distributed according to the Haar measure on O(n) (or U(n)).
+
+    The QR decomposition of a matrix of normally distributed entries gives a random
+    orthogonal Q, but its distribution depends on the sign (phase) conventions of the
+    decomposition. Scaling each column of Q by the phase of the corresponding diagonal
+    entry of R fixes these conventions, making Q Haar-distributed (see F. Mezzadri,
+    "How to generate random matrices from the classical compact groups", Notices of
+    the AMS 54, 592 (2007)).
+
+    >>> matrices = haar_matrices(3, 4, unitary=True)
+    >>> matrices.shape
+    (3, 4, 4)
+    >>> product = np.matmul(matrices, np.conj(np.swapaxes(matrices, -1, -2)))
+    >>> np.allclose(product, np.eye(4))
+    True
+    """
+    shape = (count, dimension, dimension)
+    gaussian = np.random.standard_normal(shape)
+    if unitary:
+        gaussian = (gaussian + 1j*np.random.standard_normal(shape)) / np.sqrt(2)
+    q, r = np.linalg.qr(gaussian)
+    diagonal = np.diagonal(r, axis1=-2, axis2=-1)
+    return q * (diagonal / np.abs(diagonal))[:, np.newaxis, :]
+
+def stack_method_is_current(obj, method, stack_method):
+    """
+    Determines whether obj can use stack_method, a version of method that acts on
+    a stack of arrays at once. This is not the case if a subclass has shadowed
+    method without also shadowing stack_method.
+
+    >>> class Vectors(RealVectors):
+    ...     def normalize(self, array):
+    ...         return array
+    >>> stack_method_is_current(RealVectors(), 'normalize', 'normalize_stack')
+    True
+    >>> stack_method_is_current(Vectors(), 'normalize', 'normalize_stack')
+    False
+    """
+    key = (type(obj), method, stack_method)
+    if key not in STACK_METHODS_CURRENT:
+        mro = type(obj).__mro__
+        def defined_in(name):
+            return next(index for index, cls in enumerate(mro) if name in vars(cls))
+        STACK_METHODS_CURRENT[key] = defined_in(stack_method) <= defined_in(method)
+    return STACK_METHODS_CURRENT[key]
+
 
 class ArraySamplingSet(VariableSamplingSet):
     """
@@ -94,6 +140,17 @@ class ArraySamplingSet(VariableSamplingSet):
         array = self.generate_sample()
         return MathArray(array)
 
+    def gen_samples(self, n):
+        """
+        Generates a list of n array samples as MathArrays.
+
+        This calls generate_samples, which generates all of the samples at once,
+        unless a subclass has shadowed generate_sample but not generate_samples.
+        """
+        if not stack_method_is_current(self, 'generate_sample', 'generate_samples'):
+            return super(ArraySamplingSet, self).gen_samples(n)
+        return [MathArray(array) for array in self.generate_samples(n)]
+
     def generate_sample(self):
         """
         Generates a random array of shape and norm determined by config. After
@@ -132,6 +189,62 @@ class ArraySamplingSet(VariableSamplingSet):
         raise ValueError('Unable to construct sample for {}'
                          .format(type(self).__name__))  # pragma: no cover
 
+    def generate_samples(self, n):
+        """
+        Generates a list of n random arrays as for generate_sample, but draws all of
+        the arrays at once, and transforms them as a stack using apply_symmetry_stack
+        and normalize_stack. Only the arrays that these reject are drawn again.
+
+        Returns a list of numpy arrays.
+        """
+        samples = [None] * n
+        pending = np.arange(n)
+        loops = 0
+        while pending.size and loops < 100:
+            loops += 1
+
+            # Construct a stack of arrays with entries in [-0.5, 0.5)
+            shape = (pending.size,) + tuple(self.config['shape'])
+            arrays = np.random.random_sample(shape) - 0.5
+            # Make the arrays complex if needed
+            if self.config['complex']:
+                arrays = arrays + 1j*(np.random.random_sample(shape) - 0.5)
+
+            # Apply any symmetries to the arrays, then normalize those that are accepted
+            arrays, accepted = self.transform_stack('apply_symmetry', arrays)
+            positions = np.flatnonzero(accepted)
+            if positions.size:
+                arrays, accepted = self.transform_stack('normalize', arrays[positions])
+                positions = positions[accepted]
+                for index, array in zip(pending[positions], arrays[accepted]):
+                    samples[index] = array
+                pending = np.delete(pending, positions)
+
+        if pending.size:
+            raise ValueError('Unable to construct sample for {}'
+                             .format(type(self).__name__))  # pragma: no cover
+        return samples
+
+    def transform_stack(self, method, arrays):
+        """
+        Applies method ('apply_symmetry' or 'normalize') to a stack of arrays, using
+        its stack version where possible. Returns the stack of results, and a boolean
+        array stating which results were accepted (did not raise Retry).
+        """
+        stack_method = method + '_stack'
+        if stack_method_is_current(self, method, stack_method):
+            return getattr(self, stack_method)(arrays)
+
+        results = []
+        accepted = np.ones(len(arrays), dtype=bool)
+        for index, array in enumerate(arrays):
+            try:
+                results.append(getattr(self, method)(array))
+            except Retry:
+                results.append(array)
+                accepted[index] = False
+        return np.array(results), accepted
+
     def apply_symmetry(self, array):
         """
         Applies the required symmetries to the array.
@@ -140,6 +253,16 @@ class ArraySamplingSet(VariableSamplingSet):
         """
         return array
 
+    def apply_symmetry_stack(self, arrays):
+        """
+        Applies the required symmetries to a stack of arrays, returning the results
+        and a boolean array stating which were accepted.
+
+        Subclasses that shadow apply_symmetry should also shadow this method, or else
+        apply_symmetry is applied to each array in turn.
+        """
+        return arrays, np.ones(len(arrays), dtype=bool)
+
     def normalize(self, array):
         """
         Normalizes the array to fall into the desired norm.
@@ -150,6 +273,19 @@ class ArraySamplingSet(VariableSamplingSet):
         desired_norm = self.norm.gen_sample()
         return array * desired_norm / actual_norm
 
+    def normalize_stack(self, arrays):
+        """
+        Normalizes a stack of arrays, returning the results and a boolean array
+        stating which were accepted.
+
+        Subclasses that shadow normalize should also shadow this method, or else
+        normalize is applied to each array in turn.
+        """
+        actual_norms = np.linalg.norm(arrays.reshape(len(arrays), -1), axis=1)
+        desired_norms = np.array(self.norm.gen_samples(len(arrays)))
+        scale = (desired_norms / actual_norms).reshape((-1,) + (1,) * (arrays.ndim - 1))
+        return arrays * scale, np.ones(len(arrays), dtype=bool)
+
 
 class VectorSamplingSet(ArraySamplingSet):
     """
@@ -332,6 +468,11 @@ class GeneralMatrices(MatrixSamplingSet):
             return np.tril(array)
         return array
 
+    def apply_symmetry_stack(self, arrays):
+        """Impose the triangular requirement on a stack of arrays"""
+        # np.triu and np.tril act on the last two axes
+        return self.apply_symmetry(arrays), np.ones(len(arrays), dtype=bool)
+
 
 class RealMatrices(GeneralMatrices):
     """
@@ -478,6 +619,13 @@ class IdentityMatrixMultiples(SquareMatrixSamplingSet):
         # Return the result
         return array
 
+    def generate_samples(self, n):
+        """
+        Generates n identity matrices of specified dimension multiplied by random scalars
+        """
+        identity = np.eye(self.config['dimension'])
+        return [scaling * identity for scaling in self.config['sampler'].gen_samples(n)]
+
 
 class SquareMatrices(SquareMatrixSamplingSet):
     """
@@ -663,6 +811,34 @@ class SquareMatrices(SquareMatrixSamplingSet):
 
         return working
 
+    def apply_symmetry_stack(self, arrays):
+        """
+        Applies the required symmetries to a stack of arrays
+        """
+        dim = self.config['dimension']
+        transpose = np.swapaxes(arrays, -1, -2)
+
+        # Apply the symmetry property
+        if self.config['symmetry'] == 'diagonal':
+            working = arrays * np.eye(dim)
+        elif self.config['symmetry'] == 'symmetric':
+            working = arrays + transpose
+        elif self.config['symmetry'] == 'antisymmetric':
+            working = arrays - transpose
+        elif self.config['symmetry'] == 'hermitian':
+            working = arrays + np.conj(transpose)
+        elif self.config['symmetry'] == 'antihermitian':
+            working = arrays - np.conj(transpose)
+        else:
+            working = arrays
+
+        # Apply the traceless property
+        if self.config['traceless']:
+            traces = np.trace(working, axis1=-2, axis2=-1)
+            working = working - (traces / dim)[:, np.newaxis, np.newaxis] * np.eye(dim)
+
+        return working, np.ones(len(arrays), dtype=bool)
+
     def normalize(self, array):
         """
         Set either the norm or determinant of the matrix to the desired value.
@@ -674,6 +850,19 @@ class SquareMatrices(SquareMatrixSamplingSet):
             array = self.make_det_zero(array)
         return super(SquareMatrices, self).normalize(array)
 
+    def normalize_stack(self, arrays):
+        """
+        Set either the norm or determinant of a stack of matrices to the desired value.
+        """
+        if self.config['determinant'] == 1:
+            # No need to normalize
+            return self.make_det_one_stack(arrays)
+        accepted = np.ones(len(arrays), dtype=bool)
+        if self.config['determinant'] == 0:
+            arrays, accepted = self.make_det_zero_stack(arrays)
+        arrays, _ = super(SquareMatrices, self).normalize_stack(arrays)
+        return arrays, accepted
+
     def make_det_one(self, array):
         """
         Scale an array to have unit determinant, or raise Retry if not possible.
@@ -758,13 +947,86 @@ class SquareMatrices(SquareMatrixSamplingSet):
         # Subtract the eigenvalue from the array
         return array - np.eye(self.config['dimension']) * eigenvalue
 
+    def make_det_one_stack(self, arrays):
+        """
+        Scale a stack of arrays to have unit determinant, as for make_det_one.
+        Returns the results and a boolean array stating which were accepted.
+        """
+        dim = self.config['dimension']
+        dets = np.linalg.det(arrays)
+
+        # Is the determinant guaranteed to be real?
+        if (not self.config['complex']
+                or self.config['symmetry'] in ['hermitian', 'antihermitian']):
+            dets = np.real(dets)  # Get rid of numerical error
+            # Positive determinants can be scaled, as can negative determinants
+            # in odd dimensions
+            if dim % 2 == 1:
+                accepted = dets != 0
+            else:
+                accepted = dets > 0
+            signs = np.where(dets < 0, -1.0, 1.0)
+            scales = np.ones(len(arrays))
+            scales[accepted] = signs[accepted] / np.power(np.abs(dets[accepted]), 1/dim)
+        else:
+            # Complex matrices are easy: we can just rescale the matrix, as long
+            # as the determinant isn't 0
+            accepted = np.abs(dets) >= 5e-13
+            scales = np.ones(len(arrays), dtype=complex)
+            scales[accepted] = 1 / np.power(dets[accepted] + 0.0j, 1/dim)
+
+        return arrays * scales[:, np.newaxis, np.newaxis], accepted
+
+    def make_det_zero_stack(self, arrays):
+        """
+        Modify a stack of arrays to have zero determinant, as for make_det_zero.
+        Returns the results and a boolean array stating which were accepted.
+        """
+        count, dim = len(arrays), self.config['dimension']
+        accepted = np.ones(count, dtype=bool)
+        # Arrays with determinants close enough to zero are left alone
+        modify = np.abs(np.linalg.det(arrays)) >= 5e-13
+        rows = np.arange(count)
+
+        # Pick random numbers!
+        indices = np.random.randint(dim, size=count)
+
+        # What's our symmetry?
+        if self.config['symmetry'] == 'diagonal':
+            # Choose a random diagonal entry to be zero
+            arrays = arrays.copy()
+            arrays[rows[modify], indices[modify], indices[modify]] = 0
+            return arrays, accepted
+        elif ((self.config['symmetry'] == 'symmetric' and not self.config['complex'])
+              or self.config['symmetry'] == 'hermitian'):
+            # Eigenvalues are all real - use special algorithm to compute eigenvalues
+            eigenvalues = np.real(np.linalg.eigvalsh(arrays)[rows, indices])
+        elif self.config['symmetry'] == 'antihermitian':
+            # Eigenvalues are all imaginary - use the special algorithm on 1j * array,
+            # which is hermitian
+            eigenvalues = -1j * np.real(np.linalg.eigvalsh(1j * arrays)[rows, indices])
+        else:
+            # No relevant symmetry. Use a general algorithm to compute eigenvalues.
+            all_eigenvalues = np.linalg.eigvals(arrays)
+            if not self.config['complex']:
+                # We need to select a real eigenvalue, at random
+                real = np.abs(np.imag(all_eigenvalues)) < 5e-13
+                accepted = real.any(axis=1)
+                indices = np.argmax(np.where(real, np.random.random_sample(real.shape), -1),
+                                    axis=1)
+                eigenvalues = np.real(all_eigenvalues[rows, indices])
+            else:
+                eigenvalues = all_eigenvalues[rows, indices]
+
+        # Subtract the eigenvalues from the arrays
+        eigenvalues = np.where(modify & accepted, eigenvalues, 0)
+        return arrays - eigenvalues[:, np.newaxis, np.newaxis] * np.eye(dim), accepted
+
 
 class OrthogonalMatrices(SquareMatrixSamplingSet):
     """
-    Sampling set for orthogonal matrices.
-
-    Note: This will only work with scipy 0.18 and numpy 1.7.1, which requires the python3
-    implementation of edX.
+    Sampling set for orthogonal matrices, distributed uniformly (according to the
+    Haar measure).
 
     Config:
     =======
@@ -816,28 +1078,25 @@ class OrthogonalMatrices(SquareMatrixSamplingSet):
         """
         Generates an orthogonal matrix
         """
-        # lazy load this module for performance reasons
-        try:
-            from scipy.stats import ortho_group, special_ortho_group
-        except ImportError:
-            ortho_group = Unavailable()
-            special_ortho_group = Unavailable()
+        return self.generate_samples(1)[0]
 
-        # Generate the array
+    def generate_samples(self, n):
+        """
+        Generates n orthogonal matrices
+        """
+        arrays = haar_matrices(n, self.config['dimension'])
         if self.config['unitdet']:
-            array = special_ortho_group.rvs(self.config['dimension'])
-        else:
-            array = ortho_group.rvs(self.config['dimension'])
-        # Return the result
-        return array
+            # Flip the sign of the first column of matrices with determinant -1.
+            # This maps the Haar measure on O(n) to the Haar measure on SO(n).
+            dets = np.sign(np.linalg.det(arrays))
+            arrays[:, :, 0] *= dets[:, np.newaxis]
+        return list(arrays)
 
 
 class UnitaryMatrices(SquareMatrixSamplingSet):
     """
-    Sampling set for unitary matrices.
-
-    Note: This will only work with scipy 0.18 and numpy 1.7.1, which requires the python3
-    implementation of edX.
+    Sampling set for unitary matrices, distributed uniformly (according to the
+    Haar measure).
 
     Config:
     =======
@@ -890,19 +1149,18 @@ class UnitaryMatrices(SquareMatrixSamplingSet):
 
     def generate_sample(self):
         """
-        Generates an orthogonal matrix as appropriate
+        Generates a unitary matrix
         """
-        # lazy load this module for performance reasons
-        try:
-            from scipy.stats import unitary_group
-        except ImportError:
-            unitary_group = Unavailable()
+        return self.generate_samples(1)[0]
 
-        # Generate the array
-        array = unitary_group.rvs(self.config['dimension'])
-        # Fix the determinant if need be
+    def generate_samples(self, n):
+        """
+        Generates n unitary matrices
+        """
+        arrays = haar_matrices(n, self.config['dimension'], unitary=True)
+        # Fix the determinant if need be. This maps the Haar measure on U(n) to the
+        # Haar measure on SU(n).
         if self.config['unitdet']:
-            det = np.linalg.det(array)
-            array /= det**(1/self.config['dimension'])
-        # Return the result
-        return array
+            dets = np.linalg.det(arrays)
+            arrays /= (dets**(1/self.config['dimension']))[:, np.newaxis, np.newaxis]
+        return list(arrays)
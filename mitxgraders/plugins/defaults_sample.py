@@ -10,13 +10,17 @@ This plug-in works by registering a dictionary with the appropriate grading clas
 not class instance).
 """
 
-# Here are all of the graders that you can specify defaults for
+# You can specify defaults for any grader. Plugins are loaded every time the library
+# is imported, and the list and math graders import NumPy, which slows down problems
+# that only use StringGrader. So the examples below that use these graders import them
+# alongside their modifications, and only take this time when you uncomment them.
+# The graders are imported as follows:
+#     from mitxgraders.listgrader import ListGrader, SingleListGrader
+#     from mitxgraders.formulagrader.integralgrader import IntegralGrader
+#     from mitxgraders.formulagrader.formulagrader import FormulaGrader, NumericalGrader
+#     from mitxgraders.formulagrader.matrixgrader import MatrixGrader
 from mitxgraders.stringgrader import StringGrader
 from mitxgraders.baseclasses import AbstractGrader, ItemGrader
-from mitxgraders.listgrader import ListGrader, SingleListGrader
-from mitxgraders.formulagrader.integralgrader import IntegralGrader
-from mitxgraders.formulagrader.formulagrader import FormulaGrader, NumericalGrader
-from mitxgraders.formulagrader.matrixgrader import MatrixGrader
 
 # These will be needed to set attempt-based credit course-wide
 from mitxgraders.attemptcredit import LinearCredit, GeometricCredit, ReciprocalCredit
@@ -50,12 +54,14 @@ from mitxgraders.attemptcredit import LinearCredit, GeometricCredit, ReciprocalC
 # each other, overwriting earlier options as necessary.
 
 # In this example, we make all MatrixGrader problems award partial credit by default.
+# from mitxgraders.formulagrader.matrixgrader import MatrixGrader
 # MatrixGrader.register_defaults({
 #     'entry_partial_credit': 'partial'
 # })
 
 # You can also use this plug-in to make pre-built graders and functions available to
 # all your problems. You just need to include them in the __all__ list. For example:
+# from mitxgraders.formulagrader.formulagrader import FormulaGrader
 # my_grader = FormulaGrader(variables=['x', 'y'])
 # __all__ = ['my_grader']
 # Now, "from mitxgraders import *"" will make my_grader available to you in a problem
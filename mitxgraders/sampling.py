@@ -19,21 +19,26 @@ Contains some helper functions used in grading formulae:
 * construct_constants
 * construct_suffixes
 
-All of these classes perform random sampling. To obtain a sample, use class.gen_sample()
+All of these classes perform random sampling. To obtain a sample, use class.gen_sample(),
+or to obtain a list of n samples, use class.gen_samples(n)
 """
 
 from numbers import Number
 import abc
 import random
+from contextlib import contextmanager
 import numpy as np
 from voluptuous import Schema, Required, All, Coerce, Any, Extra
 from mitxgraders.baseclasses import ObjectWithSchema
+from mitxgraders.helpers.cache import LRUCache
+from mitxgraders.helpers.quasirandom import low_discrepancy_points
 from mitxgraders.exceptions import ConfigError
 from mitxgraders.helpers.validatorfuncs import (
     Positive, NumberRange, ListOfType, TupleOfType, is_callable,
     has_keys_of_type, Nullable)
 from mitxgraders.helpers.calc import (
     METRIC_SUFFIXES, CalcError, evaluator, parse, MathArray)
+from mitxgraders.helpers.calc.expressions import evaluator_batch
 
 # Set the objects to be imported from this grader
 __all__ = [
@@ -51,6 +56,29 @@ def set_seed(seed=None):
     random.seed(seed)
     np.random.seed(seed)
 
+@contextmanager
+def seeded_sampling(seed):
+    """
+    Context manager that seeds the random number generators used for sampling,
+    and restores their previous states on exit.
+
+    >>> state = random.getstate()
+    >>> with seeded_sampling(1):
+    ...     first = RealInterval().gen_sample()
+    >>> with seeded_sampling(1):
+    ...     second = RealInterval().gen_sample()
+    >>> first == second and random.getstate() == state
+    True
+    """
+    random_state = random.getstate()
+    numpy_state = np.random.get_state()
+    set_seed(seed)
+    try:
+        yield
+    finally:
+        random.setstate(random_state)
+        np.random.set_state(numpy_state)
+
 class AbstractSamplingSet(ObjectWithSchema):  # pylint: disable=abstract-method
     """
     Represents a set from which random samples are taken.
@@ -58,10 +86,35 @@ class AbstractSamplingSet(ObjectWithSchema):  # pylint: disable=abstract-method
     Note that this is an abstract class.
     """
 
+    # The number of coordinates of the unit hypercube that samples can be
+    # generated from (see samples_from_unit_cube); 0 if this is not possible
+    unit_dims = 0
+
+    # Subclasses that override gen_samples to draw all of the samples at once
+    # draw fewer samples than this one at a time, as numpy's overhead for each
+    # call outweighs the saving
+    min_batch_samples = 8
+
     @abc.abstractmethod
     def gen_sample(self):
         """Generate a sample from this sampling set"""
 
+    def gen_samples(self, n):
+        """
+        Generate a list of n samples from this sampling set.
+
+        Subclasses that can draw all of the samples at once should override this.
+        """
+        return [self.gen_sample() for _ in range(n)]
+
+    def samples_from_unit_cube(self, points):
+        """
+        Generate a list of samples from an array of points in the unit hypercube,
+        of shape (n, unit_dims). Points distributed uniformly in the hypercube
+        produce samples distributed as for gen_sample.
+        """
+        raise NotImplementedError
+
 
 class VariableSamplingSet(AbstractSamplingSet):  # pylint: disable=abstract-method
     """
@@ -120,6 +173,31 @@ class RealInterval(ScalarSamplingSet):
         start, stop = self.config['start'], self.config['stop']
         return start + (stop - start) * np.random.random_sample()
 
+    def gen_samples(self, n):
+        """
+        Returns a list of n random real numbers in the range [start, stop]
+
+        >>> samples = RealInterval([2, 3]).gen_samples(4)
+        >>> len(samples), all(2 <= sample <= 3 for sample in samples)
+        (4, True)
+        """
+        if n < self.min_batch_samples:
+            return super(RealInterval, self).gen_samples(n)
+        start, stop = self.config['start'], self.config['stop']
+        return list(start + (stop - start) * np.random.random_sample(n))
+
+    unit_dims = 1
+
+    def samples_from_unit_cube(self, points):
+        """
+        Returns a list of real numbers in the range [start, stop]
+
+        >>> RealInterval([2, 4]).samples_from_unit_cube(np.array([[0.25], [0.5]]))
+        [2.5, 3.0]
+        """
+        start, stop = self.config['start'], self.config['stop']
+        return list(start + (stop - start) * points[:, 0])
+
 
 class IntegerRange(ScalarSamplingSet):
     """
@@ -141,6 +219,9 @@ class IntegerRange(ScalarSamplingSet):
     """
     schema_config = NumberRange(int)
 
+    # Drawing single integers is relatively slow
+    min_batch_samples = 3
+
     def __init__(self, config=None, **kwargs):
         """
         Validate the specified configuration.
@@ -155,6 +236,32 @@ class IntegerRange(ScalarSamplingSet):
         """Returns a random integer in range(start, stop)"""
         return np.random.randint(low=self.config['start'], high=self.config['stop'] + 1)
 
+    def gen_samples(self, n):
+        """
+        Returns a list of n random integers in range(start, stop)
+
+        >>> samples = IntegerRange([2, 3]).gen_samples(4)
+        >>> len(samples), set(samples) <= {2, 3}, type(samples[0])
+        (4, True, <class 'int'>)
+        """
+        if n < self.min_batch_samples:
+            return super(IntegerRange, self).gen_samples(n)
+        return np.random.randint(low=self.config['start'], high=self.config['stop'] + 1,
+                                 size=n).tolist()
+
+    unit_dims = 1
+
+    def samples_from_unit_cube(self, points):
+        """
+        Returns a list of integers in range(start, stop)
+
+        >>> IntegerRange([2, 3]).samples_from_unit_cube(np.array([[0.25], [0.5], [0.99]]))
+        [2, 3, 3]
+        """
+        start, stop = self.config['start'], self.config['stop']
+        samples = np.floor(start + (stop - start + 1) * points[:, 0]).astype(int)
+        return np.minimum(samples, stop).tolist()
+
 
 class ComplexRectangle(ScalarSamplingSet):
     """
@@ -186,6 +293,22 @@ class ComplexRectangle(ScalarSamplingSet):
         """Generates a random sample in the defined rectangle in the complex plane"""
         return self.re.gen_sample() + self.im.gen_sample()*1j
 
+    def gen_samples(self, n):
+        """Generates a list of n random samples in the defined rectangle"""
+        re = self.re.gen_samples(n)
+        im = self.im.gen_samples(n)
+        if n < self.min_batch_samples:
+            return [x + y*1j for x, y in zip(re, im)]
+        return (np.array(re) + np.array(im)*1j).tolist()
+
+    unit_dims = 2
+
+    def samples_from_unit_cube(self, points):
+        """Generates a list of samples in the defined rectangle from points in the unit square"""
+        re = np.array(self.re.samples_from_unit_cube(points[:, :1]))
+        im = np.array(self.im.samples_from_unit_cube(points[:, 1:]))
+        return (re + im*1j).tolist()
+
 
 class ComplexSector(ScalarSamplingSet):
     """
@@ -219,6 +342,22 @@ class ComplexSector(ScalarSamplingSet):
         """Generates a random sample in the defined annular sector in the complex plane"""
         return self.modulus.gen_sample() * np.exp(1j * self.argument.gen_sample())
 
+    def gen_samples(self, n):
+        """Generates a list of n random samples in the defined annular sector"""
+        modulus = self.modulus.gen_samples(n)
+        argument = self.argument.gen_samples(n)
+        if n < self.min_batch_samples:
+            return [r * np.exp(1j * theta) for r, theta in zip(modulus, argument)]
+        return list(np.array(modulus) * np.exp(1j * np.array(argument)))
+
+    unit_dims = 2
+
+    def samples_from_unit_cube(self, points):
+        """Generates a list of samples in the defined sector from points in the unit square"""
+        modulus = np.array(self.modulus.samples_from_unit_cube(points[:, :1]))
+        argument = np.array(self.argument.samples_from_unit_cube(points[:, 1:]))
+        return list(modulus * np.exp(1j * argument))
+
 
 class DiscreteSet(VariableSamplingSet):  # pylint: disable=too-few-public-methods
     """
@@ -316,6 +455,15 @@ class RandomFunction(FunctionSamplingSet):  # pylint: disable=too-few-public-met
         i ranges from 1 to output_dim
         j ranges from 1 to num_terms
         k ranges from 1 to input_dim
+
+        The function also accepts numpy arrays of points: the arguments are
+        broadcast against each other, and the result holds the function value
+        at each point, with an extra trailing axis of length output_dim for
+        vector-valued functions.
+
+        >>> func = RandomFunction(input_dim=2, output_dim=3).gen_sample()
+        >>> func(np.zeros(5), np.linspace(0, 1, 5)).shape
+        (5, 3)
         """
         # Generate arrays of random values for A, B and C
         output_dim = self.config['output_dim']
@@ -332,6 +480,19 @@ class RandomFunction(FunctionSamplingSet):  # pylint: disable=too-few-public-met
         # Phases C range from 0 to 2*pi
         C = 2 * np.pi * np.random.rand(output_dim, num_terms, input_dim)
 
+        # Lay out all i, j, k terms along a single contiguous axis, recording
+        # which argument each term acts on. The scaled amplitudes become a
+        # block-diagonal matrix that sums the terms for each output.
+        terms = num_terms * input_dim
+        arg_index = np.tile(np.arange(input_dim), output_dim * num_terms)
+        B = B.ravel()
+        C = C.ravel()
+        scale = self.config["amplitude"] / num_terms
+        amplitudes = np.zeros((output_dim, output_dim * terms), dtype=A.dtype)
+        for i in range(output_dim):
+            amplitudes[i, i*terms:(i+1)*terms] = scale * A[i].ravel()
+        center = self.config["center"]
+
         def random_function(*args):
             """Function that generates the random values"""
             # Check that the dimensions are correct
@@ -339,26 +500,25 @@ class RandomFunction(FunctionSamplingSet):  # pylint: disable=too-few-public-met
                 msg = "Expected {} arguments, but received {}".format(input_dim, len(args))
                 raise ConfigError(msg)
 
-            # Turn the inputs into an array
-            xvec = np.array(args)
-            # Repeat it into the shape of A, B and C
-            xarray = np.tile(xvec, (output_dim, num_terms, 1))
-            # Compute the output matrix
-            output = A * np.sin(B * xarray + C)
-            # Sum over the j and k terms
-            # We have an old version of numpy going here, so we can't use
-            # fullsum = np.sum(output, axis=(1, 2))
-            fullsum = np.sum(np.sum(output, axis=2), axis=1)
-
-            # Scale and translate to fit within center and amplitude
-            fullsum = fullsum * self.config["amplitude"] / self.config["num_terms"]
-            fullsum += self.config["center"]
+            if any(isinstance(arg, np.ndarray) for arg in args):
+                # Points run along the leading axes, and terms along the last
+                xarray = np.stack(np.broadcast_arrays(*args), axis=-1)[..., arg_index]
+                fullsum = np.sin(B * xarray + C).dot(amplitudes.T) + center
+                return fullsum if output_dim > 1 else fullsum[..., 0]
+
+            # Compute every term, then sum over the j and k terms, scaling and
+            # translating to fit within center and amplitude
+            xvec = args[0] if input_dim == 1 else np.array(args)[arg_index]
+            fullsum = amplitudes.dot(np.sin(B * xvec + C)) + center
 
             # Return the result
             return MathArray(fullsum) if output_dim > 1 else fullsum[0]
 
         # Tag the function with the number of required arguments
         random_function.nin = input_dim
+        if output_dim == 1:
+            # Acts elementwise on arrays of samples (see MathExpression.eval_batch)
+            random_function.vectorized = random_function
 
         return random_function
 
@@ -438,17 +598,81 @@ class DependentSampler(VariableSamplingSet):
 
         return result
 
-def is_subset(iterable, iterable_superset):
+    def compute_samples(self, var_columns, functions, suffixes, samples):
+        """
+        Compute a list of samples of this variable, given columns of the values
+        of the variables it depends on (as for evaluator_batch)
+        """
+        try:
+            results, _ = evaluator_batch(formula=self.config['formula'],
+                                         var_columns=var_columns,
+                                         samples=samples,
+                                         functions=functions,
+                                         suffixes=suffixes)
+        except CalcError:
+            raise ConfigError("Formula error in dependent sampling formula: " +
+                              self.config["formula"])
+
+        return results
+
+# Evaluation orders of DependentSamplers, keyed on the dependencies involved
+DEPENDENT_ORDERS = LRUCache(maxsize=100)
+
+def order_dependents(dependents, available):
     """
     Helper function for gen_symbols_samples below.
-    Checks to see if every item in iterable is in iterable_superset.
-    """
-    for item in iterable:
-        if item not in iterable_superset:
-            return False
-    return True
+    Returns a list of the symbols in dependents (a dictionary mapping symbol names
+    to the names they depend on) in an order in which they can be computed, given
+    the names in available. Raises ConfigError if this is not possible.
+
+    Orders are cached, as they depend only on names, which rarely change.
+
+    >>> order_dependents({'c': ['b'], 'b': ['a']}, {'a'})
+    ['b', 'c']
+    """
+    key = (tuple(sorted(available)),
+           tuple(sorted((symbol, tuple(sorted(depends)))
+                        for symbol, depends in dependents.items())))
+    order = DEPENDENT_ORDERS.get(key)
+    if order is not None:
+        return order
+
+    known = set(available)
+    unevaluated_dependents = dict(dependents)
+    order = []
+    while unevaluated_dependents:
+        progress_made = False
+        for symbol, dependencies in list(unevaluated_dependents.items()):
+            if known.issuperset(dependencies):
+                order.append(symbol)
+                known.add(symbol)
+                del unevaluated_dependents[symbol]
+                progress_made = True
+
+        if not progress_made:
+            # Two possible causes
+            # 1: Depends on variables that are undefined
+            # Check for this first
+            all_depends = set()
+            for dependencies in unevaluated_dependents.values():
+                all_depends.update(dependencies)
+            bad_items = [item for item in all_depends
+                         if item not in unevaluated_dependents and item not in known]
+            if bad_items:
+                bad_symbols = ", ".join(sorted(bad_items))
+                raise ConfigError("DependentSamplers depend on undefined quantities: " +
+                                  bad_symbols)
+
+            # 2: Circular dependencies
+            bad_symbols = ", ".join(sorted(unevaluated_dependents.keys()))
+            raise ConfigError("Circularly dependent DependentSamplers detected: " +
+                              bad_symbols)
 
-def gen_symbols_samples(symbols, samples, sample_from, functions, suffixes, constants):
+    DEPENDENT_ORDERS[key] = order
+    return order
+
+def gen_symbols_samples(symbols, samples, sample_from, functions, suffixes, constants,
+                        strategy='random'):
     """
     Generates a list of dictionaries mapping symbol names to values.
 
@@ -458,6 +682,10 @@ def gen_symbols_samples(symbols, samples, sample_from, functions, suffixes, cons
         sample_from: a dictionary mapping symbol names to sampling sets
         functions (dict): function-scope for evaluating dependent variables
         suffixes (dict): suffix-scope for evaluating dependent variables
+        constants (dict): constants available to dependent variables
+        strategy (str): 'random' to sample each symbol independently, or 'sobol'
+            or 'halton' to spread the samples evenly across the joint domain of
+            the symbols whose sampling sets allow it (see samples_from_unit_cube)
 
     The symbols argument will usually be config['variables']
     or config['functions'].
@@ -487,51 +715,43 @@ def gen_symbols_samples(symbols, samples, sample_from, functions, suffixes, cons
 
     pruned_constants = {sym: constants[sym] for sym in constants if sym not in symbols}
 
-    # Generate the samples
-    sample_list = []
-    for _ in range(samples):
-        # Generate independent samples
-        sample_dict = pruned_constants.copy()
-        sample_dict.update({
-            symbol: sample_from[symbol].gen_sample() for symbol in independent
-        })
-
-        # Generate dependent samples, following chains as necessary
-        unevaluated_dependents = {
-            symbol: sample_from[symbol].config['depends'] for symbol in symbols
-            if isinstance(sample_from[symbol], DependentSampler)
+    # Work out the order in which to compute dependent symbols
+    dependents = {
+        symbol: sample_from[symbol].config['depends'] for symbol in symbols
+        if isinstance(sample_from[symbol], DependentSampler)
+    }
+    order = (order_dependents(dependents, set(pruned_constants).union(independent))
+             if dependents else [])
+
+    # Generate all samples of each independent symbol at once
+    columns = {}
+    if strategy != 'random':
+        spread = [symbol for symbol in independent if sample_from[symbol].unit_dims]
+        points = low_discrepancy_points(strategy, samples,
+                                        sum(sample_from[symbol].unit_dims for symbol in spread))
+        start = 0
+        for symbol in spread:
+            stop = start + sample_from[symbol].unit_dims
+            columns[symbol] = sample_from[symbol].samples_from_unit_cube(points[:, start:stop])
+            start = stop
+    for symbol in independent:
+        if symbol not in columns:
+            columns[symbol] = sample_from[symbol].gen_samples(samples)
+
+    # Compute all samples of each dependent symbol in turn
+    for symbol in order:
+        var_columns = {
+            name: columns[name] if name in columns else [pruned_constants[name]] * samples
+            for name in dependents[symbol]
         }
-        while unevaluated_dependents:
-            progress_made = False
-            for symbol, dependencies in list(unevaluated_dependents.items()):
-                if is_subset(dependencies, sample_dict):
-                    sample_dict[symbol] = sample_from[symbol].compute_sample(
-                        sample_dict, functions, suffixes)
-                    del unevaluated_dependents[symbol]
-                    progress_made = True
-
-            if not progress_made:
-                # Two possible causes
-                # 1: Depends on variables that are undefined
-                # Check for this first
-                all_depends = set()
-                for symbol, dependencies in list(unevaluated_dependents.items()):
-                    for item in dependencies:
-                        all_depends.add(item)
-                bad_items = []
-                for item in all_depends:
-                    if item not in unevaluated_dependents and item not in sample_dict:
-                        bad_items.append(item)
-                if bad_items:
-                    bad_symbols = ", ".join(sorted(bad_items))
-                    raise ConfigError("DependentSamplers depend on undefined quantities: " +
-                                      bad_symbols)
-
-                # 2: Circular dependencies
-                bad_symbols = ", ".join(sorted(unevaluated_dependents.keys()))
-                raise ConfigError("Circularly dependent DependentSamplers detected: " +
-                                  bad_symbols)
+        columns[symbol] = sample_from[symbol].compute_samples(var_columns, functions,
+                                                              suffixes, samples)
 
+    # Assemble the samples
+    sample_list = []
+    for index in range(samples):
+        sample_dict = pruned_constants.copy()
+        sample_dict.update({symbol: column[index] for symbol, column in columns.items()})
         sample_list.append(sample_dict)
     return sample_list
 
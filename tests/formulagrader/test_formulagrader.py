@@ -3,11 +3,15 @@ Tests for FormulaGrader and NumericalGrader
 """
 
 
-from pytest import raises
+from pytest import raises, approx
+import os
 import platform
+import subprocess
+import sys
 from unittest import mock
 import numpy as np
 from voluptuous import Error, MultipleInvalid
+import mitxgraders
 from mitxgraders import (
     FormulaGrader,
     NumericalGrader,
@@ -598,10 +602,10 @@ def test_fg_debug_log():
     " 'j': 1j,<br/>\n"
     " 'pi': 3.141592653589793,<br/>\n"
     " 'x': 3.195254015709299,<br/>\n"
-    " 'y': 3.860757465489678,<br/>\n"
-    " 'z': (2.205526752143288+2.0897663659937935j)}}<br/>\n"
-    "Student Eval: (14.7111745179+2.08976636599j)<br/>\n"
-    "Compare to:  [(14.711174517877566+2.0897663659937935j)]<br/>\n"
+    " 'y': 3.4110535042865755,<br/>\n"
+    " 'z': (1.8473095986778094+1.875174422525385j)}}<br/>\n"
+    "Student Eval: (17.535473747748465+1.875174422525385j)<br/>\n"
+    "Compare to:  [(17.535473747748465+1.875174422525385j)]<br/>\n"
     "<br/>\n"
     "<br/>\n"
     "==========================================<br/>\n"
@@ -612,11 +616,11 @@ def test_fg_debug_log():
     " 'i': 1j,<br/>\n"
     " 'j': 1j,<br/>\n"
     " 'pi': 3.141592653589793,<br/>\n"
-    " 'x': 2.694619197355619,<br/>\n"
-    " 'y': 3.5835764522666245,<br/>\n"
-    " 'z': (1.875174422525385+2.7835460015641598j)}}<br/>\n"
-    "Student Eval: (11.9397106851+2.78354600156j)<br/>\n"
-    "Compare to:  [(11.93971068506166+2.7835460015641598j)]<br/>\n"
+    " 'x': 3.860757465489678,<br/>\n"
+    " 'y': 3.1795327319875875,<br/>\n"
+    " 'z': (2.2917882261333125+2.7835460015641598j)}}<br/>\n"
+    "Student Eval: (20.9999023316383+2.7835460015641598j)<br/>\n"
+    "Compare to:  [(20.9999023316383+2.7835460015641598j)]<br/>\n"
     "<br/>\n"
     "<br/>\n"
     "==========================================<br/>\n"
@@ -688,6 +692,32 @@ def test_fg_evals_numbered_variables_in_siblings():
         # The second call should provide only the first sibling formula
         assert results[1] == {'sibling_1': 'x_{0}+1'}
 
+def test_siblings_share_samples():
+    """Test that ordered subgraders evaluate each sibling's input once per sample"""
+    # Count evaluations of the first input with a function only it uses
+    def f(x):
+        f.calls += 1
+        return x
+    f.calls = 0
+    grader = ListGrader(
+        answers=['x', 'sibling_1 + 1', 'sibling_1 + 2', 'sibling_1*sibling_2'],
+        subgraders=FormulaGrader(variables=['x'], user_functions={'f': f}),
+        ordered=True
+    )
+    result = grader(None, ['f(x)', 'x + 1', 'x + 2', 'x*(x + 1)'])
+    assert all(item['ok'] is True for item in result['input_list'])
+    # 5 samples to grade the first input, and 5 samples as a sibling
+    assert f.calls == 2 * 5
+
+    # Siblings that can't be evaluated from the shared samples raise the usual errors
+    grader = ListGrader(
+        answers=['sibling_2 + 1', 'x'],
+        subgraders=FormulaGrader(variables=['x']),
+        ordered=True
+    )
+    with raises(ConfigError, match='DependentSamplers depend on undefined quantities: y'):
+        grader(None, ['x + 1', 'y'])
+
 def test_siblings_in_dependent_samplers():
     grader = ListGrader(
         answers=['1', 'x'],
@@ -718,6 +748,9 @@ def test_siblings_in_dependent_samplers():
     }
     assert grader(None, submission) == expected_result
 
+    with raises(MissingInput, match='Cannot grade answer, a required input is missing.'):
+        grader(None, ['', '3'])
+
 def test_ng_config():
     """Test that the NumericalGrader config bars unwanted entries"""
     expect = r"not a valid value for dictionary value @ data\[u?'failable_evals'\]. Got 1"
@@ -1045,3 +1078,256 @@ def test_infinity():
     assert 'infty' not in grader.default_variables
     with raises(CalcError, match='Numerical overflow occurred. Does your expression generate very large numbers?'):
         grader(None, 'infty')
+
+def test_vectorized_evaluations():
+    """Test when FormulaGrader evaluates all samples at once"""
+    grader = FormulaGrader(
+        answers='x^2 + a',
+        variables=['x', 'a'],
+        instructor_vars=['a'],
+        user_functions={'f': RandomFunction(), 'g': lambda x: x},
+        samples=30
+    )
+    var_samples, func_samples = grader.gen_var_and_func_samples('x^2 + a')
+    vectorized = grader.eval_vectorized_samples('x^2', var_samples, func_samples)
+    # Array and scalar powers may differ in the last bit
+    assert vectorized == approx([sample['x']**2 for sample in var_samples], rel=1e-15)
+    # Blacklisted variables, random functions and functions without a
+    # vectorized version are all evaluated sample by sample
+    assert grader.eval_vectorized_samples('a', var_samples, func_samples, ['a']) is None
+    assert grader.eval_vectorized_samples('f(x)', var_samples, func_samples) is None
+    assert grader.eval_vectorized_samples('g(x)', var_samples, func_samples) is None
+    assert grader.eval_vectorized_samples('h(x)', var_samples, func_samples) is None
+    assert grader.eval_vectorized_samples('5k', var_samples, func_samples) is None
+    assert grader.eval_vectorized_samples('', var_samples, func_samples) is None
+
+    with raises(UndefinedVariable, match="'a' not permitted in answer as a variable"):
+        grader(None, 'x*x + a')
+    assert grader(None, 'x*x')['ok'] is False
+    with raises(CalcError, match="Division by zero occurred"):
+        grader(None, 'x^2 + 1/(x - x)')
+
+def test_sampling_strategy():
+    """Test that low-discrepancy sampling spreads samples across the domain"""
+    grader = FormulaGrader(answers='abs(x)', variables=['x'], sample_from={'x': [-1, 1]},
+                           samples=2, sampling_strategy='sobol')
+    # Two Sobol points always fall in different halves of the interval
+    for _ in range(20):
+        assert grader(None, 'x')['ok'] is False
+    assert grader(None, 'sqrt(x^2)')['ok'] is True
+
+    grader = FormulaGrader(answers='abs(x)', variables=['x'], sampling_strategy='halton')
+    assert grader(None, 'abs(x)')['ok'] is True
+
+    with raises(Error, match=r"not a valid value for dictionary value @ data\['sampling_strategy'\]"):
+        FormulaGrader(answers='x', variables=['x'], sampling_strategy='grid')
+
+def test_shared_samples():
+    """Test that shared_samples evaluates the student input once per sample"""
+    calls = []
+    def f(x):
+        calls.append(x)
+        return x**2
+
+    config = {
+        'answers': ('f(x)', {'expect': 'f(x) + 1', 'grade_decimal': 0.5}, 'f(x) + 2'),
+        'variables': ['x'],
+        'user_functions': {'f': f},
+        'samples': 4
+    }
+    unshared = FormulaGrader(config)
+    shared = FormulaGrader(dict(config, shared_samples=True))
+    for student_input in ['f(x)', 'f(x) + 1', 'f(x) + 3', 'x^2 + 2']:
+        del calls[:]
+        unshared_result = unshared(None, student_input)
+        del calls[:]
+        assert shared(None, student_input) == unshared_result
+        # Without shared samples, evaluation stops at the first failing sample,
+        # so there are savings only when most answers need every sample
+        assert len(calls) <= 4 * 4
+    # Each comparer parameter and the student input are evaluated once per sample
+    del calls[:]
+    shared(None, 'f(x) + 2')
+    assert len(calls) == 4 * 4
+
+    # Vectorized evaluation, errors and required functions work as usual
+    grader = FormulaGrader(answers=('sin(x)', 'cos(x)'), variables=['x'],
+                           required_functions=['cos'], shared_samples=True)
+    assert grader(None, 'tan(x)')['ok'] is False
+    assert grader(None, 'cos(x)')['ok'] is True
+    with raises(InvalidInput, match="Answer must contain the function cos"):
+        grader(None, 'sin(x)')
+    with raises(CalcError, match="Division by zero occurred"):
+        grader(None, 'x/(x - x)')
+
+    # Siblings
+    grader = ListGrader(
+        answers=['sibling_2 + 1', 'x'],
+        subgraders=FormulaGrader(variables=['x'], shared_samples=True),
+        ordered=True
+    )
+    result = grader(None, ['x + 1', 'x'])
+    assert [item['ok'] for item in result['input_list']] == [True, True]
+
+    # Debug output
+    grader = FormulaGrader(answers=('x', 'x^2'), variables=['x'], shared_samples=True,
+                           debug=True)
+    result = grader(None, 'x^2')
+    assert result['msg'].count('Evaluation Data for Sample Number 5 of 5') == 2
+
+def test_failable_evals_early_exit():
+    """Test that samples stop being evaluated once the outcome is known"""
+    calls = []
+    def f(x):
+        calls.append(x)
+        return x**2
+
+    grader = FormulaGrader(answers='f(x)', variables=['x'], user_functions={'f': f},
+                           samples=10)
+    assert grader(None, 'f(x)')['ok'] is True
+    assert len(calls) == 2 * 10
+    # The first sample fails, so no more are needed
+    del calls[:]
+    assert grader(None, 'f(x) + 1')['ok'] is False
+    assert len(calls) == 2 * 1
+
+    # With failable_evals, comparison continues until too many samples fail
+    grader = FormulaGrader(answers='f(x)', variables=['x'], user_functions={'f': f},
+                           samples=10, failable_evals=2)
+    del calls[:]
+    assert grader(None, 'f(x) + 1')['ok'] is False
+    assert len(calls) == 2 * 3
+    del calls[:]
+    assert grader(None, 'f(x)')['ok'] is True
+    assert len(calls) == 2 * 10
+
+    # Collecting all evaluations at once still works
+    var_samples, func_samples = grader.gen_var_and_func_samples('f(x)')
+    comparer_params_evals, student_evals, functions_used = grader.gen_evaluations(
+        ['f(x)'], 'x^2', [], var_samples, func_samples)
+    assert len(comparer_params_evals) == len(student_evals) == 10
+    assert functions_used == set()
+
+    # Debug output records where comparison stopped
+    grader = FormulaGrader(answers='x', variables=['x'], samples=10, debug=True)
+    result = grader(None, 'x + 1')
+    assert 'Evaluation Data for Sample Number 1 of 10' in result['msg']
+    assert 'Evaluation Data for Sample Number 2 of 10' not in result['msg']
+    assert ('Comparison stopped after sample 1 of 10, as more than 0 comparison(s) failed'
+            in result['msg'])
+
+def test_sample_pool(tmp_path):
+    """Test that sample_pool reuses the author's evaluations between submissions"""
+    from mitxgraders.helpers.math_helpers import (SAMPLE_POOLS, AUTHOR_EVALS,
+                                                  sample_pool_cache_info)
+    # Count calls with an attribute, since the contents of closures are part
+    # of the configuration's fingerprint
+    def f(x):
+        f.calls += 1
+        return x**2
+
+    config = {
+        'answers': ('f(x)', 'f(x) + y'),
+        'variables': ['x', 'y'],
+        'numbered_vars': ['z'],
+        'user_functions': {'f': f},
+        'sample_pool': 3,
+        'sample_pool_dir': str(tmp_path)
+    }
+    SAMPLE_POOLS.clear()
+    AUTHOR_EVALS.clear()
+    f.calls = 0
+    assert FormulaGrader(config)(None, 'x^2 + y')['ok'] is True
+    # Only the drawn set of 5 samples is evaluated, for two comparer parameters
+    assert f.calls == 2 * 5
+
+    # Each set of samples is evaluated once, so that later submissions, even
+    # to new graders, only evaluate the student's input
+    for index in [0, 1, 2, 0, 1, 2]:
+        with mock.patch('random.randrange', return_value=index):
+            assert FormulaGrader(config)(None, 'x^2 + y')['ok'] is True
+    f.calls = 0
+    grader = FormulaGrader(config)
+    assert grader(None, 'f(x)')['ok'] is True
+    assert grader(None, 'f(x) + 2*y')['ok'] is False
+    assert f.calls == 2 * 5
+    info = sample_pool_cache_info()
+    assert info['pools']['size'] == 1
+    assert (info['author_evals']['size'], info['author_evals']['misses']) == (3, 3)
+
+    # The evaluations are loaded from disk when not in memory
+    assert len(list(tmp_path.iterdir())) == 3
+    SAMPLE_POOLS.clear()
+    AUTHOR_EVALS.clear()
+    f.calls = 0
+    assert FormulaGrader(config)(None, 'x^2')['ok'] is True
+    assert f.calls == 0
+
+    # Saved evaluations of different samples (such as another process's) are
+    # recomputed rather than reused
+    AUTHOR_EVALS.clear()
+    for var_samples, _ in SAMPLE_POOLS[next(iter(SAMPLE_POOLS.keys()))]:
+        for sample in var_samples:
+            sample['y'] += 1
+    f.calls = 0
+    with mock.patch('random.randrange', return_value=0):
+        assert FormulaGrader(config)(None, 'x^2 + y')['ok'] is True
+    assert f.calls == 2 * 5
+    SAMPLE_POOLS.clear()
+    AUTHOR_EVALS.clear()
+    f.calls = 0
+    with mock.patch('random.randrange', return_value=1):
+        assert FormulaGrader(config)(None, 'x^2 + y')['ok'] is True
+    assert f.calls == 0
+
+    # Variables not in the pool and siblings fall back to usual sampling
+    f.calls = 0
+    assert FormulaGrader(config)(None, 'x^2 + z_{1} - z_{1}')['ok'] is True
+    assert f.calls == 2 * 5
+    grader = ListGrader(
+        answers=['sibling_2 + 1', 'x'],
+        subgraders=FormulaGrader(variables=['x'], sample_pool=2),
+        ordered=True
+    )
+    result = grader(None, ['x + 1', 'x'])
+    assert [item['ok'] for item in result['input_list']] == [True, True]
+
+    # Files are only unpickled if saved for the same samples by the same version
+    SAMPLE_POOLS.clear()
+    AUTHOR_EVALS.clear()
+    for path in tmp_path.iterdir():
+        header, data = path.read_bytes().split(b'\n', 1)
+        path.write_bytes(header.replace(b'mitxgraders ', b'mitxgraders 0.') + b'\n' + data)
+    f.calls = 0
+    with mock.patch('pickle.load') as load:
+        assert FormulaGrader(config)(None, 'x^2')['ok'] is True
+        assert not load.called
+    assert f.calls == 2 * 5
+
+    # Unreadable or unwritable caches are ignored
+    SAMPLE_POOLS.clear()
+    AUTHOR_EVALS.clear()
+    for path in tmp_path.iterdir():
+        path.write_bytes(b'garbage')
+    assert FormulaGrader(config)(None, 'x^2')['ok'] is True
+    SAMPLE_POOLS.clear()
+    AUTHOR_EVALS.clear()
+    config['sample_pool_dir'] = str(next(tmp_path.iterdir()))
+    assert FormulaGrader(config)(None, 'x^2')['ok'] is True
+
+def test_sample_pool_is_independent_of_hash_seed():
+    """Test that processes with different hash seeds generate the same sample pool"""
+    script = (
+        "from mitxgraders import FormulaGrader\n"
+        "grader = FormulaGrader(answers='a_{1} + 2*a_{2} + 3*a_{3}', numbered_vars=['a'],\n"
+        "                       sample_pool=2)\n"
+        "key, pool = grader.get_sample_pool(['a_{1} + 2*a_{2} + 3*a_{3}'])\n"
+        "print(key, [[sorted(sample.items()) for sample in var_samples]\n"
+        "            for var_samples, _ in pool])\n"
+    )
+    root = os.path.dirname(os.path.dirname(mitxgraders.__file__))
+    outputs = []
+    for seed in ['1', '2']:
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=root)
+        outputs.append(subprocess.check_output([sys.executable, '-c', script], env=env))
+    assert outputs[0] == outputs[1]
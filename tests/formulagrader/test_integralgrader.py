@@ -264,6 +264,56 @@ def test_integration_options_are_passed_correctly():
     # grader1 avoids the singularity and should work
     assert grader1(None, student_input) == expected_result
 
+def test_gauss_legendre_method():
+    def make_grader(answers, **kwargs):
+        return [IntegralGrader(answers=answers, integrator_options={'method': method}, **kwargs)
+                for method in ['quad', 'gauss_legendre']]
+
+    # Results agree with quad
+    for integrand, lower, upper, kwargs in [
+        ('x^2*sin(a*x)', '0', '3', {}),
+        ('exp(-a*x^2)', 'infty', '-infty', {}),
+        ('x*exp(-x)', '0', 'infty', {}),
+        ('1/(1+x^2)', '-infty', 'a', {}),
+        ('exp(i*a*x)/(1 + x^2)', '-1', '2', {'complex_integrand': True}),
+        ('x', 'a', 'a', {}),
+    ]:
+        answers = {'lower': lower, 'upper': upper, 'integrand': integrand,
+                   'integration_variable': 'x'}
+        quad, gauss_legendre = make_grader(answers, **kwargs)
+        varscope = {'a': 1.5, 'infty': float('inf'), 'i': 1j}
+        expected_re, expected_im, _ = quad.evaluate_int(integrand, lower, upper, 'x',
+                                                        varscope.copy(), quad.functions)
+        result_re, result_im, _ = gauss_legendre.evaluate_int(integrand, lower, upper, 'x',
+                                                              varscope.copy(), quad.functions)
+        assert abs(result_re[0] - expected_re[0]) < 1e-8
+        if kwargs:
+            assert abs(result_im[0] - expected_im[0]) < 1e-8
+            # Real and imaginary parts come from the same evaluations
+            assert result_re[2]['neval'] == result_im[2]['neval']
+        else:
+            assert result_im == (None, None, {'neval': None})
+
+    answers = {'lower': '0', 'upper': '1', 'integrand': 'x', 'integration_variable': 'x'}
+    _, grader = make_grader(answers)
+    assert grader(None, ['0', '1', 'x', 'x'])['ok']
+    assert not grader(None, ['0', '1', 'x^2', 'x'])['ok']
+
+    msg = ("There appears to be an error with the integral you entered: The integral did "
+           "not converge using Gauss-Legendre quadrature of order up to 512. The integrand "
+           "may not be smooth enough, or may be singular.")
+    with raises(IntegrationError, match=msg):
+        grader(None, ['0', '1', '1/sqrt(x)', 'x'])
+    # Singularities in the middle of the interval don't cancel out
+    for integrand in ['1/x', '1/x^3']:
+        with raises(IntegrationError, match=msg):
+            grader(None, ['-1', '1', integrand, 'x'])
+    msg = "Integrand has evaluated to complex number but must evaluate to a real."
+    with raises(IntegrationError, match=msg):
+        grader(None, ['0', '1', 'sqrt(x-1)', 'x'])
+    with raises(IntegrationError, match="Integrand must evaluate to a number."):
+        grader(None, ['0', '1', '[x, 1]', 'x'])
+
 def test_complex_integrand_grades_as_expected():
     grader = IntegralGrader(
         complex_integrand=True,
@@ -911,3 +961,28 @@ def test_required_funcs():
     assert grader(None, 'tan(x)')['ok']
     with raises(InvalidInput, match="Answer must contain the function tan"):
         grader(None, 'sin(x)/cos(x)')
+
+def test_sample_pool():
+    """Test that sample_pool reuses the author's integrals between submissions"""
+    from unittest import mock
+    from mitxgraders.helpers.math_helpers import SAMPLE_POOLS, AUTHOR_EVALS
+    config = {
+        'answers': {
+            'lower': '0',
+            'upper': 'a',
+            'integrand': 't^2',
+            'integration_variable': 't'
+        },
+        'input_positions': {'integrand': 1},
+        'variables': ['a'],
+        'samples': 2,
+        'sample_pool': 1
+    }
+    SAMPLE_POOLS.clear()
+    AUTHOR_EVALS.clear()
+    assert IntegralGrader(config)(None, 't^2')['ok'] is True
+    with mock.patch.object(IntegralGrader, 'evaluate_author') as evaluate_author:
+        grader = IntegralGrader(config)
+        assert grader(None, 't^2')['ok'] is True
+        assert grader(None, 't^3')['ok'] is False
+        assert not evaluate_author.called
@@ -2,13 +2,14 @@
 
 import re
 from pytest import raises
-from mitxgraders import (MatrixGrader, RealMatrices, RealVectors, ComplexRectangle)
+from mitxgraders import (MatrixGrader, MatrixEntryComparer, RealMatrices, RealVectors,
+                         ComplexRectangle)
 from mitxgraders.formulagrader.matrixgrader import InputTypeError
 from mitxgraders.helpers.calc.exceptions import (
     DomainError, MathArrayError, ArgumentError,
     MathArrayShapeError as ShapeError, UnableToParse
 )
-from mitxgraders.helpers.calc.math_array import identity, equal_as_arrays
+from mitxgraders.helpers.calc.math_array import identity, equal_as_arrays, MathArray
 
 def test_identity_dim_provides_identity():
     no_identity = MatrixGrader()
@@ -420,3 +421,17 @@ def test_entry_partial_message_with_tensors():
     }
     result = grader(None, '[ [[0, 1], [2, 10]], [[4, 5], [6, 7]] ]')
     assert expected == result
+
+def test_entry_partial_uses_custom_within_tolerance():
+    grader = MatrixGrader(answers='[1, 2, 3]', entry_partial_credit='proportional')
+    utils = grader.get_comparer_utils()
+    comparer = MatrixEntryComparer(entry_partial_credit='proportional', entry_partial_msg='')
+    params = [[MathArray([1, 2, 3])]]
+    student = [MathArray([1.4, 2, 30])]
+    assert comparer(params, student, utils)['grade_decimal'] == 1/3
+
+    # A custom within_tolerance is used for each pair of entries
+    def within_tolerance(x, y):
+        return round(x) == round(y)
+    utils = utils._replace(within_tolerance=within_tolerance)
+    assert comparer(params, student, utils)['grade_decimal'] == 2/3
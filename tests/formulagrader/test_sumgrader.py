@@ -8,7 +8,7 @@ from mitxgraders import CalcError
 from mitxgraders.formulagrader.integralgrader import SumGrader, SummationError
 from mitxgraders.exceptions import InvalidInput, ConfigError, MissingInput
 from mitxgraders.sampling import DependentSampler
-from mitxgraders.helpers.calc import evaluator
+from mitxgraders.helpers.calc import evaluator, DEFAULT_FUNCTIONS, MathArray
 from tests.helpers import round_decimals_in_string
 
 # Configuration Error Test
@@ -531,6 +531,122 @@ def test_convergence():
     expect = np.cos(x)
     assert abs(result - expect) < 1e-14
 
+def test_batched_summation():
+    # Test that evaluating chunks of terms at once agrees with term-by-term evaluation
+    grader = SumGrader(
+        answers={
+            'lower': '0',
+            'upper': '1',
+            'summand': 'x',
+            'summation_variable': 'x'
+        },
+        input_positions={
+            'summand': 1
+        }
+    )
+    variables = {'x': 0.3, 'y': 2.5, 'pi': np.pi}
+    functions = dict(DEFAULT_FUNCTIONS, f=lambda x: 1/(1 + x**2))
+    functions['f'].vectorized = functions['f']
+    for summand, lower, upper in [
+        ('x^n/fact(n)', 0, 40),  # factorials
+        ('1/(n^2 + y)', -float('inf'), float('inf')),  # several chunks
+        ('f(n)*sin(pi*n*x)', -20, 20),  # vectorized user function
+        ('1/(n + 1/2)^2', -10, 10),
+        ('[1, x^n]', 0, 30),  # vectors are summed term by term
+    ]:
+        def eval_summand(n):
+            return evaluator(summand, dict(variables, n=n), functions)[0]
+
+        def eval_terms(values):
+            return [eval_summand(n) for n in values]
+
+        expected = np.array(grader.perform_summation(eval_summand, lower, upper, 0))
+        result = grader.perform_summation(eval_terms, lower, upper, 0, batched=True)
+        assert np.allclose(np.array(result), expected, rtol=1e-14)
+
+        result, _ = grader.evaluate_sum(summand, str(lower), str(upper), 'n',
+                                        dict(variables, inf=float('inf')), functions)
+        assert np.allclose(np.array(result), expected, rtol=1e-14)
+
+    # Chunks that can't be evaluated at once (complex square roots of negative
+    # numbers) are evaluated term by term
+    result, _ = grader.evaluate_sum('sqrt(n)', '-1500', '1500', 'n', {}, DEFAULT_FUNCTIONS)
+    assert np.isclose(result, 2*sum(np.sqrt(n) for n in range(1, 1501))*(1 + 1j)/2, rtol=1e-14)
+
+def test_infty_method():
+    grader = SumGrader(
+        answers={
+            'lower': '1',
+            'upper': 'infty',
+            'summand': '1/n^2',
+            'summation_variable': 'n'
+        }
+    )
+    inf = float('inf')
+
+    # Sums stop once they converge
+    calls = []
+    def summand(n):
+        calls.append(n)
+        return 0.5**abs(n)
+    truncated = grader.perform_summation(summand, lower=0, upper=inf, even_odd=0)
+    assert len(calls) == 1001
+    del calls[:]
+    result = grader.perform_summation(summand, 0, inf, 0, infty_method='converge')
+    assert result == truncated
+    assert len(calls) == 16 + 32 + 64 + 128 + 256
+    del calls[:]
+    result = grader.perform_summation(summand, -inf, 0, 0, infty_method='converge')
+    assert result == truncated and calls[:3] == [0, -1, -2]
+
+    # Series whose leading terms vanish are not mistaken for zero
+    for infty_method in ['converge', 'accelerate']:
+        zero_start = SumGrader(
+            answers={
+                'lower': '1',
+                'upper': 'infty',
+                'summand': 'floor(n/20)/n^3',
+                'summation_variable': 'n'
+            },
+            infty_method=infty_method
+        )
+        assert not zero_start(None, ['1', 'infty', '0', 'n'])['ok']
+        assert zero_start(None, ['1', 'infty', 'floor(n/20)/n^3', 'n'])['ok']
+
+    # Slowly converging series are accelerated
+    def summand(n):
+        return 1/n**2
+    result = grader.perform_summation(summand, 1, inf, 0, infty_method='converge')
+    assert abs(result - np.pi**2/6) > 1e-4
+    result = grader.perform_summation(summand, 1, inf, 0, infty_method='accelerate')
+    assert abs(result - np.pi**2/6) < 1e-8
+    result = grader.perform_summation(summand, -inf, inf, 1, infty_method='accelerate')
+    assert abs(result - np.pi**2/4) < 1e-8
+    result = grader.perform_summation(lambda n: 1/(n**2 + 1), -inf, inf, 0,
+                                      infty_method='accelerate')
+    assert abs(result - np.pi/np.tanh(np.pi)) < 1e-8
+
+    # Vector sums can converge, but are not accelerated
+    result = grader.perform_summation(lambda n: MathArray([1/n**2, 0.5**n]), 1, inf, 0,
+                                      infty_method='accelerate')
+    assert abs(result[1] - 1) < 1e-15 and abs(result[0] - np.pi**2/6) > 1e-4
+
+    # Equivalent series that differ when truncated agree when accelerated
+    student_input = ['1', 'infty', '1/(2*n-1)^2 + 1/(2*n)^2', 'n']
+    assert not grader(None, student_input)['ok']
+    grader = SumGrader(
+        answers=grader.config['answers'],
+        infty_method='accelerate'
+    )
+    assert grader.config['tolerance'] == '1e-4%'
+    assert grader(None, student_input)['ok']
+    assert not grader(None, ['1', 'infty', '1/(2*n-1)^2', 'n'])['ok']
+
+    # Equivalent summands are accepted with the default tolerance
+    for summand in ['n^-2', '(1/n)^2', '1/n/n']:
+        assert grader(None, ['1', 'infty', summand, 'n'])['ok']
+    assert SumGrader(answers=grader.config['answers']).config['tolerance'] == 1e-12
+
 def test_vector_sums():
     grader = SumGrader(
         answers={
@@ -646,3 +762,27 @@ def test_bad_inf_sums():
         grader(None, ['infty', 'infty', 'x', 'x'])
     with raises(SummationError, match="Cannot sum from -infty to -infty."):
         grader(None, ['-infty', '-infty', 'x', 'x'])
+
+def test_sample_pool():
+    """Test that sample_pool reuses the author's sums between submissions"""
+    from unittest import mock
+    from mitxgraders.helpers.math_helpers import SAMPLE_POOLS, AUTHOR_EVALS
+    config = {
+        'answers': {
+            'lower': '1',
+            'upper': '10',
+            'summand': 'a*x',
+            'summation_variable': 'x'
+        },
+        'input_positions': {'summand': 1},
+        'variables': ['a'],
+        'sample_pool': 1
+    }
+    SAMPLE_POOLS.clear()
+    AUTHOR_EVALS.clear()
+    assert SumGrader(config)(None, 'a*x')['ok'] is True
+    with mock.patch.object(SumGrader, 'evaluate_author') as evaluate_author:
+        grader = SumGrader(config)
+        assert grader(None, 'x*a')['ok'] is True
+        assert grader(None, 'a*x^2')['ok'] is False
+        assert not evaluate_author.called
@@ -14,6 +14,10 @@ from mitxgraders.helpers.calc.exceptions import (
     ArgumentError, CalcOverflowError, CalcZeroDivisionError
 )
 from mitxgraders.helpers.calc.math_array import equal_as_arrays, MathArray
+from mitxgraders.helpers.calc.expressions import (
+    parse, MathExpression, finalize_node_value, evaluator_batch
+)
+from mitxgraders.helpers.calc.mathfuncs import DEFAULT_VARIABLES, merge_dicts
 
 def test_expressions_py():
     """Tests of expressions.py that aren't covered elsewhere"""
@@ -281,3 +285,141 @@ def test_large_numbers():
 
 def test_nan():
     assert np.isnan(evaluator("x^2", {'x': float('nan')}, {}, {})[0])
+
+def eval_reference(expression, variables, functions, suffixes, allow_inf=False):
+    """Evaluate a parsed expression using the uncompiled eval_node path"""
+    metadata_dict = {'max_array_dim_used': 0}
+    actions = expression.get_actions(variables, functions, suffixes, metadata_dict)
+    result = MathExpression.eval_node(expression.tree, actions, allow_inf)
+    return result, metadata_dict['max_array_dim_used']
+
+def test_compiled_matches_eval_node():
+    """Test that compiled expressions agree with the reference tree walk"""
+    variables = {
+        'x': 2.5, 'y': -1.5, 'z': 3 + 2j, 'n': 4, 'nan': float('nan'),
+        'inf': float('inf'), 'cinf': complex(float('inf'), 1),
+        'v': MathArray([1, 2, 3]), 'M': MathArray([[1, 2], [3, 4]])
+    }
+    functions = {
+        'sin': np.sin, 'sqrt': np.lib.scimath.sqrt, 'f': lambda a, b: a*b - b,
+        'g': lambda a: a
+    }
+    suffixes = {'%': 0.01, 'k': 1000}
+    corpus = [
+        '2', '5%', '3k*x', 'x', 'x+y-z', '-x^-y^2', '-(-x)', 'x||y||3', 'x*y/z',
+        '2^3^2', 'sin(x)^2 + f(x, y)', '(x + y)*(x - y)', '[1, 2, x]', 'M*[x, y]',
+        '[[1, x], [y, 2]]*M', 'v*v', 'sqrt(-x)', 'nan + 1', 'f(nan, 2)', 'g(nan)',
+        '[nan, 1]', 'x||0', '1e400', 'inf', 'cinf', 'inf - inf', '0*inf', 'n^2',
+    ]
+    for formula in corpus:
+        expression = parse(formula)
+        for allow_inf in (False, True):
+            try:
+                expected = eval_reference(expression, variables, functions, suffixes,
+                                          allow_inf)
+            except Exception as error:  # pylint: disable=broad-except
+                with raises(type(error)):
+                    eval_reference(expression, variables, functions, suffixes, allow_inf)
+                with raises(type(error)):
+                    expression.eval(variables, functions, suffixes, allow_inf=allow_inf)
+                continue
+
+            result, meta = expression.eval(variables, functions, suffixes,
+                                           allow_inf=allow_inf)
+            assert type(result) == type(expected[0])
+            np.testing.assert_array_equal(result, expected[0])
+            assert meta.max_array_dim_used == expected[1]
+
+    # Compiling is done once per expression
+    expression = parse('x^2')
+    assert expression.compiled is expression.compiled
+
+    # Leaves compile to constants
+    assert MathExpression.compile_node('2')(None) == '2'
+
+def test_finalize_node_value():
+    """Test the fast paths of finalize_node_value"""
+    cinf = complex(float('inf'), 1)
+    cnan = complex(float('nan'), 1)
+    assert finalize_node_value(cinf, True) == cinf
+    assert np.isnan(finalize_node_value(cnan, False))
+    assert np.isnan(finalize_node_value(complex(float('inf'), float('nan')), True))
+    assert finalize_node_value(float('inf'), True) == float('inf')
+    with raises(CalcOverflowError):
+        finalize_node_value(MathArray([1, float('inf')]), False)
+    assert np.isnan(finalize_node_value(MathArray([1, float('nan')]), False))
+
+def test_eval_batch_matches_evaluator():
+    """Test that batch evaluation agrees with evaluating each sample separately"""
+    samples = 7
+    var_columns = {
+        'x': list(np.linspace(-2, 3, samples)),
+        'y': list(np.linspace(0.5, 4, samples)),
+        'n': list(range(1, samples + 1)),
+        'z': [complex(k, 1) for k in range(samples)],
+        'v': [MathArray([1, k]) for k in range(samples)]
+    }
+    corpus = [
+        '2', 'x', 'x + y', 'x*y/n - z', 'y^x', 'x^0.5', 'sqrt(y) + sin(x)^2',
+        'sqrt(x)', 'ln(z)', 'x || y', 'x || 0', '1/(x - x)', 'n*5%', '[x, y]',
+        'v*v', 'fact(n)', 'arccot(x)', 'exp(1000*y)', 'floor(x)', 'y^-n'
+    ]
+    for formula in corpus:
+        expected = []
+        for index in range(samples):
+            variables = merge_dicts(DEFAULT_VARIABLES, {
+                name: column[index] for name, column in var_columns.items()
+            })
+            try:
+                expected.append(evaluator(formula, variables)[0])
+            except CalcError as error:
+                expected = error
+                break
+
+        columns = merge_dicts({name: [value]*samples for name, value
+                               in DEFAULT_VARIABLES.items()}, var_columns)
+        if isinstance(expected, CalcError):
+            with raises(type(expected), match=re.escape(str(expected))):
+                evaluator_batch(formula, columns, samples)
+            continue
+        results, _ = evaluator_batch(formula, columns, samples)
+        assert len(results) == samples
+        for result, value in zip(results, expected):
+            assert type(result) == type(value)
+            np.testing.assert_allclose(result, value, rtol=1e-14)
+
+def test_eval_batch_fallbacks():
+    """Test when batch evaluation is vectorized or falls back to per-sample evaluation"""
+    expression = parse('f(x) + x')
+    columns = {'x': [1, 2, 3]}
+    f = lambda x: 2*x
+    # f has no vectorized version
+    assert expression.eval_vectorized(columns, {'f': f}, {}, 3) is None
+    f.vectorized = f
+    assert expression.eval_vectorized(columns, {'f': f}, {}, 3) == [3.0, 6.0, 9.0]
+
+    # Columns must be finite
+    assert expression.eval_vectorized({'x': [1, np.nan, 3]}, {'f': f}, {}, 3) is None
+    results, _ = expression.eval_batch({'x': [1, np.nan, 3]}, {'f': f}, {}, 3)
+    assert results[0] == 3 and np.isnan(results[1]) and results[2] == 9
+
+    # Numpy integers are evaluated per sample, keeping their integer values
+    columns = {'x': [np.int64(2), np.int64(3)], 'y': [np.int64(10**15), np.int64(10**15 + 1)]}
+    for formula in ['x', 'x*y', 'x*y + y']:
+        expression = parse(formula)
+        results, _ = expression.eval_batch(columns, {}, {}, 2)
+        expected = [expression.eval({name: column[index] for name, column in columns.items()},
+                                    {}, {})[0] for index in range(2)]
+        assert results == expected
+        assert [type(result) for result in results] == [type(value) for value in expected]
+    assert parse('x*y').eval_batch(columns, {}, {}, 2)[0] == [2*10**15, 3*10**15 + 3]
+
+    # Constant expressions are broadcast
+    assert parse('2*3').eval_vectorized({}, {}, {}, 2) == [6.0, 6.0]
+
+    # Arrays are evaluated per sample, and report their dimension
+    results, meta = evaluator_batch('[x, 1]', {'x': [1, 2]}, 2)
+    assert meta.max_array_dim_used == 1
+    assert equal_as_arrays(results[1], MathArray([2, 1]))
+    with raises(UnableToParse, match="Vector and matrix expressions have been forbidden"):
+        evaluator_batch('[x, 1]', {'x': [1, 2]}, 2, max_array_dim=0)
@@ -13,6 +13,7 @@ from mitxgraders.helpers.calc.mathfuncs import (
     coth, arccoth,
     csch, arccsch,
     sech, arcsech,
+    within_tolerance, entrywise_within_tolerance,
     ARRAY_ONLY_FUNCTIONS, ARRAY_FUNCTIONS)
 from mitxgraders.helpers.calc.math_array import (
     MathArray, random_math_array, equal_as_arrays)
@@ -134,3 +135,37 @@ def test_kronecker():
     assert kronecker(0, 1) == 0
     assert kronecker(0, 0) == 1
     assert kronecker(1.5, 1.5) == 1
+
+def test_entrywise_within_tolerance_matches_within_tolerance():
+    """Test that entrywise_within_tolerance agrees with within_tolerance on each entry"""
+    np.random.seed(0)
+    inf = float('inf')
+    # Norms in within_tolerance overflow for entries above about 1e154, so
+    # stay below that (see test_entrywise_within_tolerance_huge_entries)
+    special = {float: [inf, -inf, np.nan, 0, 1e150],
+               complex: [inf, -inf, np.nan, 0, 1e150, complex(inf, 1), complex(1, -inf)]}
+    for tolerance in [0, 0.1, 1e-5, '5%', '0.01%', '100%']:
+        for dtype in [float, complex]:
+            x = np.random.normal(size=(10, 4, 4)).astype(dtype)
+            if dtype is complex:
+                x += 1j * np.random.normal(size=(10, 4, 4))
+            y = x + np.random.choice([0, 1e-6, 0.01, 1], size=x.shape) * x
+            # Sprinkle in special values, sometimes matching
+            for array in [x, y]:
+                mask = np.random.random(x.shape) < 0.1
+                array[mask] = np.random.choice(special[dtype], size=mask.sum())
+            # within_tolerance raises an error for complex numbers with an infinite
+            # part, where entrywise_within_tolerance returns False
+            with np.errstate(invalid='ignore'):
+                expected = np.vectorize(lambda a, b: within_tolerance(a, b, tolerance))(x, y)
+            assert np.array_equal(entrywise_within_tolerance(x, y, tolerance), expected)
+
+def test_entrywise_within_tolerance_huge_entries():
+    """Test that entries too large to square are compared without overflowing"""
+    big = 1e200
+    x = np.array([big, big, -big, big*1j, big*(1 + 1j), 1.7e308])
+    y = np.array([big*(1 + 1e-7), 1, -big*1.1, big*1j*(1 - 1e-7), big*(1 + 1j), -1.7e308])
+    assert entrywise_within_tolerance(x, y, '1e-4%').tolist() == [
+        True, False, False, True, True, False]
+    assert entrywise_within_tolerance(x, y, 1e-12).tolist() == [
+        False, False, False, False, True, False]
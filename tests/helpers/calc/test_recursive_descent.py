@@ -0,0 +1,75 @@
+"""
+Differential tests of the recursive descent parser against the pyparsing grammar
+"""
+
+
+import ast
+import html
+import os
+import re
+from glob import glob
+from pytest import raises
+from mitxgraders.helpers.calc.exceptions import CalcError
+from mitxgraders.helpers.calc.expressions import MathParser
+from mitxgraders.helpers.calc.recursive_descent import (
+    RecursiveDescentParser, ParseFailure)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+EDGE_CASES = [
+    '2e', '2exp', '2E+', '1e—3', '1e+3', '1.e3', '.5e-2k', '1e5e5', '1.2.3', '.', '5%%',
+    '2\tk', 'x—y', '—x', '1|\t|2', '1|2', '1||', 'x\t+ 1', 'f\t(x)', '2^—x', '2^-x^-3',
+    "a_{-1}^{2}''", 'x_{1}_a', 'x_1^{2}', 'x^{2}^2', 'T_1_{123}', 'U_{ijk}^{123}',
+    'x_', 'x__a_', "f''(x)'", '+-x', '--x', '+x', '-x^2', '1/-x', '2*—3', '[1, [2, 3]]',
+    '[]', '()', 'f()', 'f(x,)', '[x,]', '(x', 'x)', '2 3', 'x y', '2x', '2 x', 'sin 2',
+    'x^', 'x*', '1 ||| 2', '', ' ', '\t', 'é', 'x²', '٣', 'x_{٣}', 'f(x)(y)', '3(x)',
+]
+
+def collect_strings():
+    """Collect string literals from the tests and course problems"""
+    strings = set(EDGE_CASES)
+    for path in glob(os.path.join(ROOT, 'tests', '**', '*.py'), recursive=True):
+        with open(path, encoding='utf-8') as source:
+            tree = ast.parse(source.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                strings.add(node.value)
+    for path in glob(os.path.join(ROOT, 'course', 'problem', '*.xml')):
+        with open(path, encoding='utf-8') as source:
+            text = html.unescape(source.read())
+        strings.update(re.findall(r"'([^'\n]*)'", text))
+        strings.update(re.findall(r'"([^"\n]*)"', text))
+        strings.update(re.findall(r'<code>(.*?)</code>', text))
+    return sorted(strings)
+
+def parse_or_error(parser, expression):
+    """Parse expression, returning the parse data or the error raised"""
+    try:
+        parsed = parser.parse(expression)
+    except CalcError as error:
+        return type(error), str(error)
+    return (parsed.tree, parsed.variables_used, parsed.functions_used, parsed.suffixes_used)
+
+def test_engines_agree():
+    """Test that both engines agree on every expression in the corpus"""
+    reference = MathParser(engine='pyparsing', cache_size=0, error_cache_size=0)
+    descent = MathParser(engine='descent', cache_size=0, error_cache_size=0)
+    corpus = collect_strings()
+    assert len(corpus) > 1000
+    parsed = 0
+    for expression in corpus:
+        expected = parse_or_error(reference, expression)
+        assert parse_or_error(descent, expression) == expected, expression
+        parsed += not isinstance(expected[0], type)
+    assert parsed > 500
+
+def test_parse_failures():
+    parser = RecursiveDescentParser()
+    with raises(ParseFailure, match="Unexpected end of expression"):
+        parser.parse('1 +')
+    with raises(ParseFailure, match="Unexpected character '\\)' at position 2"):
+        parser.parse('1 )')
+
+def test_unknown_engine():
+    with raises(ValueError, match="Unknown parsing engine 'yacc'"):
+        MathParser(engine='yacc')
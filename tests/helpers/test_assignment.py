@@ -0,0 +1,27 @@
+"""
+Tests of assignment.py
+"""
+
+
+import itertools
+import numpy as np
+from mitxgraders.helpers import munkres
+from mitxgraders.helpers.assignment import optimal_assignment
+
+def test_optimal_assignment_is_optimal():
+    """Test that assignments have the lowest total cost, by brute force"""
+    np.random.seed(0)
+    for size in range(1, 6):
+        costs = np.random.random((size, size))
+        total = sum(costs[i, j] for i, j in optimal_assignment(costs))
+        best = min(sum(costs[i, perm[i]] for i in range(size))
+                   for perm in itertools.permutations(range(size)))
+        assert np.isclose(total, best)
+
+def test_optimal_assignment_matches_munkres():
+    """Test that ties are broken as in bmc/munkres, including for non-square matrices"""
+    np.random.seed(0)
+    for _ in range(500):
+        height, width = np.random.randint(1, 12, size=2)
+        costs = np.random.choice([0, 0.25, 0.5, 1], size=(height, width))
+        assert optimal_assignment(costs) == munkres.Munkres().compute(costs.tolist())
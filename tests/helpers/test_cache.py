@@ -0,0 +1,62 @@
+"""
+Tests of cache.py and the MathParser caches
+"""
+
+
+from pytest import raises
+from mitxgraders.helpers.cache import LRUCache
+from mitxgraders.helpers.calc.expressions import MathParser
+from mitxgraders.helpers.calc.exceptions import UnableToParse, UnbalancedBrackets
+
+def test_lru_cache():
+    cache = LRUCache(maxsize=3, sizeof=lambda key, value: 10)
+    for key in 'abcd':
+        cache[key] = key.upper()
+    assert list(cache.keys()) == ['b', 'c', 'd']
+    assert len(cache) == 3
+    assert cache['b'] == 'B'
+
+    # Lookups refresh entries
+    assert cache.get('b') == 'B'
+    cache['e'] = 'E'
+    assert list(cache.keys()) == ['d', 'b', 'e']
+
+    # Overwriting an entry does not change the memory footprint
+    cache['e'] = 'F'
+    assert cache.info() == {'maxsize': 3, 'size': 3, 'hits': 1, 'misses': 0,
+                            'evictions': 2, 'memory': 30}
+
+    cache.discard('e')
+    cache.discard('z')
+    assert cache.info()['memory'] == 20
+
+    cache.clear()
+    assert cache.info() == {'maxsize': 3, 'size': 0, 'hits': 0, 'misses': 0,
+                            'evictions': 0, 'memory': 0}
+
+    # A cache of size 0 stores nothing
+    cache = LRUCache(maxsize=0)
+    cache['a'] = 1
+    assert 'a' not in cache
+    assert cache.get('a', 5) == 5
+
+def test_parser_caches():
+    parser = MathParser(cache_size=2, error_cache_size=1)
+    for expr in ['x', 'y', 'z', 'y']:
+        parser.parse(expr)
+    info = parser.cache_info()['expressions']
+    assert (info['size'], info['hits'], info['misses'], info['evictions']) == (2, 1, 3, 1)
+    assert info['memory'] > 0
+
+    # Only parse failures are cached as errors
+    for expr in ['1 +', '1 +', '2 +']:
+        with raises(UnableToParse, match="Could not parse '{}'".format(expr.replace('+', r'\+'))):
+            parser.parse(expr)
+    with raises(UnbalancedBrackets):
+        parser.parse('(1')
+    info = parser.cache_info()['errors']
+    assert (info['size'], info['hits'], info['evictions']) == (1, 1, 1)
+    assert '2+' in parser.error_cache
+
+    parser.set_cache_size(error_cache_size=0)
+    assert parser.cache_info()['errors']['size'] == 0
@@ -0,0 +1,34 @@
+"""
+Tests for math_helpers.py
+"""
+
+
+import numpy as np
+from mitxgraders import RealInterval
+from mitxgraders.helpers.math_helpers import fingerprint
+
+def test_fingerprint():
+    """Test that fingerprints identify objects independently of memory addresses"""
+    recursive = [1]
+    recursive.append(recursive)
+    assert fingerprint(recursive) == b'list[1,<recursion>]'
+    assert fingerprint({3, 1, 2}) == fingerprint({1, 2, 3})
+    assert fingerprint(np.array([1, 2])) != fingerprint(np.array([[1, 2]]))
+    assert fingerprint(RealInterval([1, 2])) == fingerprint(RealInterval([1, 2]))
+    assert fingerprint(RealInterval([1, 2])) != fingerprint(RealInterval([1, 3]))
+
+    def make_function(c):
+        return lambda x, y=2: c*x + y
+    assert fingerprint(make_function(1)) == fingerprint(make_function(1))
+    assert fingerprint(make_function(1)) != fingerprint(make_function(2))
+    assert fingerprint(object()) == b'<object object at 0x...>'
+
+def test_fingerprint_includes_referenced_globals():
+    """Test that fingerprints of functions change with the globals they refer to"""
+    namespace = {'SCALE': 2}
+    exec("def f(x):\n    return g(x)\ndef g(x):\n    return np.sin(SCALE*x)", namespace)
+    namespace['np'] = np
+    before = fingerprint(namespace['f'])
+    assert b"module numpy" in before
+    namespace['SCALE'] = 3
+    assert fingerprint(namespace['f']) != before
@@ -0,0 +1,64 @@
+"""
+Tests of quasirandom.py
+"""
+
+
+import numpy as np
+from pytest import raises
+from mitxgraders.helpers.quasirandom import (
+    SOBOL_DIRECTIONS, SOBOL_MAX_DIMS, sobol_points, halton_points, low_discrepancy_points)
+
+def multiplicative_order_of_x(poly, degree):
+    """The order of x in the polynomials over GF(2) modulo poly (given as bits)"""
+    value = 1
+    for order in range(1, 2**degree):
+        value <<= 1
+        if value >> degree:
+            value ^= poly
+        if value == 1:
+            return order
+    return None
+
+def test_sobol_directions():
+    """Test that the Sobol table uses primitive polynomials and valid direction numbers"""
+    polynomials = set()
+    for s, a, m in SOBOL_DIRECTIONS:
+        poly = (1 << s) | (a << 1) | 1
+        assert poly not in polynomials
+        polynomials.add(poly)
+        assert multiplicative_order_of_x(poly, s) == 2**s - 1
+        assert len(m) == s
+        assert all(value % 2 == 1 and value < 2**(k + 1) for k, value in enumerate(m))
+
+def test_sobol_points():
+    """Test that every axis of 2^m Sobol points is evenly filled"""
+    points = sobol_points(256, SOBOL_MAX_DIMS)
+    assert points.shape == (256, SOBOL_MAX_DIMS)
+    assert np.all((points >= 0) & (points < 1))
+    for dim in range(SOBOL_MAX_DIMS):
+        assert sorted(np.floor(256*points[:, dim]).astype(int)) == list(range(256))
+    # The first two axes are evenly filled jointly
+    cells = np.floor(16*points[:, 0]).astype(int)*16 + np.floor(16*points[:, 1]).astype(int)
+    assert sorted(cells) == list(range(256))
+    # Each call shifts the points randomly
+    assert not np.array_equal(sobol_points(4, 2), sobol_points(4, 2))
+
+    assert sobol_points(1, 3).shape == (1, 3)
+    with raises(ValueError, match="Sobol points are available in at most 16 dimensions"):
+        sobol_points(4, SOBOL_MAX_DIMS + 1)
+
+def test_halton_points():
+    """Test that Halton points fill every axis evenly, up to rotation"""
+    points = halton_points(30, 3)
+    assert np.all((points >= 0) & (points < 1))
+    for dim, base in enumerate([2, 3, 5]):
+        # Undo the rotation, which moves the first point from 1/base
+        unrotated = (points[:, dim] - points[0, dim] + 1.0/base) % 1.0
+        counts = np.bincount(np.floor(base*unrotated + 1e-9).astype(int), minlength=base)
+        assert counts.max() - counts.min() <= 1
+
+def test_low_discrepancy_points():
+    points = low_discrepancy_points('sobol', 64, SOBOL_MAX_DIMS + 1)
+    assert points.shape == (64, SOBOL_MAX_DIMS + 1)
+    assert np.all((points >= 0) & (points < 1))
+    assert low_discrepancy_points('halton', 5, 2).shape == (5, 2)
@@ -0,0 +1,50 @@
+"""
+Tests of series.py
+"""
+
+
+import numpy as np
+from mitxgraders.helpers.calc import MathArray
+from mitxgraders.helpers.series import levin_u_estimate, sum_series
+
+def test_levin_u_estimate():
+    """Test Levin estimates of well-known series"""
+    for terms, expected in [
+        ([(-1)**n/(2*n + 1) for n in range(31)], np.pi/4),
+        ([1/n**3 for n in range(1, 31)], 1.2020569031595942),
+        ([n*0.9**n for n in range(31)], 90),  # leading zero
+        ([1j**n/(n + 1) for n in range(31)], np.log(1 - 1j)*1j),
+    ]:
+        assert abs(levin_u_estimate(terms) - expected) < 1e-8*abs(expected)
+
+def test_levin_u_estimate_refuses():
+    """Test that Levin estimates are only made for nonzero numerical terms"""
+    assert levin_u_estimate([MathArray([1, n])/n**2 for n in range(1, 31)]) is None
+    assert levin_u_estimate([0, 0, 1, 0.5]) is None
+    assert levin_u_estimate([np.sin(n*np.pi/2)/n**2 for n in range(1, 31)]) is None
+    assert levin_u_estimate([1/n**2 if n != 5 else float('inf') for n in range(1, 31)]) is None
+    # All estimates are nan
+    assert levin_u_estimate([1, -1, 1, -1]) is None
+
+def test_sum_series():
+    """Test summing series block by block"""
+    calls = []
+    def eval_terms(values):
+        calls.append(values)
+        return [1/n**2 for n in values]
+    assert sum_series(eval_terms, range(1, 101)) == sum(1/n**2 for n in range(1, 101))
+    assert [len(values) for values in calls] == [16, 32, 52]
+    del calls[:]
+    assert abs(sum_series(eval_terms, range(1, 1001), accelerate=True) - np.pi**2/6) < 1e-8
+    assert [len(values) for values in calls] == [16]
+    del calls[:]
+    sum_series(eval_terms, range(1, 10001), max_block=100)
+    assert max(len(values) for values in calls) == 100
+
+def test_sum_series_leading_zeros():
+    """Test that series whose leading terms vanish are not treated as converged"""
+    def eval_terms(values):
+        return [(n // 20)/n**3 for n in values]
+    expected = sum((n // 20)/n**3 for n in range(1, 1001))
+    assert sum_series(eval_terms, range(1, 1001)) == expected
+    assert sum_series(eval_terms, range(1, 1001), accelerate=True) != 0
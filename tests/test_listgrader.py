@@ -4,6 +4,7 @@ Tests for ListGrader
 
 
 import pprint
+import random
 from unittest import mock
 from pytest import raises
 from mitxgraders import (ListGrader, ConfigError, StringGrader, FormulaGrader,
@@ -994,3 +995,77 @@ def test_nested_partial_credit():
         ]
     }
     assert grader(None, student_input) == expected_result
+
+def test_unordered_checks_are_shared():
+    """Test that unordered lists check repeated entries once and share student evaluations"""
+    # Count evaluations of the student's inputs with a function only they use
+    def f(x):
+        f.calls += 1
+        return x
+    f.calls = 0
+    grader = ListGrader(
+        answers=['x + {}'.format(k) for k in range(10)],
+        subgraders=FormulaGrader(variables=['x'], user_functions={'f': f})
+    )
+    student_input = ['f(x) + {}'.format(k) for k in reversed(range(10))]
+    result = grader(None, student_input)
+    assert all(item['ok'] is True for item in result['input_list'])
+    # One evaluation per sample for each input, rather than for each answer as well
+    assert f.calls == 10 * 5
+
+    with mock.patch.object(StringGrader, 'check', wraps=StringGrader().check) as check:
+        grader = ListGrader(
+            answers=['cat', 'cat', 'dog'],
+            subgraders=StringGrader()
+        )
+        result = grader(None, ['dog', 'cat', 'dog'])
+        assert [item['ok'] for item in result['input_list']] == [True, True, False]
+        # Two distinct answers and two distinct inputs
+        assert check.call_count == 4
+
+def test_multiple_lists_share_and_skip_checks():
+    """Test that lists of answers share their checks, and are abandoned once beaten"""
+    with mock.patch.object(StringGrader, 'check', wraps=StringGrader().check) as check:
+        grader = ListGrader(
+            answers=(['a', 'b', 'c'], ['c', 'b', 'a'], ['a', 'c', 'b']),
+            subgraders=StringGrader(),
+            ordered=True
+        )
+        result = grader(None, ['a', 'b', 'c'])
+        assert all(item['ok'] is True for item in result['input_list'])
+        # Three checks for the first list, then one each for the others before
+        # they're beaten ('a' against 'a' in the third list is shared)
+        assert check.call_count == 5
+
+def test_multiple_lists_pruning_keeps_best_result():
+    """Test that skipping checks picks the same result as checking every list"""
+    random.seed(0)
+    items = ['a', 'b', 'c', 'd']
+    for ordered in [True, False]:
+        for _ in range(100):
+            answers = tuple(
+                [{'expect': item, 'grade_decimal': random.choice([0.5, 1]),
+                  'msg': random.choice(['', item])} for item in random.sample(items, 3)]
+                for _ in range(random.randint(2, 5))
+            )
+            grader = ListGrader(answers=answers, subgraders=StringGrader(), ordered=ordered)
+            student_input = [random.choice(items) for _ in range(3)]
+            full_results = [grader.perform_check(answer_list, student_input)
+                            for answer_list in grader.config['answers']]
+            expected = grader.get_best_result(full_results)
+            assert grader(None, student_input) == expected
+
+def test_multiple_lists_pruning_with_groups():
+    """Test that grouped inputs count towards the score of each list by their size"""
+    grader = ListGrader(
+        answers=(
+            [['1', '2'], ['3', '4']],
+            [['5', '6'], ['7', '8']],
+        ),
+        subgraders=ListGrader(subgraders=StringGrader()),
+        grouping=[1, 1, 2, 2]
+    )
+    result = grader(None, ['5', '6', '8', '7'])
+    assert all(item['ok'] is True for item in result['input_list'])
+    result = grader(None, ['5', '6', '3', 'x'])
+    assert [item['ok'] for item in result['input_list']] == [True, True, False, False]
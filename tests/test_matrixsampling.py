@@ -24,6 +24,8 @@ from mitxgraders import (
     ConfigError
 )
 from mitxgraders.helpers.calc import within_tolerance
+from mitxgraders.matrixsampling import Retry
+from mitxgraders.sampling import seeded_sampling
 
 def test_vectors():
     # Test shape, real/complex, norm, MathArray
@@ -198,6 +200,38 @@ def test_orthogonal():
                 assert np.linalg.det(m) == approx(1)
             assert isinstance(m, MathArray)
 
+def test_haar_distribution():
+    """
+    Test that orthogonal and unitary matrices are Haar-distributed, by checking
+    moments of their entries and traces against the values for the Haar measure
+    (Diaconis and Shahshahani, J. Appl. Probab. 31A, 49 (1994)).
+    """
+    count = 20000
+    with seeded_sampling(0):
+        for sampler, trace_moments in [
+            # Orthogonal: E[tr] = 0, E[tr^2] = 1 and E[tr^4] = 3 for n >= 4
+            (OrthogonalMatrices(dimension=4), [(1, 0), (2, 1), (4, 3)]),
+            # Rotations in 2D have uniform angle, so E[tr^2] = E[4 cos^2] = 2
+            (OrthogonalMatrices(dimension=2, unitdet=True), [(1, 0), (2, 2)]),
+            (OrthogonalMatrices(dimension=4, unitdet=True), [(1, 0), (2, 1)]),
+            # Unitary: E[tr] = 0, E[|tr|^2] = 1 and E[|tr|^4] = 2 for n >= 2
+            (UnitaryMatrices(dimension=3), [(1, 0), (2, 1), (4, 2)]),
+            (UnitaryMatrices(dimension=3, unitdet=True), [(1, 0), (2, 1)]),
+        ]:
+            dim = sampler.config['dimension']
+            matrices = np.array(sampler.gen_samples(count))
+            # Orthogonality
+            product = np.matmul(matrices, np.conj(np.swapaxes(matrices, -1, -2)))
+            assert np.allclose(product, np.eye(dim))
+            # Each entry is distributed symmetrically, with E[|m_ij|^2] = 1/n
+            for entry in [matrices[:, 0, 0], matrices[:, -1, 1]]:
+                assert abs(np.mean(entry)) < 0.03
+                assert np.mean(np.abs(entry)**2) == approx(1/dim, abs=0.01)
+            traces = np.trace(matrices, axis1=-2, axis2=-1)
+            assert abs(np.mean(traces)) < 0.05
+            for power, moment in trace_moments[1:]:
+                assert np.mean(np.abs(traces)**power) == approx(moment, rel=0.1)
+
 def test_square_matrices():
     # Test shape, real/complex, norm, symmetry, traceless, det, MathArray
     shapes = tuple(range(2, 5))
@@ -258,42 +292,91 @@ def test_square_matrices():
             matrices = SquareMatrices(**args)
             if symmetry in ('hermitian', 'antihermitian'):
                 comp = True
-            m = matrices.gen_sample()
-
-            # MathArray
-            assert isinstance(m, MathArray)
-
-            # Shape
-            assert m.shape == (shape, shape)
-
-            # Norm
-            if det != 1:
-                computed_norm = np.linalg.norm(m)
-                assert norm[0] <= computed_norm or abs(computed_norm - norm[0]) < 1e-12
-                assert computed_norm <= norm[1] or abs(computed_norm - norm[1]) < 1e-12
-
-            # Complex
-            if not comp:
-                assert np.array_equal(np.conj(m), m)
+            # Test single samples and samples drawn as a stack
+            for m in [matrices.gen_sample()] + matrices.gen_samples(3):
+                # MathArray
+                assert isinstance(m, MathArray)
 
-            # Trace
-            if traceless:
-                assert within_tolerance(m.trace(), 0, 5e-13)
-
-            # Determinant
-            if det == 0:
-                assert within_tolerance(np.abs(np.linalg.det(m)), 0, 1e-12)
-            elif det == 1:
-                assert within_tolerance(np.abs(np.linalg.det(m)), 1, 1e-12)
-
-            # Symmetries
-            if symmetry == 'diagonal':
-                assert np.array_equal(np.diag(np.diag(m)), m)
-            elif symmetry == 'symmetric':
-                assert np.array_equal(m, m.T)
-            elif symmetry == 'antisymmetric':
-                assert np.array_equal(m, -m.T)
-            elif symmetry == 'hermitian':
-                assert np.array_equal(m, np.conj(m.T))
-            elif symmetry == 'antihermitian':
-                assert np.array_equal(m, -np.conj(m.T))
+                # Shape
+                assert m.shape == (shape, shape)
+
+                # Norm
+                if det != 1:
+                    computed_norm = np.linalg.norm(m)
+                    assert norm[0] <= computed_norm or abs(computed_norm - norm[0]) < 1e-12
+                    assert computed_norm <= norm[1] or abs(computed_norm - norm[1]) < 1e-12
+
+                # Complex
+                if not comp:
+                    assert np.array_equal(np.conj(m), m)
+
+                # Trace
+                if traceless:
+                    assert within_tolerance(m.trace(), 0, 5e-13)
+
+                # Determinant
+                if det == 0:
+                    assert within_tolerance(np.abs(np.linalg.det(m)), 0, 1e-12)
+                elif det == 1:
+                    # Rounding in det scales with the product of the row norms
+                    # (Hadamard's bound), which is large for near-singular
+                    # draws rescaled to unit determinant
+                    tolerance = 1e-12 * max(1, np.prod(np.linalg.norm(m, axis=1)))
+                    assert within_tolerance(np.abs(np.linalg.det(m)), 1, tolerance)
+
+                # Symmetries
+                if symmetry == 'diagonal':
+                    assert np.array_equal(np.diag(np.diag(m)), m)
+                elif symmetry == 'symmetric':
+                    assert np.array_equal(m, m.T)
+                elif symmetry == 'antisymmetric':
+                    assert np.array_equal(m, -m.T)
+                elif symmetry == 'hermitian':
+                    assert np.array_equal(m, np.conj(m.T))
+                elif symmetry == 'antihermitian':
+                    assert np.array_equal(m, -np.conj(m.T))
+
+def test_stacked_sampling():
+    """Test generating many array samples at once"""
+    for sampler in [RealVectors(shape=4, norm=[2, 3]), ComplexMatrices(triangular='lower'),
+                    IdentityMatrixMultiples(dimension=3, sampler=[2, 3])]:
+        samples = sampler.gen_samples(10)
+        assert len(samples) == 10
+        assert all(isinstance(sample, MathArray) for sample in samples)
+        assert len(set(sample.tobytes() for sample in samples)) == 10
+    samples = RealVectors(shape=4, norm=[2, 3]).gen_samples(10)
+    assert all(2 <= np.linalg.norm(sample) <= 3 for sample in samples)
+
+    # Subclasses that shadow single-array methods are respected
+    class HalfNormVectors(RealVectors):
+        def normalize(self, array):
+            if array[0] < 0:
+                raise Retry()
+            return array / np.linalg.norm(array) / 2
+
+    class ZeroMatrices(RealMatrices):
+        def generate_sample(self):
+            return np.zeros(self.config['shape'])
+
+    samples = HalfNormVectors().gen_samples(10)
+    assert all(sample[0] >= 0 and np.linalg.norm(sample) == approx(0.5) for sample in samples)
+    samples = ZeroMatrices().gen_samples(2)
+    assert len(samples) == 2 and all(np.array_equal(sample, np.zeros((2, 2))) for sample in samples)
+
+    # Stacks that fail to reach unit determinant are redrawn
+    matrices = SquareMatrices(determinant=1)
+    arrays = np.array([[[1, 0], [0, 4]], [[1, 0], [0, -4]]])
+    result, accepted = matrices.make_det_one_stack(arrays)
+    assert accepted.tolist() == [True, False]
+    assert np.linalg.det(result[0]) == approx(1)
+    matrices = SquareMatrices(determinant=1, complex=True)
+    result, accepted = matrices.make_det_one_stack(np.array([arrays[1], np.zeros((2, 2))]))
+    assert accepted.tolist() == [True, False]
+    assert np.linalg.det(result[0]) == approx(1)
+
+    # Real matrices without real eigenvalues cannot be given zero determinant
+    matrices = SquareMatrices(determinant=0)
+    rotation = np.array([[0, -1], [1, 0]])
+    result, accepted = matrices.make_det_zero_stack(np.array([rotation, arrays[0]]))
+    assert accepted.tolist() == [False, True]
+    assert np.linalg.det(result[1]) == approx(0)
@@ -0,0 +1,38 @@
+"""
+Tests lazy loading of the public names in the mitxgraders package
+"""
+
+
+import importlib
+import subprocess
+import sys
+from pytest import raises
+import mitxgraders
+
+def test_public_names_match_module_all():
+    """Test that the lazy import map agrees with the __all__ of each module"""
+    for module, names in mitxgraders._PUBLIC_NAMES.items():
+        assert names == importlib.import_module(module).__all__
+
+def test_lazy_attributes(monkeypatch):
+    """Test that public names and submodules resolve to the right objects"""
+    from mitxgraders.formulagrader import FormulaGrader
+    from mitxgraders import sampling
+    assert mitxgraders.FormulaGrader is FormulaGrader
+    # Submodules are normally set on the package when imported; check that
+    # __getattr__ resolves them too
+    monkeypatch.delattr(mitxgraders, 'sampling')
+    assert mitxgraders.sampling is sampling
+    assert set(mitxgraders.__all__) <= set(dir(mitxgraders))
+    assert 'plugin_test' in mitxgraders.__all__
+    with raises(AttributeError, match="module 'mitxgraders' has no attribute 'nope'"):
+        mitxgraders.nope
+
+def test_stringgrader_import_is_light():
+    """Test that importing StringGrader does not import the math machinery"""
+    script = ("import sys\n"
+              "from mitxgraders import StringGrader\n"
+              "print(sorted(name for name in ['numpy', 'pyparsing', 'scipy', "
+              "'mitxgraders.matrixsampling'] if name in sys.modules))")
+    output = subprocess.check_output([sys.executable, '-c', script])
+    assert output.decode().strip() == '[]'
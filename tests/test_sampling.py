@@ -18,7 +18,8 @@ from mitxgraders import (
     DependentSampler,
     ConfigError
 )
-from mitxgraders.sampling import gen_symbols_samples
+from mitxgraders.sampling import gen_symbols_samples, DEPENDENT_ORDERS
+from mitxgraders.helpers.calc import MathArray
 
 def test_real_interval():
     """Tests the RealInterval class"""
@@ -123,6 +124,66 @@ def test_complex_sect():
         assert mstart <= np.abs(sample) <= mstop
         assert argstart <= np.angle(sample) <= argstop
 
+def test_gen_samples():
+    """Tests that gen_samples draws samples like gen_sample"""
+    cr = ComplexRectangle(re=[1, 2], im=[-2, -1])
+    cs = ComplexSector(modulus=[1, 2], argument=[0, 1])
+    ds = DiscreteSet((1, 2, 3))
+    for sampler, check in [
+        (cr, lambda z: 1 <= z.real <= 2 and -2 <= z.imag <= -1),
+        (cs, lambda z: 1 <= np.abs(z) <= 2 and 0 <= np.angle(z) <= 1),
+        (ds, lambda x: x in (1, 2, 3)),
+    ]:
+        # Few samples are drawn one at a time, and many all at once
+        for n in [3, 20]:
+            samples = sampler.gen_samples(n)
+            assert len(samples) == n
+            assert all(check(sample) for sample in samples)
+            assert type(samples[0]) == type(sampler.gen_sample())
+    assert RealInterval().gen_samples(0) == []
+
+    # Drawing samples one at a time consumes random numbers as drawing them at once
+    for sampler in [RealInterval(), IntegerRange()]:
+        np.random.seed(0)
+        samples = sampler.gen_samples(20)
+        np.random.seed(0)
+        assert samples == [sampler.gen_sample() for _ in range(20)]
+
+def test_samples_from_unit_cube():
+    """Tests that sampling sets map points in the unit cube to samples"""
+    points = np.array([[0, 0], [0.5, 0.25], [0.999, 0.999]])
+    assert RealInterval([1, 3]).samples_from_unit_cube(points[:, :1]) == approx([1, 2, 2.998])
+    assert IntegerRange([1, 3]).samples_from_unit_cube(points[:, :1]) == [1, 2, 3]
+    assert ComplexRectangle(re=[1, 3], im=[0, 4]).samples_from_unit_cube(points) == approx(
+        [1, 2 + 1j, 2.998 + 3.996j])
+    samples = ComplexSector(modulus=[1, 2], argument=[0, np.pi]).samples_from_unit_cube(points)
+    assert samples == approx([1, 1.5*np.exp(0.25j*np.pi), 1.999*np.exp(0.999j*np.pi)])
+    with raises(NotImplementedError):
+        DiscreteSet((1, 2)).samples_from_unit_cube(points)
+
+def test_sampling_strategy():
+    """Tests that low-discrepancy strategies spread samples across the joint domain"""
+    symbols = ['x', 'y', 'z', 's', 'n']
+    sample_from = {
+        'x': RealInterval([0, 1]),
+        'y': DiscreteSet((1, 2)),
+        'z': ComplexRectangle(re=[0, 1], im=[0, 1]),
+        's': DependentSampler(formula="x + 1"),
+        'n': IntegerRange([1, 4])
+    }
+    for strategy in ['sobol', 'halton']:
+        result = gen_symbols_samples(symbols, 8, sample_from, {}, {}, {}, strategy=strategy)
+        assert all(sample['s'] == sample['x'] + 1 for sample in result)
+        assert all(sample['y'] in (1, 2) for sample in result)
+        # Every half of the range of each coordinate holds some samples
+        for values in [[sample['x'] for sample in result],
+                       [sample['z'].real for sample in result],
+                       [sample['z'].imag for sample in result]]:
+            assert 0 < sum(value < 0.5 for value in values) < 8
+    # Sobol points hit every integer equally often
+    result = gen_symbols_samples(symbols, 8, sample_from, {}, {}, {}, strategy='sobol')
+    assert sorted(sample['n'] for sample in result) == [1, 1, 2, 2, 3, 3, 4, 4]
+
 def test_random_func():
     """Tests the RandomFunction class"""
     center = 15
@@ -146,6 +207,19 @@ def test_random_func():
         assert func(x) == func(x)
         assert np.iscomplex(func(x))
 
+    # Arrays of points are evaluated in one call
+    xs = np.linspace(-10, 10, 20)
+    assert np.allclose(func(xs), [func(x) for x in xs], rtol=1e-14)
+    assert func.vectorized is func
+
+    func = RandomFunction(input_dim=2, output_dim=3).gen_sample()
+    values = func(xs, 2.0)
+    assert values.shape == (20, 3)
+    for x, value in zip(xs, values):
+        assert isinstance(func(x, 2.0), MathArray)
+        assert np.allclose(value, np.array(func(x, 2.0)), rtol=1e-14)
+    assert not hasattr(func, 'vectorized')
+
     with raises(Exception, match="Expected 2 arguments, but received 1"):
         RandomFunction(input_dim=2).gen_sample()(1)
 
@@ -297,6 +371,31 @@ def test_dependent_sampler():
     with raises(Exception, match="DependentSampler must be invoked with compute_sample."):
         DependentSampler(depends=[], formula="1").gen_sample()
 
+    # Samples can also be computed one at a time
+    sampler = DependentSampler(formula="x+1")
+    assert sampler.compute_sample({'x': 1}, funcs, suffs) == 2
+    with raises(ConfigError, match=r"Formula error in dependent sampling formula: x\+1"):
+        sampler.compute_sample({}, funcs, suffs)
+
+def test_dependent_sampler_order_is_cached():
+    """Tests that the order of DependentSamplers is computed once per set of symbols"""
+    DEPENDENT_ORDERS.clear()
+    symbols = ['a'] + ['b{}'.format(i) for i in range(12)]
+    sample_from = {'a': RealInterval([1, 1]), 'b0': DependentSampler(formula="a+1")}
+    # List the chain backwards, so that computing the order takes several passes
+    for i in range(11, 0, -1):
+        sample_from['b{}'.format(i)] = DependentSampler(formula="b{}+1".format(i - 1))
+    for _ in range(2):
+        result = gen_symbols_samples(symbols, 3, sample_from, {}, {}, {})
+        assert [sample['b11'] for sample in result] == [13, 13, 13]
+    info = DEPENDENT_ORDERS.info()
+    assert (info['size'], info['hits'], info['misses']) == (1, 1, 1)
+
+    # Errors are reported even without samples
+    with raises(ConfigError, match="Circularly dependent DependentSamplers detected: b0"):
+        gen_symbols_samples(symbols, 0, dict(sample_from, b0=DependentSampler(formula="b0")),
+                            {}, {}, {})
+
 def test_overriding_constant_with_dependent_sampling():
     symbols = ['a', 'b', 'c']
     samples = 1
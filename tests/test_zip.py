@@ -42,3 +42,62 @@ def test_zipfile(loadzip):
 def test_notzipfile():
     """Test that the mitxgraders library loads normally"""
     assert mitxgraders.loaded_from == "mitxgraders directory"
+
+@pytest.fixture(scope='module')
+def bytecode_zip(tmp_path_factory):
+    """pytest fixture that builds python_lib.zip with bytecode using makezip.sh"""
+    import shutil
+    import subprocess
+    import sys
+    if shutil.which('zip') is None:  # pragma: no cover
+        pytest.skip("zip is not available")
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    build_dir = tmp_path_factory.mktemp('build')
+    ignore = shutil.ignore_patterns('__pycache__', '*.pyc')
+    for package in ['mitxgraders', 'voluptuous']:
+        shutil.copytree(os.path.join(parent_dir, package), str(build_dir / package),
+                        ignore=ignore)
+    for filename in ['LICENSE', 'makezip.sh']:
+        shutil.copy(os.path.join(parent_dir, filename), str(build_dir))
+    subprocess.check_output(['bash', 'makezip.sh', '--bytecode', sys.executable],
+                            cwd=str(build_dir))
+    return build_dir / 'python_lib.zip'
+
+def import_from_zip(zip_path):
+    """Import mitxgraders from zip_path in a fresh interpreter"""
+    import subprocess
+    import sys
+    script = ("import sys\n"
+              "sys.path.insert(0, 'python_lib.zip')\n"
+              "import mitxgraders\n"
+              "grader = mitxgraders.StringGrader(answers='hello')\n"
+              "assert grader(None, 'hello')['ok']\n"
+              "print(mitxgraders.stringgrader.__file__)")
+    output = subprocess.check_output([sys.executable, '-c', script],
+                                     cwd=str(zip_path.parent))
+    return output.decode().strip()
+
+def test_zip_bytecode(bytecode_zip):
+    """Test that modules are loaded from the bytecode in the zip file"""
+    import zipfile
+    with zipfile.ZipFile(str(bytecode_zip)) as myzip:
+        names = myzip.namelist()
+    assert 'mitxgraders/stringgrader.py' in names
+    assert 'mitxgraders/stringgrader.pyc' in names
+    assert 'voluptuous/schema_builder.pyc' in names
+    assert not any('__pycache__' in name for name in names)
+    assert import_from_zip(bytecode_zip).endswith('mitxgraders/stringgrader.pyc')
+
+def test_zip_bytecode_fallback(bytecode_zip, tmp_path):
+    """Test that bytecode from another interpreter falls back to the source"""
+    import zipfile
+    mismatched = tmp_path / 'python_lib.zip'
+    with zipfile.ZipFile(str(bytecode_zip)) as source, \
+         zipfile.ZipFile(str(mismatched), 'w') as target:
+        for info in source.infolist():
+            data = source.read(info)
+            if info.filename.endswith('.pyc'):
+                # Corrupt the magic number, as for bytecode from another version
+                data = b'\x00\x00' + data[2:]
+            target.writestr(info, data)
+    assert import_from_zip(mismatched).endswith('mitxgraders/stringgrader.py')